@@ -1,10 +1,19 @@
-from typing import Dict
+from typing import Callable, Dict, FrozenSet, List, Tuple
 import json
 import hmac
 import hashlib
+import math
+import re
 import time
-from urllib.parse import urlencode
+from abc import abstractmethod
+from json.encoder import encode_basestring_ascii
+from urllib.parse import quote_plus, urlencode
 from collections import OrderedDict
+from operator import itemgetter
+import latency
+from clock_sync import CLOCKS, VenueClock
+
+is_query_safe = re.compile(pattern=r'[A-Za-z0-9_.~-]*').fullmatch
 
 
 def read_json_file(file_path: str) -> Dict[str, str]:
@@ -22,66 +31,251 @@ def get_milli_timestamp() -> int:
     return time.time_ns() // 1000000
 
 
+def get_query_value(value) -> str:
+    if value.__class__ is int:
+        return int.__repr__(value)
+    if value.__class__ is not str:
+        value = str(value)
+    return value if is_query_safe(value) is not None else quote_plus(value)
+
+
+def get_json_value(value) -> str:
+    if value.__class__ is str:
+        return encode_basestring_ascii(value)
+    if value.__class__ is int:
+        return int.__repr__(value)
+    if value.__class__ is float and math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(obj=value)
+
+
+def get_tuple_getter(keys: List[str]) -> Callable[[OrderedDict], tuple]:
+    if len(keys) > 1:
+        return itemgetter(*keys)
+    if keys:
+        key = keys[0]
+        return lambda order: (order[key],)
+    return lambda order: ()
+
+
+class OrderTemplate:
+    __slots__ = ('_get_values', '_query_format', '_body_format')
+    _get_values: Callable[[OrderedDict], tuple]
+    _query_format: str
+    _body_format: str
+
+    def __init__(self, get_values: Callable[[OrderedDict], tuple],
+                 query_format: str, body_format: str) -> None:
+        self._get_values = get_values
+        self._query_format = query_format
+        self._body_format = body_format
+
+    def get_message(self, values: tuple, timestamp: int) -> str:
+        return self._query_format % (
+            tuple([get_query_value(value) for value in values])
+            + (timestamp,))
+
+    def encode(self, order: OrderedDict, timestamp: int,
+               sign: Callable[[str], str]) -> str:
+        message = self.get_message(values=self._get_values(order),
+                                   timestamp=timestamp)
+        return self._body_format % (message, sign(message))
+
+
+class JsonOrderTemplate(OrderTemplate):
+    __slots__ = ()
+
+    def encode(self, order: OrderedDict, timestamp: int,
+               sign: Callable[[str], str]) -> str:
+        values = self._get_values(order)
+        message = self.get_message(values=values, timestamp=timestamp)
+        return self._body_format % (
+            tuple([get_json_value(value) for value in values])
+            + (timestamp, sign(message)))
+
+
 class ApiAuth:
     key: str
     secret: str
+    clock: VenueClock
+    _VENUE: str
+    _hmac: hmac.HMAC
+    _VARIABLE_FIELDS: FrozenSet[str] = frozenset()
+    _TEMPLATE_LIMIT = 256
+    _TEMPLATE_CLASS = OrderTemplate
+    _fixed_getters: Dict[Tuple[str, ...], Callable[[OrderedDict], tuple]]
+    _templates: Dict[tuple, OrderTemplate]
 
     def __init__(self, file_path: str) -> None:
         api_credentials = read_json_file(file_path=file_path)
         self.key = api_credentials.get('id')
         self.secret = api_credentials.get('secret')
+        self.clock = CLOCKS[self._VENUE]
+        self._hmac = hmac.new(key=bytes(self.secret, encoding='utf8'),
+                              digestmod=hashlib.sha256)
+        self._fixed_getters = {}
+        self._templates = {}
+
+    def get_signature(self, message: str) -> str:
+        signer = self._hmac.copy()
+        signer.update(message.encode())
+        return signer.hexdigest()
+
+    def get_order_template(self, order: OrderedDict) -> OrderTemplate:
+        layout = tuple(order)
+        get_fixed = self._fixed_getters.get(layout)
+        if get_fixed is None:
+            get_fixed = self._fixed_getters[layout] = get_tuple_getter(
+                keys=[key for key in layout
+                      if key not in self._VARIABLE_FIELDS])
+        template_key = (layout, get_fixed(order))
+        template = self._templates.get(template_key)
+        if template is None:
+            if len(self._templates) >= self._TEMPLATE_LIMIT:
+                self._templates.clear()
+            template = self._TEMPLATE_CLASS(
+                get_values=get_tuple_getter(
+                    keys=[key for key in layout
+                          if key in self._VARIABLE_FIELDS]),
+                query_format=self.get_query_format(order=order),
+                body_format=self.get_body_format(order=order))
+            self._templates[template_key] = template
+        return template
 
-    def get_signature(self, message) -> str:
-        return get_signature(secret=self.secret, message=message)
+    def get_query_fields(self, order: OrderedDict) -> List[str]:
+        fields = []
+        for key, value in order.items():
+            name = quote_plus(str(key)) + '='
+            if key in self._VARIABLE_FIELDS:
+                fields.append(name.replace('%', '%%') + '%s')
+            else:
+                fields.append((name + get_query_value(value=value)).replace(
+                    '%', '%%'))
+        return fields
+
+    def get_json_fields(self, order: OrderedDict) -> List[str]:
+        fields = []
+        for key, value in order.items():
+            name = encode_basestring_ascii(str(key)) + ': '
+            if key in self._VARIABLE_FIELDS:
+                fields.append(name.replace('%', '%%') + '%s')
+            else:
+                fields.append((name + get_json_value(value=value)).replace(
+                    '%', '%%'))
+        return fields
+
+    def get_query_format(self, order: OrderedDict) -> str:
+        return '&'.join(self.get_query_fields(order=order)
+                        + ['timestamp=%d'])
+
+    @abstractmethod
+    def get_body_format(self, order: OrderedDict) -> str:
+        pass
+
+    def encode_order(self, order: OrderedDict, timestamp: int) -> str:
+        return self.get_order_template(order=order).encode(
+            order=order, timestamp=timestamp, sign=self.get_signature)
 
 
 class BinanceApiAuth(ApiAuth):
+    TRADE_ENDPOINT = 'wss://ws-dapi.binance.com/ws-dapi/v1'
+    _VENUE = latency.VENUE_BINANCE
     headers: dict
+    _VARIABLE_FIELDS = frozenset(('quantity', 'price', 'newClientOrderId',
+                                  'batchOrders'))
 
     def __init__(self, file_path: str) -> None:
         super().__init__(file_path=file_path)
         self.headers = {'Content-Type': 'application/x-www-form-urlencoded',
                         'X-MBX-APIKEY': self.key}
 
+    def get_body_format(self, order: OrderedDict) -> str:
+        return '%s&signature=%s'
+
     def get_order_auth_body(self, order: OrderedDict) -> str:
-        order['timestamp'] = get_milli_timestamp()
-        order['signature'] = self.get_signature(message=urlencode(query=order))
-        return urlencode(query=order)
+        sign_ts = latency.clock()
+        body = self.encode_order(order=order,
+                                 timestamp=self.clock.get_milli_timestamp())
+        latency.RECORDER.record(stage=latency.STAGE_SIGN,
+                                venue=latency.VENUE_BINANCE, start_ns=sign_ts)
+        return body
+
+    def get_ws_order_params(self, order: OrderedDict) -> Dict[str, str]:
+        sign_ts = latency.clock()
+        params = dict(order, apiKey=self.key,
+                      timestamp=self.clock.get_milli_timestamp())
+        params = dict(sorted(params.items()))
+        params['signature'] = self.get_signature(
+            message=urlencode(query=params))
+        latency.RECORDER.record(stage=latency.STAGE_SIGN,
+                                venue=latency.VENUE_BINANCE, start_ns=sign_ts)
+        return params
 
     def get_position_risk_auth(self, pair: str) -> str:
-        params = {'pair': pair, 'timestamp': str(get_milli_timestamp())}
+        params = {'pair': pair,
+                  'timestamp': str(self.clock.get_milli_timestamp())}
         params['signature'] = self.get_signature(
             message=urlencode(query=params))
         return '/dapi/v1/positionRisk?' + urlencode(query=params)
 
+    def get_order_query_auth(self, symbol: str, client_order_id: str) -> str:
+        params = {'symbol': symbol, 'origClientOrderId': client_order_id,
+                  'timestamp': str(self.clock.get_milli_timestamp())}
+        params['signature'] = self.get_signature(
+            message=urlencode(query=params))
+        return '/dapi/v1/order?' + urlencode(query=params)
+
 
 class BybitApiAuth(ApiAuth):
+    WEBSOCKET_ENDPOINT = 'wss://stream.bybit.com/realtime'
+    TRADE_ENDPOINT = 'wss://stream.bybit.com/v5/trade'
+    _VENUE = latency.VENUE_BYBIT
+    _TEMPLATE_CLASS = JsonOrderTemplate
+    _VARIABLE_FIELDS = frozenset(('order_link_id', 'price', 'qty',
+                                  'p_r_price', 'p_r_qty'))
+
     def __init__(self, file_path: str) -> None:
         super().__init__(file_path=file_path)
 
-    def get_websocket_uri(self) -> str:
-        expires = str(get_milli_timestamp() + 5000)
-        params = {'api_key': self.key, 'expires': expires,
-                  'signature': self.get_signature(
-                      message='GET/realtime' + expires)}
-        return 'wss://stream.bybit.com/realtime?' + urlencode(query=params)
+    def get_websocket_auth_args(self) -> List[str]:
+        expires = str(self.clock.get_milli_timestamp() + 5000)
+        return [self.key, expires,
+                self.get_signature(message='GET/realtime' + expires)]
+
+    def get_websocket_uri(self, endpoint: str = WEBSOCKET_ENDPOINT) -> str:
+        key, expires, signature = self.get_websocket_auth_args()
+        params = {'api_key': key, 'expires': expires,
+                  'signature': signature}
+        return endpoint + '?' + urlencode(query=params)
 
     def get_active_orders_auth(self, symbol: str) -> str:
         params = {'api_key': self.key, 'symbol': symbol,
-                  'timestamp': str(get_milli_timestamp())}
+                  'timestamp': str(self.clock.get_milli_timestamp())}
         params['sign'] = self.get_signature(message=urlencode(query=params))
         return '/v2/private/order?' + urlencode(query=params)
 
     def get_position_list_auth(self, symbol: str) -> str:
         params = {'api_key': self.key, 'symbol': symbol,
-                  'timestamp': str(get_milli_timestamp())}
+                  'timestamp': str(self.clock.get_milli_timestamp())}
         params['sign'] = self.get_signature(message=urlencode(query=params))
         return '/v2/private/position/list?' + urlencode(query=params)
 
-    def get_order_auth_body(self, order: OrderedDict) -> str:
-        order.update({'api_key': self.key})
-        order.move_to_end(key='api_key', last=False)
-        order['timestamp'] = get_milli_timestamp()
-        order['sign'] = self.get_signature(message=urlencode(query=order))
-        return json.dumps(obj=order)
+    def get_query_format(self, order: OrderedDict) -> str:
+        return '&'.join(
+            ['api_key=' + quote_plus(self.key).replace('%', '%%')]
+            + self.get_query_fields(order=order) + ['timestamp=%d'])
 
+    def get_body_format(self, order: OrderedDict) -> str:
+        return '{' + ', '.join(
+            ['"api_key": '
+             + encode_basestring_ascii(self.key).replace('%', '%%')]
+            + self.get_json_fields(order=order)
+            + ['"timestamp": %d', '"sign": "%s"']) + '}'
+
+    def get_order_auth_body(self, order: OrderedDict) -> str:
+        sign_ts = latency.clock()
+        body = self.encode_order(order=order,
+                                 timestamp=self.clock.get_milli_timestamp())
+        latency.RECORDER.record(stage=latency.STAGE_SIGN,
+                                venue=latency.VENUE_BYBIT, start_ns=sign_ts)
+        return body
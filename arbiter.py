@@ -0,0 +1,161 @@
+import time
+from abc import abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Tuple, Union
+from decoder import BybitBookDelta, BinanceDepthUpdate
+from feed import Feed, BybitFeedRouter, BinanceFeedRouter
+
+StreamKey = Tuple[str, int]
+
+
+class ArbiterLine:
+    _arbiter: 'FeedArbiter'
+    line_id: int
+    live: bool
+    received: int
+    wins: int
+    duplicates: int
+    lag_count: int
+    lag_total_ns: int
+    lag_max_ns: int
+
+    def __init__(self, arbiter: 'FeedArbiter', line_id: int) -> None:
+        self._arbiter = arbiter
+        self.line_id = line_id
+        self.live = False
+        self.received = 0
+        self.wins = 0
+        self.duplicates = 0
+        self.lag_count = 0
+        self.lag_total_ns = 0
+        self.lag_max_ns = 0
+
+    def on_websocket(self, data: dict) -> None:
+        self._arbiter.on_line_websocket(line=self, data=data)
+
+    def on_book_delta(self, delta: Union[BybitBookDelta,
+                                         BinanceDepthUpdate]) -> None:
+        self._arbiter.on_line_book_delta(line=self, delta=delta)
+
+    def on_book_reset(self) -> None:
+        self._arbiter.on_line_reset(line=self)
+
+    def on_position_snapshot(self, data: Union[dict, list]) -> None:
+        self._arbiter.feed.on_position_snapshot(data=data)
+
+    def get_feed(self, symbol: str) -> Feed:
+        return self._arbiter.feed.get_feed(symbol=symbol)
+
+    def record_lag(self, lag_ns: int) -> None:
+        self.lag_count += 1
+        self.lag_total_ns += lag_ns
+        if lag_ns > self.lag_max_ns:
+            self.lag_max_ns = lag_ns
+
+    def get_stats(self) -> Dict[str, float]:
+        return {'line': self.line_id, 'received': self.received,
+                'wins': self.wins, 'duplicates': self.duplicates,
+                'win_rate': (self.wins / self.received
+                             if self.received else 0.0),
+                'lag_mean_us': (self.lag_total_ns / self.lag_count / 1000
+                                if self.lag_count else 0.0),
+                'lag_max_us': self.lag_max_ns / 1000}
+
+
+class FeedArbiter:
+    feed: Union[Feed, BybitFeedRouter, BinanceFeedRouter]
+    lines: List[ArbiterLine]
+    _high_water: Dict[str, int]
+    _first_seen: Dict[StreamKey, Tuple[int, int]]
+    _first_seen_order: Deque[StreamKey]
+    _HISTORY_SIZE = 4096
+    forwarded: int
+    dropped: int
+
+    def __init__(self, feed_object: Union[Feed, BybitFeedRouter,
+                                          BinanceFeedRouter],
+                 n_lines: int = 2) -> None:
+        self.feed = feed_object
+        self.lines = [ArbiterLine(arbiter=self, line_id=line_id)
+                      for line_id in range(n_lines)]
+        self._high_water = {}
+        self._first_seen = {}
+        self._first_seen_order = deque()
+        self.forwarded = 0
+        self.dropped = 0
+
+    @abstractmethod
+    def get_message_key(self, data: dict) -> Union[StreamKey, None]:
+        pass
+
+    @abstractmethod
+    def get_delta_key(self, delta: Union[BybitBookDelta,
+                                         BinanceDepthUpdate]) -> StreamKey:
+        pass
+
+    def is_first(self, line: ArbiterLine, key: StreamKey) -> bool:
+        now_ns = time.perf_counter_ns()
+        line.received += 1
+        line.live = True
+        stream, seq = key
+        if seq <= self._high_water.get(stream, -1):
+            line.duplicates += 1
+            self.dropped += 1
+            first = self._first_seen.get(key)
+            if first is not None and first[1] != line.line_id:
+                line.record_lag(lag_ns=now_ns - first[0])
+            return False
+        self._high_water[stream] = seq
+        line.wins += 1
+        self.forwarded += 1
+        if len(self._first_seen_order) == self._HISTORY_SIZE:
+            self._first_seen.pop(self._first_seen_order.popleft(), None)
+        self._first_seen_order.append(key)
+        self._first_seen[key] = (now_ns, line.line_id)
+        return True
+
+    def on_line_websocket(self, line: ArbiterLine, data: dict) -> None:
+        key = self.get_message_key(data=data)
+        if key is None or self.is_first(line=line, key=key):
+            self.feed.on_websocket(data=data)
+
+    def on_line_book_delta(self, line: ArbiterLine,
+                           delta: Union[BybitBookDelta,
+                                        BinanceDepthUpdate]) -> None:
+        if self.is_first(line=line, key=self.get_delta_key(delta=delta)):
+            self.feed.on_book_delta(delta=delta)
+
+    def on_line_reset(self, line: ArbiterLine) -> None:
+        line.live = False
+        if any(other.live for other in self.lines):
+            return
+        self._high_water.clear()
+        self._first_seen.clear()
+        self._first_seen_order.clear()
+        self.feed.on_book_reset()
+
+    def get_line_stats(self) -> List[Dict[str, float]]:
+        return [line.get_stats() for line in self.lines]
+
+
+class BybitFeedArbiter(FeedArbiter):
+
+    def get_message_key(self, data: dict) -> Union[StreamKey, None]:
+        cross_seq = data.get('cross_seq')
+        if cross_seq is None:
+            return None
+        return data.get('topic'), cross_seq
+
+    def get_delta_key(self, delta: BybitBookDelta) -> StreamKey:
+        return delta.topic, delta.cross_seq
+
+
+class BinanceFeedArbiter(FeedArbiter):
+
+    def get_message_key(self, data: dict) -> Union[StreamKey, None]:
+        if data.get('e') != 'depthUpdate':
+            return None
+        return data.get('s'), data.get('u')
+
+    def get_delta_key(self, delta: BinanceDepthUpdate) -> StreamKey:
+        return delta.symbol, delta.last_update_id
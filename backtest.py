@@ -0,0 +1,605 @@
+import argparse
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Tuple, Union
+import numpy as np
+import capture
+import rate_limiter
+from replay import ReplayDriver
+from feed import BybitFeed, BinanceFeed
+from hedge_engine import HedgeCallback
+from strategy import Strategy, MMStrategy
+
+COL_TS = 0
+COL_BYBIT_BID = 1
+COL_BYBIT_ASK = 2
+COL_BINANCE_BID = 3
+COL_BINANCE_ASK = 4
+BBO_COLUMNS = 5
+SIDE_BID = 0
+SIDE_ASK = 1
+BINANCE_CONTRACT_SIZE = 100
+EVENT_FILL = 0
+EVENT_AMEND = 1
+EVENT_PLACE = 2
+
+
+class BacktestParams(NamedTuple):
+    net_fee_offset: float = MMStrategy._NET_FEE_OFFSET
+    net_profit_offset: float = MMStrategy._NET_PROFIT_OFFSET
+    risk_measure: float = MMStrategy._RISK_MEASURE
+    update_interval: int = MMStrategy._UPDATE_INTERVAL
+    quote_size: int = MMStrategy._bybit_quote_size
+    inventory_limit: int = MMStrategy._inventory_limit
+    ticks_per_unit: int = MMStrategy._bybit_ticks_per_unit
+    bybit_maker_fee: float = -0.00025
+    binance_taker_fee: float = 0.0004
+
+
+class BacktestResult(NamedTuple):
+    equity: np.ndarray
+    bybit_position: np.ndarray
+    binance_position: np.ndarray
+    hedge_count: np.ndarray
+    fills: List[Tuple[int, int, float, int]]
+    hedges: List[Tuple[int, int]]
+    stats: Dict[str, Union[int, float]]
+
+
+def compute_quote_targets(bbo: np.ndarray, params: BacktestParams
+                          ) -> Tuple[np.ndarray, np.ndarray]:
+    bybit_bid = bbo[:, COL_BYBIT_BID]
+    bybit_ask = bbo[:, COL_BYBIT_ASK]
+    binance_bid = bbo[:, COL_BINANCE_BID]
+    binance_ask = bbo[:, COL_BINANCE_ASK]
+    bybit_mid = (bybit_bid + bybit_ask) / 2
+    binance_mid = (binance_bid + binance_ask) / 2
+    overall_mid = (bybit_mid + binance_mid) / 2
+    ticks = params.ticks_per_unit
+    bid_targets = np.floor((1 - params.net_fee_offset
+                            - params.net_profit_offset - params.risk_measure)
+                           * overall_mid * ticks) / ticks
+    ask_targets = np.ceil((1 + params.net_fee_offset
+                           + params.net_profit_offset + params.risk_measure)
+                          * overall_mid * ticks) / ticks
+    bybit_lower = bybit_mid < binance_mid
+    max_bid = (np.round(bybit_ask * ticks) - 1) / ticks
+    bid_targets = np.where(bybit_lower & (max_bid < bid_targets), max_bid,
+                           bid_targets)
+    ask_targets = np.where(bybit_lower & (binance_ask > ask_targets),
+                           np.ceil(binance_ask * ticks) / ticks, ask_targets)
+    bybit_higher = bybit_mid > binance_mid
+    min_ask = (np.round(bybit_bid * ticks) + 1) / ticks
+    ask_targets = np.where(bybit_higher & (min_ask > ask_targets), min_ask,
+                           ask_targets)
+    bid_targets = np.where(bybit_higher & (binance_bid < bid_targets),
+                           np.floor(binance_bid * ticks) / ticks, bid_targets)
+    return bid_targets, ask_targets
+
+
+def get_order_size(position: int, side: int, quote_size: int,
+                   inventory_limit: int) -> int:
+    if side == SIDE_BID:
+        if position < 0:
+            return abs(position)
+        rmd = position % quote_size
+        if rmd == 0:
+            if position + quote_size <= inventory_limit:
+                return quote_size
+        else:
+            order_size = quote_size - rmd
+            if position + order_size + quote_size <= inventory_limit:
+                order_size += quote_size
+            return order_size
+    else:
+        if position > 0:
+            return position
+        rmd = abs(position) % quote_size
+        if rmd == 0:
+            if position - quote_size >= -inventory_limit:
+                return quote_size
+        else:
+            order_size = quote_size - rmd
+            if position - order_size - quote_size >= -inventory_limit:
+                order_size += quote_size
+            return order_size
+    return 0
+
+
+class Backtester:
+    _MIN_WINDOW = 64
+    _MAX_WINDOW = 1 << 16
+    _bbo: np.ndarray
+    _params: BacktestParams
+    _n: int
+    _targets: Tuple[np.ndarray, np.ndarray]
+    _bybit_bid: np.ndarray
+    _bybit_ask: np.ndarray
+
+    def __init__(self, bbo: np.ndarray,
+                 params: BacktestParams = BacktestParams()) -> None:
+        self._bbo = bbo
+        self._params = params
+        self._n = len(bbo)
+        self._targets = compute_quote_targets(bbo=bbo, params=params)
+        self._bybit_bid = bbo[:, COL_BYBIT_BID]
+        self._bybit_ask = bbo[:, COL_BYBIT_ASK]
+
+    def find_nth(self, condition: Callable[[int, int], np.ndarray],
+                 start: int, nth: int = 1,
+                 stop: Union[int, None] = None) -> int:
+        end = self._n if stop is None else min(stop, self._n)
+        window = self._MIN_WINDOW
+        while start < end:
+            window_stop = min(start + window, end)
+            hits = condition(start, window_stop).nonzero()[0]
+            if len(hits) >= nth:
+                return start + int(hits[nth - 1])
+            nth -= len(hits)
+            start = window_stop
+            window = min(window * 2, self._MAX_WINDOW)
+        return self._n
+
+    def find_accept(self, side: int, start: int) -> int:
+        targets = self._targets[side]
+        if side == SIDE_BID:
+            market = self._bybit_ask
+            return self.find_nth(condition=lambda lo, hi: (
+                targets[lo:hi] < market[lo:hi]), start=start)
+        market = self._bybit_bid
+        return self.find_nth(condition=lambda lo, hi: (
+            targets[lo:hi] > market[lo:hi]), start=start)
+
+    def find_fill(self, side: int, price: float, start: int,
+                  stop: int) -> int:
+        if side == SIDE_BID:
+            market = self._bybit_ask
+            return self.find_nth(condition=lambda lo, hi: (
+                market[lo:hi] <= price), start=start, stop=stop)
+        market = self._bybit_bid
+        return self.find_nth(condition=lambda lo, hi: (
+            market[lo:hi] >= price), start=start, stop=stop)
+
+    def find_amend(self, side: int, price: float, start: int,
+                   nth: int) -> int:
+        targets = self._targets[side]
+        return self.find_nth(condition=lambda lo, hi: (
+            targets[lo:hi] != price), start=start, nth=nth)
+
+    def count_mismatches(self, side: int, price: float, start: int,
+                         stop: int) -> int:
+        return int(np.count_nonzero(self._targets[side][start:stop]
+                                    != price))
+
+    def is_crossing(self, side: int, price: float, row: int) -> bool:
+        if side == SIDE_BID:
+            return price >= self._bybit_ask[row]
+        return price <= self._bybit_bid[row]
+
+    def run(self) -> BacktestResult:
+        params = self._params
+        n = self._n
+        price = [None, None]
+        qty = [0, 0]
+        count = [0, 0]
+        priced_row = [0, 0]
+        fill_at = [n, n]
+        amend_at = [n, n]
+        place_at = [self.find_accept(side=SIDE_BID, start=0),
+                    self.find_accept(side=SIDE_ASK, start=0)]
+        idle = [False, False]
+        position = 0
+        unhedged = 0
+        fills = []
+        hedges = []
+        stats = {'orders': 0, 'amends': 0, 'cancels': 0, 'rejects': 0}
+        rejects_from = [0, 0]
+        while True:
+            event = None
+            for side in (SIDE_BID, SIDE_ASK):
+                if price[side] is not None:
+                    if fill_at[side] <= amend_at[side]:
+                        key = (fill_at[side], 0, side, EVENT_FILL)
+                    else:
+                        key = (amend_at[side], 1, side, EVENT_AMEND)
+                elif not idle[side]:
+                    key = (place_at[side], 1, side, EVENT_PLACE)
+                else:
+                    continue
+                if event is None or key < event:
+                    event = key
+            if event is None or event[0] >= n:
+                break
+            row, _, side, kind = event
+            if kind == EVENT_FILL:
+                count[side] += self.count_mismatches(
+                    side=side, price=price[side], start=priced_row[side] + 1,
+                    stop=row)
+                signed_qty = qty[side] if side == SIDE_BID else -qty[side]
+                position += signed_qty
+                fills.append((row, side, price[side], qty[side]))
+                unhedged += signed_qty
+                contracts = round(unhedged / BINANCE_CONTRACT_SIZE)
+                unhedged -= contracts * BINANCE_CONTRACT_SIZE
+                if contracts != 0:
+                    hedges.append((row, -contracts))
+                price[side] = None
+                place_at[side] = self.find_accept(side=side, start=row)
+                rejects_from[side] = row
+                other = 1 - side
+                if idle[other]:
+                    idle[other] = False
+                    place_at[other] = self.find_accept(side=other, start=row)
+                    rejects_from[other] = row
+            elif kind == EVENT_PLACE:
+                size = get_order_size(
+                    position=position, side=side,
+                    quote_size=params.quote_size,
+                    inventory_limit=params.inventory_limit)
+                if size == 0:
+                    idle[side] = True
+                    continue
+                stats['rejects'] += row - rejects_from[side]
+                stats['orders'] += row - rejects_from[side] + 1
+                target = float(self._targets[side][row])
+                price[side] = target
+                qty[side] = size
+                priced_row[side] = row
+                amend_at[side] = self.find_amend(
+                    side=side, price=target, start=row + 1,
+                    nth=params.update_interval - count[side])
+                fill_at[side] = self.find_fill(side=side, price=target,
+                                               start=row + 1,
+                                               stop=amend_at[side] + 1)
+            else:
+                count[side] = 0
+                stats['amends'] += 1
+                target = float(self._targets[side][row])
+                size = get_order_size(
+                    position=position, side=side,
+                    quote_size=params.quote_size,
+                    inventory_limit=params.inventory_limit)
+                if size == 0 or self.is_crossing(side=side, price=target,
+                                                 row=row):
+                    stats['cancels'] += 1
+                    price[side] = None
+                    place_at[side] = self.find_accept(side=side,
+                                                      start=row + 1)
+                    rejects_from[side] = row + 1
+                    continue
+                price[side] = target
+                qty[side] = size
+                priced_row[side] = row
+                amend_at[side] = self.find_amend(
+                    side=side, price=target, start=row + 1,
+                    nth=params.update_interval)
+                fill_at[side] = self.find_fill(side=side, price=target,
+                                               start=row + 1,
+                                               stop=amend_at[side] + 1)
+        return self.get_result(fills=fills, hedges=hedges, stats=stats)
+
+    def get_result(self, fills: List[Tuple[int, int, float, int]],
+                   hedges: List[Tuple[int, int]],
+                   stats: Dict[str, int]) -> BacktestResult:
+        params = self._params
+        n = self._n
+        bbo = self._bbo
+        fill_arr = np.array(fills, dtype=np.float64).reshape(-1, 4)
+        fill_rows = fill_arr[:, 0].astype(np.int64)
+        fill_prices = fill_arr[:, 2]
+        fill_qty = np.where(fill_arr[:, 1] == SIDE_BID, fill_arr[:, 3],
+                            -fill_arr[:, 3])
+        hedge_arr = np.array(hedges, dtype=np.int64).reshape(-1, 2)
+        hedge_rows = hedge_arr[:, 0]
+        hedge_contracts = hedge_arr[:, 1]
+        hedge_prices = np.where(hedge_contracts > 0,
+                                bbo[hedge_rows, COL_BINANCE_ASK],
+                                bbo[hedge_rows, COL_BINANCE_BID])
+        hedge_usd = hedge_contracts * BINANCE_CONTRACT_SIZE
+        bybit_position = np.cumsum(np.bincount(
+            fill_rows, weights=fill_qty, minlength=n))
+        binance_position = np.cumsum(np.bincount(
+            hedge_rows, weights=hedge_contracts, minlength=n))
+        cash = np.cumsum(
+            np.bincount(fill_rows, minlength=n, weights=(
+                fill_qty / fill_prices
+                - params.bybit_maker_fee * np.abs(fill_qty) / fill_prices))
+            + np.bincount(hedge_rows, minlength=n, weights=(
+                hedge_usd / hedge_prices
+                - params.binance_taker_fee * np.abs(hedge_usd)
+                / hedge_prices)))
+        bybit_mid = (bbo[:, COL_BYBIT_BID] + bbo[:, COL_BYBIT_ASK]) / 2
+        binance_mid = (bbo[:, COL_BINANCE_BID] + bbo[:, COL_BINANCE_ASK]) / 2
+        equity = (cash - bybit_position / bybit_mid
+                  - binance_position * BINANCE_CONTRACT_SIZE / binance_mid)
+        hedge_count = np.cumsum(np.bincount(hedge_rows, minlength=n))
+        stats = dict(stats, rows=n, fills=len(fills), hedges=len(hedges),
+                     hedged_contracts=int(np.abs(hedge_contracts).sum()),
+                     final_equity=float(equity[-1]) if n else 0.0,
+                     max_inventory=int(np.abs(bybit_position).max())
+                     if n else 0)
+        return BacktestResult(equity=equity, bybit_position=bybit_position,
+                              binance_position=binance_position,
+                              hedge_count=hedge_count, fills=fills,
+                              hedges=hedges, stats=stats)
+
+
+def run_backtest(bbo: np.ndarray,
+                 params: BacktestParams = BacktestParams()
+                 ) -> BacktestResult:
+    return Backtester(bbo=bbo, params=params).run()
+
+
+class BacktestGateway:
+    bybit_limiter: rate_limiter.RateLimiter
+    binance_limiter: rate_limiter.RateLimiter
+    actions: List[Tuple[str, OrderedDict]]
+
+    def __init__(self) -> None:
+        self.bybit_limiter = rate_limiter.RateLimiter(
+            buckets={}, endpoints={rate_limiter.BYBIT_ORDER_CREATE: [],
+                                   rate_limiter.BYBIT_ORDER_REPLACE: []})
+        self.binance_limiter = rate_limiter.RateLimiter(
+            buckets={}, endpoints={rate_limiter.BINANCE_ORDER: []})
+        self.actions = []
+
+    def prepare_bybit_new_order(self, order: OrderedDict,
+                                ord_link_id: List[Union[str, None]]) -> None:
+        self.actions.append(('bybit_new', order))
+
+    def prepare_binance_new_order(
+            self, order: OrderedDict,
+            priority: int = rate_limiter.PRIORITY_HEDGE) -> None:
+        self.actions.append(('binance_new', order))
+
+    def prepare_binance_hedge(self, order: OrderedDict, ref_price: float,
+                              on_result: HedgeCallback) -> None:
+        self.actions.append(('binance_hedge', order))
+
+    def prepare_bybit_amend_order(
+            self, order: OrderedDict, side: str,
+            priority: int = rate_limiter.PRIORITY_REPRICE) -> bool:
+        self.actions.append(('bybit_amend', order))
+        return True
+
+    def on_bybit_order_update(self, order: dict) -> None:
+        pass
+
+
+class CrossCheck:
+    _bbo: np.ndarray
+    _gateway: BacktestGateway
+    _strategy: MMStrategy
+    _resting: Dict[str, dict]
+    row: int
+    fills: List[Tuple[int, int, float, int]]
+    hedges: List[Tuple[int, int]]
+
+    def __init__(self, bbo: np.ndarray,
+                 params: BacktestParams = BacktestParams()) -> None:
+        self._bbo = bbo
+        self._gateway = BacktestGateway()
+        self._strategy = get_strategy(gateway=self._gateway, params=params)
+        self._resting = {}
+        self.row = 0
+        self.fills = []
+        self.hedges = []
+
+    def send_order_update(self, order: dict, status: str) -> None:
+        self._strategy.on_bybit_order_update(
+            data={'data': [dict(order, order_status=status)]})
+
+    def process_actions(self) -> None:
+        bbo = self._bbo[self.row]
+        actions = self._gateway.actions
+        self._gateway.actions = []
+        for kind, order in actions:
+            if kind == 'binance_hedge':
+                contracts = int(order['quantity'])
+                self.hedges.append((self.row, contracts if order['side']
+                                    == 'BUY' else -contracts))
+                continue
+            if kind == 'bybit_new':
+                resting = {'order_link_id': order['order_link_id'],
+                           'side': order['side'],
+                           'price': float(order['price']),
+                           'qty': order['qty']}
+            else:
+                resting = self._resting.pop(order['order_link_id'])
+                resting['price'] = float(order['p_r_price'])
+                resting['qty'] = int(order.get('p_r_qty', resting['qty']))
+            is_bid = resting['side'] == 'Buy'
+            if resting['qty'] == 0 or (
+                    resting['price'] >= bbo[COL_BYBIT_ASK] if is_bid
+                    else resting['price'] <= bbo[COL_BYBIT_BID]):
+                self.send_order_update(order=resting, status='Cancelled')
+                continue
+            self._resting[resting['order_link_id']] = resting
+            self.send_order_update(order=resting, status='New')
+
+    def process_fills(self) -> None:
+        bbo = self._bbo[self.row]
+        for resting in sorted(self._resting.values(),
+                              key=lambda order: order['side']):
+            is_bid = resting['side'] == 'Buy'
+            if not (bbo[COL_BYBIT_ASK] <= resting['price'] if is_bid
+                    else bbo[COL_BYBIT_BID] >= resting['price']):
+                continue
+            del self._resting[resting['order_link_id']]
+            self.fills.append((self.row, SIDE_BID if is_bid else SIDE_ASK,
+                               resting['price'], resting['qty']))
+            self._strategy.on_bybit_execution(data={'data': [{
+                'side': resting['side'], 'exec_qty': resting['qty'],
+                'exec_type': 'Trade', 'leaves_qty': 0,
+                'order_link_id': resting['order_link_id']}]})
+            self.send_order_update(order=resting, status='Filled')
+            self.process_actions()
+
+    def run(self) -> None:
+        strat = self._strategy
+        bbo = self._bbo
+        strat.on_bybit_bbo_chg(data=(bbo[0, COL_BYBIT_BID],
+                                     bbo[0, COL_BYBIT_ASK]))
+        strat.on_binance_bbo_chg(data=(bbo[0, COL_BINANCE_BID],
+                                       bbo[0, COL_BINANCE_ASK]))
+        strat.on_bybit_position_snap(data={'result': {'size': 0,
+                                                      'side': 'None'}})
+        strat.on_binance_position_snap(data={'positionAmt': '0',
+                                             'positionSide': 'BOTH'})
+        for row in range(len(bbo)):
+            self.row = row
+            self.process_fills()
+            bybit_bbo = (bbo[row, COL_BYBIT_BID], bbo[row, COL_BYBIT_ASK])
+            binance_bbo = (bbo[row, COL_BINANCE_BID],
+                           bbo[row, COL_BINANCE_ASK])
+            if row > 0 and bybit_bbo == (bbo[row - 1, COL_BYBIT_BID],
+                                         bbo[row - 1, COL_BYBIT_ASK]):
+                strat.on_binance_bbo_chg(data=binance_bbo)
+            else:
+                strat._binance_bbo = list(binance_bbo)
+                strat.on_bybit_bbo_chg(data=bybit_bbo)
+            self.process_actions()
+
+
+def get_strategy(gateway: Union[BacktestGateway, None],
+                 params: BacktestParams) -> MMStrategy:
+    strat = MMStrategy(gateway=gateway)
+    strat._NET_FEE_OFFSET = params.net_fee_offset
+    strat._NET_PROFIT_OFFSET = params.net_profit_offset
+    strat._RISK_MEASURE = params.risk_measure
+    strat._UPDATE_INTERVAL = params.update_interval
+    strat._bybit_quote_size = params.quote_size
+    strat._inventory_limit = params.inventory_limit
+    return strat
+
+
+def cross_check(bbo: np.ndarray, params: BacktestParams = BacktestParams()
+                ) -> Dict[str, Union[int, float, bool]]:
+    event_start = time.perf_counter()
+    checker = CrossCheck(bbo=bbo, params=params)
+    checker.run()
+    event_elapsed = time.perf_counter() - event_start
+    vector_start = time.perf_counter()
+    result = run_backtest(bbo=bbo, params=params)
+    vector_elapsed = time.perf_counter() - vector_start
+    first_diff = None
+    for i, (expected, actual) in enumerate(zip(checker.fills,
+                                               result.fills)):
+        if expected != actual:
+            first_diff = i
+            break
+    return {'rows': len(bbo), 'event_fills': len(checker.fills),
+            'vector_fills': len(result.fills),
+            'event_hedges': len(checker.hedges),
+            'vector_hedges': len(result.hedges),
+            'first_fill_diff': first_diff,
+            'match': (checker.fills == result.fills
+                      and checker.hedges == result.hedges),
+            'event_elapsed': event_elapsed, 'vector_elapsed': vector_elapsed,
+            'speedup': event_elapsed / max(vector_elapsed, 1e-9)}
+
+
+class BboRecorder(Strategy):
+    _bybit_bbo: Union[Tuple[float, float], None]
+    _binance_bbo: Union[Tuple[float, float], None]
+    ts: float
+    rows: List[Tuple[float, float, float, float, float]]
+
+    def __init__(self) -> None:
+        self._bybit_bbo = None
+        self._binance_bbo = None
+        self.ts = 0.0
+        self.rows = []
+
+    def record(self) -> None:
+        if self._bybit_bbo is not None and self._binance_bbo is not None:
+            self.rows.append((self.ts,) + self._bybit_bbo
+                             + self._binance_bbo)
+
+    def on_bybit_bbo_chg(self, data: Tuple[float, float]) -> None:
+        self._bybit_bbo = tuple(data)
+        self.record()
+
+    def on_binance_bbo_chg(self, data: Tuple[float, float]) -> None:
+        self._binance_bbo = tuple(data)
+        self.record()
+
+
+def load_bbo_from_capture(file_path: str) -> np.ndarray:
+    recorder = BboRecorder()
+    driver = ReplayDriver(file_path=file_path,
+                          bybit_feed=BybitFeed(strat=recorder),
+                          binance_feed=BinanceFeed(strat=recorder))
+    for recv_ts, venue, kind, payload in capture.read_capture(
+            file_path=file_path):
+        recorder.ts = recv_ts / 1e9
+        driver.dispatch(venue=venue, kind=kind, payload=payload)
+    return np.array(recorder.rows, dtype=np.float64).reshape(-1, BBO_COLUMNS)
+
+
+def generate_bbo(n: int, price: float = 50000.0, volatility: float = 2e-5,
+                 seed: int = 5) -> np.ndarray:
+    rng = np.random.default_rng(seed=seed)
+    fair = price * np.exp(np.cumsum(rng.normal(scale=volatility, size=n)))
+    basis = np.cumsum(rng.normal(scale=0.2, size=n))
+    basis -= np.arange(n) * basis[-1] / max(n - 1, 1)
+    bybit_rows = rng.random(size=n) < 0.5
+    bybit_rows[0] = True
+    binance_rows = ~bybit_rows
+    binance_rows[0] = True
+    bybit_bid = np.floor(fair * 2) / 2 - 0.5 * (rng.random(size=n) < 0.1)
+    bybit_ask = bybit_bid + 0.5 * (1 + (rng.random(size=n) < 0.1))
+    binance_bid = (np.floor((fair + basis) * 10) / 10
+                   - 0.1 * rng.integers(0, 3, size=n))
+    binance_ask = binance_bid + 0.1 * (1 + rng.integers(0, 3, size=n))
+    last_bybit = np.maximum.accumulate(np.where(bybit_rows, np.arange(n), 0))
+    last_binance = np.maximum.accumulate(np.where(binance_rows, np.arange(n),
+                                                  0))
+    bbo = np.empty((n, BBO_COLUMNS), dtype=np.float64)
+    bbo[:, COL_TS] = np.arange(n) * 0.01
+    bbo[:, COL_BYBIT_BID] = bybit_bid[last_bybit]
+    bbo[:, COL_BYBIT_ASK] = bybit_ask[last_bybit]
+    bbo[:, COL_BINANCE_BID] = np.round(binance_bid[last_binance], 1)
+    bbo[:, COL_BINANCE_ASK] = np.round(binance_ask[last_binance], 1)
+    return bbo
+
+
+def save_bbo(file_path: str, bbo: np.ndarray) -> None:
+    np.save(file=file_path, arr=np.ascontiguousarray(bbo))
+
+
+def load_bbo(file_path: str, mmap: bool = True) -> np.ndarray:
+    return np.load(file=file_path, mmap_mode='r' if mmap else None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default=None,
+                        help='BBO array saved with --save')
+    parser.add_argument('--capture', default=None,
+                        help='build the BBO array from a capture file')
+    parser.add_argument('--synthetic', type=int, default=1000000,
+                        help='rows of synthetic BBO data when no input')
+    parser.add_argument('--save', default=None)
+    parser.add_argument('--cross-check', type=int, default=0,
+                        help='compare against MMStrategy on the first N '
+                             'rows')
+    args = parser.parse_args()
+    if args.data is not None:
+        bbo_data = load_bbo(file_path=args.data)
+    elif args.capture is not None:
+        bbo_data = load_bbo_from_capture(file_path=args.capture)
+    else:
+        bbo_data = generate_bbo(n=args.synthetic)
+    if args.save is not None:
+        save_bbo(file_path=args.save, bbo=bbo_data)
+    if args.cross_check:
+        print(json.dumps(obj=cross_check(bbo=bbo_data[:args.cross_check]),
+                         indent=2))
+    t_start = time.perf_counter()
+    backtest_result = run_backtest(bbo=bbo_data)
+    elapsed = time.perf_counter() - t_start
+    print(json.dumps(obj=dict(backtest_result.stats, elapsed=elapsed,
+                              rows_per_sec=len(bbo_data)
+                              / max(elapsed, 1e-9)), indent=2))
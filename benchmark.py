@@ -0,0 +1,549 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple, Union
+from urllib.parse import urlencode
+import api_auth
+import capture
+import decoder
+from feed import BybitFeed, BinanceFeed
+from order_book import BybitOrderBook, BinanceOrderBook
+from replay import StubGateway
+from strategy import Strategy, MMStrategy, get_random_string
+
+BYBIT_BOOK_TOPIC = 'orderBookL2_25.BTCUSD'
+PERCENTILES = (('p50', 0.5), ('p99', 0.99), ('p99.9', 0.999))
+
+
+class SyntheticBook:
+    _rng: random.Random
+    _ticks_per_unit: int
+    bids: Dict[int, int]
+    asks: Dict[int, int]
+
+    def __init__(self, depth: int, ticks_per_unit: int, mid_price: float,
+                 seed: int) -> None:
+        self._rng = random.Random(seed)
+        self._ticks_per_unit = ticks_per_unit
+        best_bid = int(mid_price * ticks_per_unit)
+        self.bids = {best_bid - i: self.get_size() for i in range(depth)}
+        self.asks = {best_bid + 1 + i: self.get_size() for i in range(depth)}
+
+    def get_size(self) -> int:
+        return self._rng.randint(1, 50000)
+
+    def to_price(self, tick: int) -> float:
+        return tick / self._ticks_per_unit
+
+    def step(self, churn: int, move_prob: float
+             ) -> Tuple[List[Tuple[bool, int]], List[Tuple[bool, int, int]],
+                        List[Tuple[bool, int, int]]]:
+        deletes = []
+        updates = []
+        inserts = []
+        rng = self._rng
+        for _ in range(churn):
+            is_bid = rng.random() < 0.5
+            levels = self.bids if is_bid else self.asks
+            tick = rng.choice(list(levels))
+            if rng.random() < 0.75 or len(levels) < 2:
+                levels[tick] = self.get_size()
+                updates.append((is_bid, tick, levels[tick]))
+            elif tick != (max(levels) if is_bid else min(levels)):
+                levels.pop(tick)
+                deletes.append((is_bid, tick))
+                span = len(levels) * 2
+                best = max(levels) if is_bid else min(levels)
+                new_tick = (best - rng.randint(1, span) if is_bid
+                            else best + rng.randint(1, span))
+                if new_tick not in levels:
+                    levels[new_tick] = self.get_size()
+                    inserts.append((is_bid, new_tick, levels[new_tick]))
+        if rng.random() < move_prob:
+            up = rng.random() < 0.5
+            src, dst = (self.asks, self.bids) if up else (self.bids, self.asks)
+            tick = min(src) if up else max(src)
+            if len(src) > 1:
+                src.pop(tick)
+                deletes.append((not up, tick))
+                dst[tick] = self.get_size()
+                inserts.append((up, tick, dst[tick]))
+                deep = min(dst) if up else max(dst)
+                dst.pop(deep)
+                deletes.append((up, deep))
+                far = max(src) + 1 if up else min(src) - 1
+                src[far] = self.get_size()
+                inserts.append((not up, far, src[far]))
+        return deletes, updates, inserts
+
+
+def get_bybit_level(book: SyntheticBook, is_bid: bool, tick: int,
+                    size: Union[int, None] = None) -> dict:
+    level = {'price': '%.2f' % book.to_price(tick=tick), 'symbol': 'BTCUSD',
+             'id': tick * 5000, 'side': 'Buy' if is_bid else 'Sell'}
+    if size is not None:
+        level['size'] = size
+    return level
+
+
+def generate_bybit_stream(n: int, depth: int, churn: int,
+                          move_prob: float = 0.1, seed: int = 1
+                          ) -> Tuple[dict, List[dict]]:
+    book = SyntheticBook(depth=depth, ticks_per_unit=2, mid_price=40000.0,
+                         seed=seed)
+    snapshot = {'topic': BYBIT_BOOK_TOPIC, 'type': 'snapshot',
+                'data': ([get_bybit_level(book=book, is_bid=True, tick=t,
+                                          size=s)
+                          for t, s in book.bids.items()]
+                         + [get_bybit_level(book=book, is_bid=False, tick=t,
+                                            size=s)
+                            for t, s in book.asks.items()])}
+    messages = []
+    for _ in range(n):
+        deletes, updates, inserts = book.step(churn=churn,
+                                              move_prob=move_prob)
+        messages.append(
+            {'topic': BYBIT_BOOK_TOPIC, 'type': 'delta',
+             'data': {'delete': [get_bybit_level(book=book, is_bid=b, tick=t)
+                                 for b, t in deletes],
+                      'update': [get_bybit_level(book=book, is_bid=b, tick=t,
+                                                 size=s)
+                                 for b, t, s in updates],
+                      'insert': [get_bybit_level(book=book, is_bid=b, tick=t,
+                                                 size=s)
+                                 for b, t, s in inserts]}})
+    return snapshot, messages
+
+
+def generate_binance_stream(n: int, depth: int, churn: int,
+                            move_prob: float = 0.1, seed: int = 2
+                            ) -> Tuple[dict, List[dict]]:
+    book = SyntheticBook(depth=depth, ticks_per_unit=10, mid_price=40000.0,
+                         seed=seed)
+    last_update_id = 999
+    snapshot = {'lastUpdateId': last_update_id + 1,
+                'bids': [['%.1f' % book.to_price(tick=t), str(s)]
+                         for t, s in sorted(book.bids.items(), reverse=True)],
+                'asks': [['%.1f' % book.to_price(tick=t), str(s)]
+                         for t, s in sorted(book.asks.items())]}
+    messages = []
+    for i in range(n):
+        deletes, updates, inserts = book.step(churn=churn,
+                                              move_prob=move_prob)
+        bids = []
+        asks = []
+        for is_bid, tick in deletes:
+            (bids if is_bid else asks).append(
+                ['%.1f' % book.to_price(tick=tick), '0'])
+        for is_bid, tick, size in updates + inserts:
+            (bids if is_bid else asks).append(
+                ['%.1f' % book.to_price(tick=tick), str(size)])
+        first_id = last_update_id + 1
+        last_update_id += 1 + i % 3
+        messages.append({'e': 'depthUpdate', 'E': i, 'T': i,
+                         's': 'BTCUSD_PERP', 'ps': 'BTCUSD', 'U': first_id,
+                         'u': last_update_id, 'pu': first_id - 1, 'b': bids,
+                         'a': asks})
+    return snapshot, messages
+
+
+def load_capture_streams(file_path: str
+                         ) -> Dict[str, Tuple[dict, List[dict]]]:
+    bybit_snapshot = None
+    bybit_messages = []
+    binance_snapshot = None
+    binance_messages = []
+    for _, venue, kind, payload in capture.read_capture(file_path=file_path):
+        data = json.loads(s=payload)
+        if venue == capture.VENUE_BYBIT and kind == capture.KIND_WS_FRAME:
+            if data.get('topic') == BYBIT_BOOK_TOPIC:
+                if data.get('type') == 'snapshot':
+                    if bybit_snapshot is None:
+                        bybit_snapshot = data
+                elif bybit_snapshot is not None:
+                    bybit_messages.append(data)
+        elif venue == capture.VENUE_BINANCE:
+            if kind == capture.KIND_DEPTH_SNAPSHOT:
+                if binance_snapshot is None:
+                    binance_snapshot = data
+            elif (kind == capture.KIND_WS_FRAME
+                  and data.get('e') == 'depthUpdate'
+                  and binance_snapshot is not None
+                  and data.get('u') >= binance_snapshot.get('lastUpdateId')):
+                binance_messages.append(data)
+    return {'bybit': (bybit_snapshot, bybit_messages),
+            'binance': (binance_snapshot, binance_messages)}
+
+
+def get_position_snapshots(strat: Strategy) -> None:
+    strat.on_bybit_position_snap(data={'result': {'size': 0,
+                                                  'side': 'None'}})
+    strat.on_binance_position_snap(data={'positionAmt': '0',
+                                         'positionSide': 'BOTH'})
+    strat.on_bybit_order_snap(data={'result': []})
+
+
+def setup_bybit_book(snapshot: dict) -> Callable[[dict], None]:
+    book = BybitOrderBook(depth_snapshot=snapshot)
+    return book.handle_delta
+
+
+def setup_binance_book(snapshot: dict) -> Callable[[dict], None]:
+    book = BinanceOrderBook(depth_snapshot=snapshot)
+    return book.parse_update
+
+
+def setup_bybit_feed(snapshot: dict) -> Callable[[dict], None]:
+    bybit_feed = BybitFeed(strat=Strategy())
+    bybit_feed.on_websocket(data=snapshot)
+    return bybit_feed.on_websocket
+
+
+def setup_binance_feed(snapshot: dict) -> Callable[[dict], None]:
+    binance_feed = BinanceFeed(strat=Strategy())
+    binance_feed.on_depth_snapshot(data=snapshot)
+    return binance_feed.on_websocket
+
+
+def setup_raw_frames(feed_object: Union[BybitFeed, BinanceFeed],
+                      frame_decoder: Union[decoder.BybitFrameDecoder,
+                                           decoder.BinanceFrameDecoder]
+                      ) -> Callable[[str], None]:
+    def on_frame(raw: str) -> None:
+        frame_type, message = frame_decoder.decode(raw=raw)
+        if frame_type == decoder.FRAME_BOOK_DELTA:
+            feed_object.on_book_delta(delta=message)
+        else:
+            feed_object.on_websocket(data=message)
+    return on_frame
+
+
+def setup_bybit_raw_feed(snapshot: dict) -> Callable[[str], None]:
+    bybit_feed = BybitFeed(strat=Strategy())
+    bybit_feed.on_websocket(data=snapshot)
+    return setup_raw_frames(feed_object=bybit_feed,
+                            frame_decoder=decoder.BybitFrameDecoder())
+
+
+def setup_binance_raw_feed(snapshot: dict) -> Callable[[str], None]:
+    binance_feed = BinanceFeed(strat=Strategy())
+    binance_feed.on_depth_snapshot(data=snapshot)
+    return setup_raw_frames(feed_object=binance_feed,
+                            frame_decoder=decoder.BinanceFrameDecoder())
+
+
+def to_raw_frames(messages: List[dict]) -> List[str]:
+    return [json.dumps(obj=message, separators=(',', ':'))
+            for message in messages]
+
+
+def setup_feed_to_quote(bybit_snapshot: dict, binance_snapshot: dict
+                        ) -> Callable[[Tuple[int, dict]], None]:
+    strat = MMStrategy(gateway=StubGateway())
+    get_position_snapshots(strat=strat)
+    feeds = (BybitFeed(strat=strat), BinanceFeed(strat=strat))
+    feeds[0].on_websocket(data=bybit_snapshot)
+    feeds[1].on_depth_snapshot(data=binance_snapshot)
+
+    def on_message(message: Tuple[int, dict]) -> None:
+        feeds[message[0]].on_websocket(data=message[1])
+    return on_message
+
+
+def setup_strategy_quotes() -> Callable[[Tuple[int, Tuple[float, float]]],
+                                        None]:
+    strat = MMStrategy(gateway=StubGateway())
+    get_position_snapshots(strat=strat)
+    strat.on_bybit_bbo_chg(data=(40000.0, 40000.5))
+    strat.on_binance_bbo_chg(data=(40000.1, 40000.2))
+
+    def on_bbo(message: Tuple[int, Tuple[float, float]]) -> None:
+        if message[0] == capture.VENUE_BYBIT:
+            strat.on_bybit_bbo_chg(data=message[1])
+        else:
+            strat.on_binance_bbo_chg(data=message[1])
+    return on_bbo
+
+
+def get_bench_auth(auth_class: type) -> api_auth.ApiAuth:
+    fd, file_path = tempfile.mkstemp(suffix='.json')
+    try:
+        with os.fdopen(fd, mode='w') as fp:
+            json.dump(obj={'id': get_random_string(n=18),
+                           'secret': get_random_string(n=36)}, fp=fp)
+        return auth_class(file_path=file_path)
+    finally:
+        os.remove(file_path)
+
+
+def encode_bybit_order_legacy(auth: api_auth.BybitApiAuth,
+                              order: OrderedDict) -> str:
+    order = OrderedDict(order)
+    order.update({'api_key': auth.key})
+    order.move_to_end(key='api_key', last=False)
+    order['timestamp'] = api_auth.get_milli_timestamp()
+    order['sign'] = api_auth.get_signature(secret=auth.secret,
+                                           message=urlencode(query=order))
+    return json.dumps(obj=order)
+
+
+def encode_binance_order_legacy(auth: api_auth.BinanceApiAuth,
+                                order: OrderedDict) -> str:
+    order = OrderedDict(order)
+    order['timestamp'] = api_auth.get_milli_timestamp()
+    order['signature'] = api_auth.get_signature(
+        secret=auth.secret, message=urlencode(query=order))
+    return urlencode(query=order)
+
+
+def get_order_stream(n: int, seed: int = 4) -> List[Tuple[int, OrderedDict]]:
+    rng = random.Random(seed)
+    strat = MMStrategy(gateway=StubGateway())
+    orders = []
+    for i in range(n):
+        price = 40000.0 + rng.randint(-200, 200) / 2
+        kind = i % 3
+        if kind == 0:
+            order = strat.get_bybit_new_limit_order(
+                ord_link_id=get_random_string(n=36), price=price,
+                qty=rng.randint(1, 5000), side=rng.choice(('Buy', 'Sell')))
+        elif kind == 1:
+            order = strat.get_bybit_order_cancel_replace(
+                ord_link_id=get_random_string(n=36), p_r_price=str(price),
+                p_r_qty=rng.choice((None, rng.randint(1, 5000))))
+        else:
+            order = strat.get_binance_new_market_order(
+                side=rng.choice(('BUY', 'SELL')), qty=rng.randint(1, 50))
+        orders.append((1 if kind == 2 else 0, order))
+    return orders
+
+
+def setup_order_encode(legacy: bool) -> Callable[[Tuple[int, OrderedDict]],
+                                                 str]:
+    bybit_auth = get_bench_auth(auth_class=api_auth.BybitApiAuth)
+    binance_auth = get_bench_auth(auth_class=api_auth.BinanceApiAuth)
+    if legacy:
+        encoders = (lambda order: encode_bybit_order_legacy(
+                        auth=bybit_auth, order=order),
+                    lambda order: encode_binance_order_legacy(
+                        auth=binance_auth, order=order))
+    else:
+        encoders = (lambda order: bybit_auth.get_order_auth_body(
+                        order=order),
+                    lambda order: binance_auth.get_order_auth_body(
+                        order=order))
+
+    def on_order(message: Tuple[int, OrderedDict]) -> str:
+        return encoders[message[0]](message[1])
+    return on_order
+
+
+def get_percentile(sorted_values: List[int], q: float) -> int:
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(q * (len(sorted_values) - 1) + 0.5))]
+
+
+def time_messages(handler: Callable, messages: list) -> Dict[str, float]:
+    latencies = [0] * len(messages)
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, message in enumerate(messages):
+        t0 = clock()
+        handler(message)
+        latencies[i] = clock() - t0
+    elapsed = clock() - start
+    latencies.sort()
+    result = {'messages': len(messages),
+              'msgs_per_sec': len(messages) / (elapsed / 1e9),
+              'mean_ns': sum(latencies) / len(latencies)}
+    for name, q in PERCENTILES:
+        result[name + '_ns'] = get_percentile(sorted_values=latencies, q=q)
+    return result
+
+
+def measure_allocations(handler: Callable, messages: list
+                        ) -> Dict[str, float]:
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    base_bytes, _ = tracemalloc.get_traced_memory()
+    peak_total = 0
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)
+    for message in messages:
+        if reset_peak is not None:
+            reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        handler(message)
+        _, peak = tracemalloc.get_traced_memory()
+        peak_total += peak - current
+    end_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks_after = sys.getallocatedblocks()
+    return {'peak_alloc_bytes_per_msg': peak_total / len(messages),
+            'net_alloc_bytes_per_msg': (end_bytes - base_bytes)
+            / len(messages),
+            'net_blocks_per_msg': (blocks_after - blocks_before)
+            / len(messages)}
+
+
+def run_benchmark(name: str, setup: Callable[[], Callable],
+                  messages: list, alloc: bool) -> Dict[str, float]:
+    result = {'name': name}
+    result.update(time_messages(handler=setup(), messages=messages))
+    if alloc:
+        result.update(measure_allocations(handler=setup(), messages=messages))
+    return result
+
+
+def get_bbo_stream(n: int, seed: int = 3
+                   ) -> List[Tuple[int, Tuple[float, float]]]:
+    rng = random.Random(seed)
+    mids = [40000.0, 40000.0]
+    stream = []
+    for i in range(n):
+        venue = i % 2
+        mids[venue] += rng.choice((-0.5, 0.0, 0.5))
+        stream.append((venue, (mids[venue] - 0.5, mids[venue])))
+    return stream
+
+
+def run_suite(streams: Dict[str, Tuple[dict, List[dict]]], alloc: bool
+              ) -> List[Dict[str, float]]:
+    bybit_snapshot, bybit_messages = streams['bybit']
+    binance_snapshot, binance_messages = streams['binance']
+    results = []
+    if bybit_messages:
+        results.append(run_benchmark(
+            name='bybit_book.handle_delta',
+            setup=lambda: setup_bybit_book(snapshot=bybit_snapshot),
+            messages=bybit_messages, alloc=alloc))
+        results.append(run_benchmark(
+            name='bybit_feed.on_websocket',
+            setup=lambda: setup_bybit_feed(snapshot=bybit_snapshot),
+            messages=bybit_messages, alloc=alloc))
+        results.append(run_benchmark(
+            name='bybit_decode+feed (%s)' % decoder.BACKEND,
+            setup=lambda: setup_bybit_raw_feed(snapshot=bybit_snapshot),
+            messages=to_raw_frames(messages=bybit_messages), alloc=alloc))
+    if binance_messages:
+        results.append(run_benchmark(
+            name='binance_book.parse_update',
+            setup=lambda: setup_binance_book(snapshot=binance_snapshot),
+            messages=binance_messages, alloc=alloc))
+        results.append(run_benchmark(
+            name='binance_feed.on_websocket',
+            setup=lambda: setup_binance_feed(snapshot=binance_snapshot),
+            messages=binance_messages, alloc=alloc))
+        results.append(run_benchmark(
+            name='binance_decode+feed (%s)' % decoder.BACKEND,
+            setup=lambda: setup_binance_raw_feed(snapshot=binance_snapshot),
+            messages=to_raw_frames(messages=binance_messages), alloc=alloc))
+    if bybit_messages and binance_messages:
+        merged = []
+        for i in range(max(len(bybit_messages), len(binance_messages))):
+            if i < len(bybit_messages):
+                merged.append((capture.VENUE_BYBIT, bybit_messages[i]))
+            if i < len(binance_messages):
+                merged.append((capture.VENUE_BINANCE, binance_messages[i]))
+        results.append(run_benchmark(
+            name='feed_to_quote',
+            setup=lambda: setup_feed_to_quote(
+                bybit_snapshot=bybit_snapshot,
+                binance_snapshot=binance_snapshot),
+            messages=merged, alloc=alloc))
+    results.append(run_benchmark(
+        name='strategy.compute_quote_targets+check_new_quotes',
+        setup=setup_strategy_quotes,
+        messages=get_bbo_stream(n=max(len(bybit_messages), 10000)),
+        alloc=alloc))
+    orders = get_order_stream(n=max(len(bybit_messages), 10000))
+    results.append(run_benchmark(
+        name='order_encode (legacy urlencode+json)',
+        setup=lambda: setup_order_encode(legacy=True), messages=orders,
+        alloc=alloc))
+    results.append(run_benchmark(
+        name='order_encode (template+prekeyed hmac)',
+        setup=lambda: setup_order_encode(legacy=False), messages=orders,
+        alloc=alloc))
+    return results
+
+
+def print_results(results: List[Dict[str, float]]) -> None:
+    print('%-50s %12s %10s %10s %10s %12s' % (
+        'benchmark', 'msgs/sec', 'p50 us', 'p99 us', 'p99.9 us',
+        'peak B/msg'))
+    for result in results:
+        print('%-50s %12.0f %10.2f %10.2f %10.2f %12s' % (
+            result['name'], result['msgs_per_sec'], result['p50_ns'] / 1e3,
+            result['p99_ns'] / 1e3, result['p99.9_ns'] / 1e3,
+            '%.0f' % result['peak_alloc_bytes_per_msg']
+            if 'peak_alloc_bytes_per_msg' in result else '-'))
+
+
+def compare_results(results: List[Dict[str, float]], baseline_path: str,
+                    threshold: float) -> bool:
+    with open(file=baseline_path) as fp:
+        baseline = {r['name']: r for r in json.load(fp=fp).get('results')}
+    regressed = False
+    for result in results:
+        base = baseline.get(result['name'])
+        if base is None:
+            continue
+        for key, higher_is_better in (('msgs_per_sec', True),
+                                      ('p50_ns', False), ('p99_ns', False)):
+            change = (result[key] - base[key]) / base[key]
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > threshold:
+                flag = ' REGRESSION'
+                regressed = True
+            print('%-50s %-14s %+7.1f%%%s' % (result['name'], key,
+                                              change * 100, flag))
+    return not regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--bybit-depth', type=int, default=25)
+    parser.add_argument('--binance-depth', type=int, default=1000)
+    parser.add_argument('--churn', type=int, default=4,
+                        help='level changes per synthetic message')
+    parser.add_argument('--move-prob', type=float, default=0.1,
+                        help='probability a synthetic message moves the BBO')
+    parser.add_argument('--capture', default=None,
+                        help='replay streams from a capture file instead of '
+                             'generating synthetic ones')
+    parser.add_argument('--no-alloc', action='store_true')
+    parser.add_argument('--save', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--threshold', type=float, default=0.1)
+    args = parser.parse_args()
+    if args.capture is not None:
+        bench_streams = load_capture_streams(file_path=args.capture)
+    else:
+        bench_streams = {
+            'bybit': generate_bybit_stream(
+                n=args.messages, depth=args.bybit_depth, churn=args.churn,
+                move_prob=args.move_prob),
+            'binance': generate_binance_stream(
+                n=args.messages, depth=args.binance_depth, churn=args.churn,
+                move_prob=args.move_prob)}
+    bench_results = run_suite(streams=bench_streams, alloc=not args.no_alloc)
+    print_results(results=bench_results)
+    if args.save is not None:
+        with open(file=args.save, mode='w') as out:
+            json.dump(obj={'python': platform.python_version(),
+                           'args': vars(args), 'results': bench_results},
+                      fp=out, indent=2)
+    if args.baseline is not None:
+        if not compare_results(results=bench_results,
+                               baseline_path=args.baseline,
+                               threshold=args.threshold):
+            sys.exit(1)
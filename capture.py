@@ -0,0 +1,49 @@
+import struct
+import time
+from typing import BinaryIO, Iterator, Tuple, Union
+
+VENUE_BYBIT = 0
+VENUE_BINANCE = 1
+KIND_WS_FRAME = 0
+KIND_DEPTH_SNAPSHOT = 1
+KIND_ORDER_SNAPSHOT = 2
+KIND_POSITION_SNAPSHOT = 3
+_HEADER = struct.Struct('<qBBI')
+
+
+class CaptureWriter:
+    _fp: BinaryIO
+    records: int
+
+    def __init__(self, file_path: str, buffer_size: int = 1 << 16) -> None:
+        self._fp = open(file=file_path, mode='ab', buffering=buffer_size)
+        self.records = 0
+
+    def write(self, venue: int, kind: int, payload: Union[str, bytes],
+              recv_ts: Union[int, None] = None) -> None:
+        if recv_ts is None:
+            recv_ts = time.time_ns()
+        if isinstance(payload, str):
+            payload = payload.encode('utf8')
+        self._fp.write(_HEADER.pack(recv_ts, venue, kind, len(payload)))
+        self._fp.write(payload)
+        self.records += 1
+
+    def flush(self) -> None:
+        self._fp.flush()
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def read_capture(file_path: str) -> Iterator[Tuple[int, int, int, bytes]]:
+    with open(file=file_path, mode='rb') as fp:
+        while True:
+            header = fp.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            recv_ts, venue, kind, length = _HEADER.unpack(header)
+            payload = fp.read(length)
+            if len(payload) < length:
+                return
+            yield recv_ts, venue, kind, payload
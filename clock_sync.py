@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Coroutine, Deque, Dict, Tuple, Union
+import aiohttp
+import event_log
+import latency
+from session_pool import VenueSession
+
+
+def get_bybit_server_ns(data: dict) -> Union[int, None]:
+    time_now = data.get('time_now')
+    return int(float(time_now) * 1e9) if time_now is not None else None
+
+
+def get_binance_server_ns(data: dict) -> Union[int, None]:
+    server_time = data.get('serverTime')
+    return server_time * 1000000 if server_time is not None else None
+
+
+class VenueClock:
+    _venue: str
+    _samples: Deque[Tuple[int, int]]
+    _max_rtt_ns: int
+    _BEST_FRACTION = 4
+    offset_ns: int
+    rtt_ns: int
+    samples: int
+    rejected: int
+    events: int
+    early_events: int
+
+    def __init__(self, venue: str, window: int = 32,
+                 max_rtt: float = 1.0) -> None:
+        self._venue = venue
+        self._samples = deque(maxlen=window)
+        self._max_rtt_ns = int(max_rtt * 1e9)
+        self.offset_ns = 0
+        self.rtt_ns = 0
+        self.samples = 0
+        self.rejected = 0
+        self.events = 0
+        self.early_events = 0
+
+    def get_milli_timestamp(self) -> int:
+        return (time.time_ns() + self.offset_ns) // 1000000
+
+    def on_server_time(self, send_ns: int, server_ns: int,
+                       recv_ns: int) -> None:
+        rtt_ns = recv_ns - send_ns
+        if not 0 <= rtt_ns <= self._max_rtt_ns:
+            self.rejected += 1
+            return
+        self.samples += 1
+        self._samples.append((rtt_ns, server_ns - (send_ns + recv_ns) // 2))
+        best = sorted(self._samples)[:max(
+            1, len(self._samples) // self._BEST_FRACTION)]
+        offsets = sorted(offset for _, offset in best)
+        self.offset_ns = offsets[len(offsets) // 2]
+        self.rtt_ns = best[0][0]
+
+    def on_event_time(self, event_ns: int, recv_ns: int) -> None:
+        self.events += 1
+        lag_ns = recv_ns + self.offset_ns - event_ns
+        if lag_ns < 0:
+            self.early_events += 1
+            lag_ns = 0
+        latency.RECORDER.record_value(stage=latency.STAGE_EXCHANGE,
+                                      venue=self._venue, value=lag_ns)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {'offset_ms': self.offset_ns / 1e6,
+                'rtt_ms': self.rtt_ns / 1e6,
+                'one_way_ms': self.rtt_ns / 2e6,
+                'samples': self.samples, 'rejected': self.rejected,
+                'events': self.events, 'early_events': self.early_events}
+
+
+class ClockSampler:
+    _clock: VenueClock
+    _session: VenueSession
+    _path: str
+    _get_server_ns: Callable[[dict], Union[int, None]]
+    _interval: float
+    _burst: int
+
+    def __init__(self, clock: VenueClock, session: VenueSession, path: str,
+                 get_server_ns: Callable[[dict], Union[int, None]],
+                 interval: float = 5.0, burst: int = 8) -> None:
+        self._clock = clock
+        self._session = session
+        self._path = path
+        self._get_server_ns = get_server_ns
+        self._interval = interval
+        self._burst = burst
+
+    async def sample(self) -> None:
+        send_ns = time.time_ns()
+        try:
+            data = await self._session.get_json(path=self._path)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            return
+        recv_ns = time.time_ns()
+        server_ns = self._get_server_ns(data)
+        if server_ns is not None:
+            self._clock.on_server_time(send_ns=send_ns, server_ns=server_ns,
+                                       recv_ns=recv_ns)
+
+    async def run(self) -> Coroutine:
+        for _ in range(self._burst):
+            await self.sample()
+        while True:
+            await asyncio.sleep(delay=self._interval)
+            await self.sample()
+
+
+CLOCKS = {latency.VENUE_BYBIT: VenueClock(venue=latency.VENUE_BYBIT),
+          latency.VENUE_BINANCE: VenueClock(venue=latency.VENUE_BINANCE)}
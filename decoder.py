@@ -0,0 +1,83 @@
+import json
+from typing import List, NamedTuple, Sequence, Tuple, Union
+
+try:
+    import orjson
+    loads = orjson.loads
+    BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+        loads = ujson.loads
+        BACKEND = 'ujson'
+    except ImportError:
+        loads = json.loads
+        BACKEND = 'json'
+
+FRAME_MESSAGE = 0
+FRAME_BOOK_DELTA = 1
+
+
+class BybitBookDelta(NamedTuple):
+    deletes: List[Tuple[bool, float]]
+    updates: List[Tuple[bool, float, int]]
+    inserts: List[Tuple[bool, float, int]]
+    cross_seq: int
+    topic: str = ''
+    timestamp_e6: int = 0
+
+
+class BinanceDepthUpdate(NamedTuple):
+    first_update_id: int
+    last_update_id: int
+    prev_update_id: int
+    event_time: int
+    bids: List[Tuple[float, int]]
+    asks: List[Tuple[float, int]]
+    symbol: str = ''
+
+
+def bybit_delta_from_dict(data: dict) -> BybitBookDelta:
+    levels = data['data']
+    return BybitBookDelta(
+        deletes=[(level['side'] == 'Buy', float(level['price']))
+                 for level in levels['delete']],
+        updates=[(level['side'] == 'Buy', float(level['price']),
+                  level['size']) for level in levels['update']],
+        inserts=[(level['side'] == 'Buy', float(level['price']),
+                  level['size']) for level in levels['insert']],
+        cross_seq=data.get('cross_seq', 0), topic=data.get('topic', ''),
+        timestamp_e6=data.get('timestamp_e6', 0))
+
+
+def binance_depth_from_dict(data: dict) -> BinanceDepthUpdate:
+    return BinanceDepthUpdate(
+        first_update_id=data['U'], last_update_id=data['u'],
+        prev_update_id=data['pu'], event_time=data['E'],
+        bids=[(float(price), int(size)) for price, size in data['b']],
+        asks=[(float(price), int(size)) for price, size in data['a']],
+        symbol=data.get('s', ''))
+
+
+class BybitFrameDecoder:
+    _delta_prefixes: Tuple[str, ...]
+
+    def __init__(self, book_topics: Sequence[str] = (
+            'orderBookL2_25.BTCUSD',)) -> None:
+        self._delta_prefixes = tuple('{"topic":"%s","type":"delta"' % topic
+                                     for topic in book_topics)
+
+    def decode(self, raw: str) -> Tuple[int, Union[BybitBookDelta, dict]]:
+        if raw.startswith(self._delta_prefixes):
+            return FRAME_BOOK_DELTA, bybit_delta_from_dict(data=loads(raw))
+        return FRAME_MESSAGE, loads(raw)
+
+
+class BinanceFrameDecoder:
+    _DEPTH_PREFIX = '{"e":"depthUpdate"'
+
+    def decode(self, raw: str) -> Tuple[int, Union[BinanceDepthUpdate,
+                                                   dict]]:
+        if raw.startswith(self._DEPTH_PREFIX):
+            return FRAME_BOOK_DELTA, binance_depth_from_dict(data=loads(raw))
+        return FRAME_MESSAGE, loads(raw)
@@ -0,0 +1,283 @@
+import atexit
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from asyncio import AbstractEventLoop
+from collections import deque
+from typing import BinaryIO, Deque, Iterator, List, NamedTuple, Tuple, Union
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING',
+               ERROR: 'ERROR'}
+_BINARY_HEADER = struct.Struct('<qBHddH')
+
+Record = Tuple[int, int, int, object, float, float]
+
+
+class LogEvent(NamedTuple):
+    name: str
+    fmt: str
+
+
+EVENTS: List[LogEvent] = []
+
+
+def register_event(name: str, fmt: str) -> int:
+    EVENTS.append(LogEvent(name=name, fmt=fmt))
+    return len(EVENTS) - 1
+
+
+EVENT_MESSAGE = register_event(name='message', fmt='{0}')
+EVENT_EXCEPTION = register_event(name='exception', fmt='{0}')
+EVENT_ORDER_STATUS = register_event(name='order_status', fmt='{0}')
+EVENT_CANCEL_UNKNOWN = register_event(
+    name='cancel_unknown', fmt='Cancellation not in active orders {0}')
+EVENT_QUOTE_CANCELLED = register_event(name='quote_cancelled',
+                                       fmt='{0} cancelled/rejected')
+EVENT_HEDGE = register_event(name='hedge', fmt='HEDGE {0}: {1:g}')
+EVENT_FILLED = register_event(name='filled', fmt='FILLED {0} {1:g}')
+EVENT_RISK_LIMIT = register_event(
+    name='risk_limit', fmt='Gross exposure limit, no {0} order placed')
+EVENT_ORDER_PLACED = register_event(
+    name='order_placed', fmt='Placed new {0} limit {2:g} @ {1}')
+EVENT_ORDER_SIZE_ZERO = register_event(
+    name='order_size_zero', fmt='{0} order size 0, no order placed')
+EVENT_BINANCE_RESPONSE = register_event(
+    name='binance_response', fmt='Binance Response Status: {1:g}')
+EVENT_RATE_LIMITED = register_event(
+    name='rate_limited', fmt='Rate limited {0}, priority {1:g}')
+EVENT_TRANSPORT_FALLBACK = register_event(
+    name='transport_fallback',
+    fmt='{0} order websocket unavailable, sent over REST')
+EVENT_ORDER_TIMEOUT = register_event(
+    name='order_timeout', fmt='{0} order not acked within {1:g}s')
+EVENT_ORDER_UNCONFIRMED = register_event(
+    name='order_unconfirmed', fmt='{0} order not confirmed within {1:g}s')
+EVENT_HEDGE_FAILED = register_event(
+    name='hedge_failed', fmt='HEDGE {0}: {1:g} contracts not filled')
+EVENT_HEDGE_UNRESOLVED = register_event(
+    name='hedge_unresolved',
+    fmt='HEDGE {0}: outcome of {1:g} contracts still unknown')
+
+
+class RotatingWriter:
+    _file_path: str
+    _max_bytes: int
+    _backup_count: int
+    _fp: BinaryIO
+    _size: int
+
+    def __init__(self, file_path: str, max_bytes: int = 64 << 20,
+                 backup_count: int = 5) -> None:
+        self._file_path = file_path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._fp = open(file=file_path, mode='ab')
+        self._size = self._fp.tell()
+
+    def write(self, data: bytes) -> None:
+        if self._size and self._size + len(data) > self._max_bytes:
+            self.rotate()
+        self._fp.write(data)
+        self._fp.flush()
+        self._size += len(data)
+
+    def rotate(self) -> None:
+        self._fp.close()
+        for i in range(self._backup_count - 1, 0, -1):
+            source = f'{self._file_path}.{i}'
+            if os.path.exists(source):
+                os.replace(source, f'{self._file_path}.{i + 1}')
+        if self._backup_count:
+            os.replace(self._file_path, self._file_path + '.1')
+        self._fp = open(file=self._file_path, mode='wb')
+        self._size = 0
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+class StreamWriter:
+    _fp: BinaryIO
+
+    def __init__(self, fp: BinaryIO = sys.stdout.buffer) -> None:
+        self._fp = fp
+
+    def write(self, data: bytes) -> None:
+        self._fp.write(data)
+        self._fp.flush()
+
+    def close(self) -> None:
+        self._fp.flush()
+
+
+def get_text(text: object) -> str:
+    return text if isinstance(text, str) else repr(text)
+
+
+def format_record(record: Record) -> str:
+    ts_ns, level, event, text, value0, value1 = record
+    return '%s.%06d %s %s %s\n' % (
+        time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts_ns // 10 ** 9)),
+        ts_ns // 1000 % 10 ** 6, LEVEL_NAMES.get(level, level),
+        EVENTS[event].name,
+        EVENTS[event].fmt.format(get_text(text=text), value0, value1))
+
+
+def pack_record(record: Record) -> bytes:
+    ts_ns, level, event, text, value0, value1 = record
+    text = get_text(text=text).encode('utf8')[:0xffff]
+    return _BINARY_HEADER.pack(ts_ns, level, event, value0, value1,
+                               len(text)) + text
+
+
+def read_binary_log(file_path: str) -> Iterator[Record]:
+    with open(file=file_path, mode='rb') as fp:
+        data = fp.read()
+    offset = 0
+    while offset + _BINARY_HEADER.size <= len(data):
+        ts_ns, level, event, value0, value1, length = (
+            _BINARY_HEADER.unpack_from(data, offset))
+        offset += _BINARY_HEADER.size
+        text = data[offset:offset + length].decode('utf8')
+        offset += length
+        yield ts_ns, level, event, text, value0, value1
+
+
+class EventLogger:
+    level: int
+    binary: bool
+    _queue: Deque[Record]
+    _max_queue: int
+    _writer: Union[RotatingWriter, StreamWriter, None]
+    _thread: Union[threading.Thread, None]
+    _stopped: threading.Event
+    _flush_interval: float
+    dropped: int
+    written: int
+
+    def __init__(self, level: int = INFO, max_queue: int = 1 << 16) -> None:
+        self.level = level
+        self.binary = False
+        self._queue = deque()
+        self._max_queue = max_queue
+        self._writer = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._flush_interval = 0.05
+        self.dropped = 0
+        self.written = 0
+
+    def log(self, level: int, event: int, text: object = '',
+            value0: float = 0.0, value1: float = 0.0) -> None:
+        if level < self.level:
+            return
+        if len(self._queue) >= self._max_queue:
+            self.dropped += 1
+            return
+        self._queue.append((time.time_ns(), level, event, text, value0,
+                            value1))
+
+    def debug(self, event: int, text: object = '', value0: float = 0.0,
+              value1: float = 0.0) -> None:
+        if self.level <= DEBUG:
+            self.log(level=DEBUG, event=event, text=text, value0=value0,
+                     value1=value1)
+
+    def info(self, event: int, text: object = '', value0: float = 0.0,
+             value1: float = 0.0) -> None:
+        if self.level <= INFO:
+            self.log(level=INFO, event=event, text=text, value0=value0,
+                     value1=value1)
+
+    def warning(self, event: int, text: object = '', value0: float = 0.0,
+                value1: float = 0.0) -> None:
+        if self.level <= WARNING:
+            self.log(level=WARNING, event=event, text=text, value0=value0,
+                     value1=value1)
+
+    def error(self, event: int, text: object = '', value0: float = 0.0,
+              value1: float = 0.0) -> None:
+        if self.level <= ERROR:
+            self.log(level=ERROR, event=event, text=text, value0=value0,
+                     value1=value1)
+
+    def set_level(self, level: int) -> None:
+        self.level = level
+
+    def toggle_debug(self) -> None:
+        self.level = DEBUG if self.level > DEBUG else INFO
+
+    def start(self, file_path: Union[str, None] = None, binary: bool = False,
+              max_bytes: int = 64 << 20, backup_count: int = 5,
+              flush_interval: float = 0.05) -> None:
+        if self._thread is not None:
+            return
+        self.binary = binary and file_path is not None
+        self._writer = (RotatingWriter(file_path=file_path,
+                                       max_bytes=max_bytes,
+                                       backup_count=backup_count)
+                        if file_path is not None else StreamWriter())
+        self._flush_interval = flush_interval
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name='event-log',
+                                        daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def run(self) -> None:
+        while not self._stopped.wait(timeout=self._flush_interval):
+            self.flush()
+        self.flush()
+
+    def drain(self) -> List[Record]:
+        queue = self._queue
+        records = []
+        while queue:
+            records.append(queue.popleft())
+        return records
+
+    def flush(self) -> None:
+        records = self.drain()
+        if not records or self._writer is None:
+            return
+        if self.binary:
+            data = b''.join(pack_record(record=record) for record in records)
+        else:
+            data = ''.join(format_record(record=record)
+                           for record in records).encode('utf8')
+        self._writer.write(data=data)
+        self.written += len(records)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self._writer.close()
+        self._writer = None
+
+    def get_stats(self) -> dict:
+        return {'level': LEVEL_NAMES.get(self.level, self.level),
+                'queued': len(self._queue), 'written': self.written,
+                'dropped': self.dropped}
+
+
+LOGGER = EventLogger()
+
+
+def install_level_signal(loop: AbstractEventLoop,
+                         signum: int = signal.SIGUSR2) -> None:
+    loop.add_signal_handler(signum, LOGGER.toggle_debug)
+
+
+if __name__ == '__main__':
+    for log_record in read_binary_log(file_path=sys.argv[1]):
+        sys.stdout.write(format_record(record=log_record))
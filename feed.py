@@ -1,20 +1,84 @@
-from typing import Union, Tuple
+from typing import Callable, Deque, Dict, List, Union, Tuple
+from collections import deque
+import asyncio
 from abc import abstractmethod
 from order_book import BybitOrderBook, BinanceOrderBook
+from shm_book import ShmBookWriter
 import strategy
+import latency
+import event_log
+from decoder import (BybitBookDelta, BinanceDepthUpdate,
+                     binance_depth_from_dict)
 
 
 class Feed:
-    _last_bbo: Tuple[float, float]
+    _last_bbo: Union[Tuple[float, float], None]
     _strategy: strategy.Strategy
+    _conflate: bool
+    _pending_bbo: Union[Tuple[float, float], None]
+    _last_published_bbo: Union[Tuple[float, float], None]
+    bbo_updates: int
+    bbo_published: int
+    bbo_conflated: int
+    _book_writer: Union[ShmBookWriter, None]
+    _ticks_per_unit: Union[int, None]
 
-    def __init__(self, strat: strategy.Strategy) -> None:
+    def __init__(self, strat: strategy.Strategy, conflate: bool = False,
+                 book_writer: Union[ShmBookWriter, None] = None,
+                 ticks_per_unit: Union[int, None] = None) -> None:
         self._strategy = strat
+        self._conflate = conflate
+        self._book_writer = book_writer
+        self._ticks_per_unit = ticks_per_unit
+        self._pending_bbo = None
+        self._last_published_bbo = None
+        self.bbo_updates = 0
+        self.bbo_published = 0
+        self.bbo_conflated = 0
 
     @abstractmethod
     def on_websocket(self, data: dict) -> None:
         pass
 
+    @abstractmethod
+    def notify_bbo(self, bbo: Tuple[float, float]) -> None:
+        pass
+
+    def publish_bbo(self, bbo: Tuple[float, float]) -> None:
+        self.bbo_updates += 1
+        if not self._conflate:
+            self._last_published_bbo = bbo
+            self.bbo_published += 1
+            self.notify_bbo(bbo=bbo)
+            return
+        if self._pending_bbo is None:
+            asyncio.get_running_loop().call_soon(self.flush_bbo)
+        else:
+            self.bbo_conflated += 1
+        self._pending_bbo = bbo
+
+    def flush_bbo(self) -> None:
+        bbo = self._pending_bbo
+        self._pending_bbo = None
+        if bbo is None:
+            return
+        if bbo == self._last_published_bbo:
+            self.bbo_conflated += 1
+            return
+        self._last_published_bbo = bbo
+        self.bbo_published += 1
+        self.notify_bbo(bbo=bbo)
+
+    def write_book(self, bbo: Tuple[float, float]) -> None:
+        if self._book_writer is not None:
+            self._book_writer.publish_book(order_book=self._order_book,
+                                           bbo=bbo)
+
+    def get_conflation_stats(self) -> Dict[str, int]:
+        return {'bbo_updates': self.bbo_updates,
+                'bbo_published': self.bbo_published,
+                'bbo_conflated': self.bbo_conflated}
+
     def on_order_snapshot(self, data: dict) -> None:
         pass
 
@@ -27,35 +91,82 @@ class Feed:
     def on_depth_snapshot(self, data):
         pass
 
+    def on_book_delta(self, delta) -> None:
+        pass
+
+    def get_feed(self, symbol: str) -> 'Feed':
+        return self
+
 
 class BybitFeed(Feed):
-    _order_book: BybitOrderBook
+    _order_book: Union[BybitOrderBook, None]
+    book_topic: str
 
-    def __init__(self, strat: strategy.Strategy) -> None:
-        super().__init__(strat=strat)
+    def __init__(self, strat: strategy.Strategy, conflate: bool = False,
+                 book_topic: str = 'orderBookL2_25.BTCUSD',
+                 book_writer: Union[ShmBookWriter, None] = None,
+                 ticks_per_unit: Union[int, None] = None) -> None:
+        super().__init__(strat=strat, conflate=conflate,
+                         book_writer=book_writer,
+                         ticks_per_unit=ticks_per_unit)
+        self.book_topic = book_topic
+        self._order_book = None
+
+    def notify_bbo(self, bbo: Tuple[float, float]) -> None:
+        self._strategy.on_bybit_bbo_chg(data=bbo)
 
     def on_websocket(self, data: dict) -> None:
-        if data.get('topic') == 'orderBookL2_25.BTCUSD':
+        topic = data.get('topic')
+        if topic == self.book_topic:
             self.handle_order_book_l2(data=data)
-        elif data.get('topic') == 'order':
+        elif topic == 'order':
             self._strategy.on_bybit_order_update(data=data)
-        elif data.get('topic') == 'execution':
+        elif topic == 'execution':
             self._strategy.on_bybit_execution(data=data)
 
+    def on_book_reset(self) -> None:
+        self._order_book = None
+        self._strategy.on_bybit_book(order_book=None)
+
+    def on_book_delta(self, delta: BybitBookDelta) -> None:
+        if self._order_book is None:
+            return
+        book_ts = latency.clock()
+        self._order_book.apply_levels(deletes=delta.deletes,
+                                      updates=delta.updates,
+                                      inserts=delta.inserts)
+        latency.RECORDER.record(stage=latency.STAGE_BOOK,
+                                venue=latency.VENUE_BYBIT, start_ns=book_ts)
+        curr_bbo = self._order_book.get_bbo()
+        if curr_bbo is None:
+            return
+        self.write_book(bbo=curr_bbo)
+        if curr_bbo != self._last_bbo:
+            self.publish_bbo(bbo=curr_bbo)
+        self._last_bbo = curr_bbo
+
     def handle_order_book_l2(self, data: dict) -> None:
         if data.get('type') == 'snapshot':
             self._order_book = BybitOrderBook(
-                depth_snapshot=data)
-            curr_bbo = (self._order_book.bids[0][0],
-                        self._order_book.asks[0][0])
-            self._strategy.on_bybit_bbo_chg(data=curr_bbo)
+                depth_snapshot=data, ticks_per_unit=self._ticks_per_unit)
+            self._strategy.on_bybit_book(order_book=self._order_book)
+            curr_bbo = self._order_book.get_bbo()
+            if curr_bbo is not None:
+                self.write_book(bbo=curr_bbo)
+                self.publish_bbo(bbo=curr_bbo)
             self._last_bbo = curr_bbo
-        else:
+        elif self._order_book is not None:
+            book_ts = latency.clock()
             self._order_book.handle_delta(delta_message=data)
-            curr_bbo = (self._order_book.bids[0][0],
-                        self._order_book.asks[0][0])
+            latency.RECORDER.record(stage=latency.STAGE_BOOK,
+                                    venue=latency.VENUE_BYBIT,
+                                    start_ns=book_ts)
+            curr_bbo = self._order_book.get_bbo()
+            if curr_bbo is None:
+                return
+            self.write_book(bbo=curr_bbo)
             if curr_bbo != self._last_bbo:
-                self._strategy.on_bybit_bbo_chg(data=curr_bbo)
+                self.publish_bbo(bbo=curr_bbo)
             self._last_bbo = curr_bbo
 
     def on_order_snapshot(self, data: dict) -> None:
@@ -66,54 +177,235 @@ class BybitFeed(Feed):
 
 
 class BinanceFeed(Feed):
-    _buf_depth_updates = []
-    _order_book: Union[None, BinanceOrderBook] = None
+    SYNC_WAITING_SNAPSHOT = 0
+    SYNC_LIVE = 1
+    SEQ_OK = 0
+    SEQ_STALE = 1
+    SEQ_GAP = 2
+    _buf_depth_updates: Deque[BinanceDepthUpdate]
+    _order_book: Union[None, BinanceOrderBook]
+    _sync_state: int
+    _last_update_id: int
+    _snapshot_update_id: Union[int, None]
+    _snapshot_pending: bool
+    _request_snapshot: Union[Callable[[], None], None]
+    gaps: int
+    resyncs: int
+    stale_dropped: int
+    buffer_overflows: int
+    symbol: str
+
+    def __init__(self, strat: strategy.Strategy, conflate: bool = False,
+                 max_buffered_updates: int = 1000,
+                 symbol: str = 'BTCUSD_PERP',
+                 book_writer: Union[ShmBookWriter, None] = None,
+                 ticks_per_unit: Union[int, None] = None) -> None:
+        super().__init__(strat=strat, conflate=conflate,
+                         book_writer=book_writer,
+                         ticks_per_unit=ticks_per_unit)
+        self.symbol = symbol
+        self._buf_depth_updates = deque(maxlen=max_buffered_updates)
+        self._order_book = None
+        self._sync_state = self.SYNC_WAITING_SNAPSHOT
+        self._last_update_id = 0
+        self._snapshot_update_id = None
+        self._snapshot_pending = False
+        self._request_snapshot = None
+        self.gaps = 0
+        self.resyncs = 0
+        self.stale_dropped = 0
+        self.buffer_overflows = 0
 
-    def __init__(self, strat: strategy.Strategy) -> None:
-        super().__init__(strat=strat)
+    def notify_bbo(self, bbo: Tuple[float, float]) -> None:
+        self._strategy.on_binance_bbo_chg(data=bbo)
+
+    def set_snapshot_requester(self, requester: Callable[[], None]) -> None:
+        self._request_snapshot = requester
 
     def on_websocket(self, data: dict) -> None:
         if data.get('e') == 'depthUpdate':
-            self.handle_book_delta(data=data)
+            self.handle_book_delta(
+                update=binance_depth_from_dict(data=data))
+
+    def on_book_delta(self, delta: BinanceDepthUpdate) -> None:
+        self.handle_book_delta(update=delta)
 
     def on_depth_snapshot(self, data: dict) -> None:
+        self._snapshot_pending = False
         self.handle_book_snapshot(data=data)
 
     def on_position_snapshot(self, data: list) -> None:
         for pos in data:
-            if pos.get('symbol') == 'BTCUSD_PERP':
+            if pos.get('symbol') == self.symbol:
                 self._strategy.on_binance_position_snap(data=pos)
                 break
 
     def on_book_reset(self) -> None:
         self._order_book = None
+        self._strategy.on_binance_book(order_book=None)
+        self._sync_state = self.SYNC_WAITING_SNAPSHOT
+        self._snapshot_update_id = None
+        self._snapshot_pending = False
+        self._buf_depth_updates.clear()
 
-    def handle_book_delta(self, data: dict) -> None:
-        if self._order_book is None:
-            self._buf_depth_updates.append(data)
-        else:
-            self._order_book.parse_update(depth_update=data)
-            curr_bbo = (self._order_book.bids[0][0],
-                        self._order_book.asks[0][0])
-            if curr_bbo != self._last_bbo:
-                self._strategy.on_binance_bbo_chg(data=curr_bbo)
-            self._last_bbo = curr_bbo
+    def is_live(self) -> bool:
+        return self._sync_state == self.SYNC_LIVE
+
+    def get_sync_stats(self) -> Dict[str, int]:
+        return {'gaps': self.gaps, 'resyncs': self.resyncs,
+                'stale_dropped': self.stale_dropped,
+                'buffer_overflows': self.buffer_overflows,
+                'buffered': len(self._buf_depth_updates)}
+
+    def check_sequence(self, update: BinanceDepthUpdate) -> int:
+        if self._snapshot_update_id is not None:
+            if update.last_update_id < self._snapshot_update_id:
+                return self.SEQ_STALE
+            if update.first_update_id > self._snapshot_update_id:
+                return self.SEQ_GAP
+            self._snapshot_update_id = None
+            return self.SEQ_OK
+        if update.prev_update_id != self._last_update_id:
+            return self.SEQ_GAP
+        return self.SEQ_OK
+
+    def buffer_update(self, update: BinanceDepthUpdate) -> None:
+        if len(self._buf_depth_updates) == self._buf_depth_updates.maxlen:
+            self.buffer_overflows += 1
+        self._buf_depth_updates.append(update)
+
+    def request_snapshot(self) -> None:
+        if not self._snapshot_pending and self._request_snapshot is not None:
+            self._snapshot_pending = True
+            self._request_snapshot()
+
+    def resync(self) -> None:
+        self._order_book = None
+        self._strategy.on_binance_book(order_book=None)
+        self._sync_state = self.SYNC_WAITING_SNAPSHOT
+        self._snapshot_update_id = None
+        self.resyncs += 1
+        if self._request_snapshot is None:
+            event_log.LOGGER.warning(
+                event=event_log.EVENT_MESSAGE,
+                text='Binance resync without snapshot requester: '
+                     + self.symbol)
+            return
+        self.request_snapshot()
+
+    def handle_book_delta(self, update: BinanceDepthUpdate) -> None:
+        if self._sync_state != self.SYNC_LIVE:
+            self.buffer_update(update=update)
+            return
+        seq_status = self.check_sequence(update=update)
+        if seq_status == self.SEQ_STALE:
+            self.stale_dropped += 1
+            return
+        if seq_status == self.SEQ_GAP:
+            self.gaps += 1
+            self.resync()
+            self.buffer_update(update=update)
+            return
+        book_ts = latency.clock()
+        self._order_book.apply_levels(bids=update.bids, asks=update.asks)
+        latency.RECORDER.record(stage=latency.STAGE_BOOK,
+                                venue=latency.VENUE_BINANCE, start_ns=book_ts)
+        self._last_update_id = update.last_update_id
+        curr_bbo = self._order_book.get_bbo()
+        if curr_bbo is None:
+            return
+        self.write_book(bbo=curr_bbo)
+        if curr_bbo != self._last_bbo:
+            self.publish_bbo(bbo=curr_bbo)
+        self._last_bbo = curr_bbo
 
     def handle_book_snapshot(self, data: dict) -> None:
-        self._order_book = BinanceOrderBook(depth_snapshot=data)
-        self.remove_prior_depth_updates(depth_snapshot=data)
-        for update in self._buf_depth_updates:
-            self._order_book.parse_update(depth_update=update)
-        self._buf_depth_updates.clear()
-        curr_bbo = (self._order_book.bids[0][0],
-                    self._order_book.asks[0][0])
-        self._strategy.on_binance_bbo_chg(data=curr_bbo)
+        self._order_book = BinanceOrderBook(
+            depth_snapshot=data, ticks_per_unit=self._ticks_per_unit)
+        self._strategy.on_binance_book(order_book=self._order_book)
+        self._snapshot_update_id = data.get('lastUpdateId')
+        self._last_update_id = self._snapshot_update_id
+        buffered = self._buf_depth_updates
+        while buffered:
+            update = buffered.popleft()
+            seq_status = self.check_sequence(update=update)
+            if seq_status == self.SEQ_STALE:
+                self.stale_dropped += 1
+                continue
+            if seq_status == self.SEQ_GAP:
+                self.gaps += 1
+                buffered.appendleft(update)
+                self.resync()
+                return
+            self._order_book.apply_levels(bids=update.bids, asks=update.asks)
+            self._last_update_id = update.last_update_id
+        self._sync_state = self.SYNC_LIVE
+        curr_bbo = self._order_book.get_bbo()
+        if curr_bbo is not None:
+            self.write_book(bbo=curr_bbo)
+            self.publish_bbo(bbo=curr_bbo)
         self._last_bbo = curr_bbo
 
-    def remove_prior_depth_updates(self, depth_snapshot: dict):
-        removed_updates = []
-        for update in self._buf_depth_updates:
-            if update.get('u') < depth_snapshot.get('lastUpdateId'):
-                removed_updates.append(update)
-        for update in removed_updates:
-            self._buf_depth_updates.remove(update)
+
+class BybitFeedRouter:
+    _feeds: Dict[str, BybitFeed]
+    _book_feeds: Dict[str, BybitFeed]
+
+    def __init__(self, feeds: Dict[str, BybitFeed]) -> None:
+        self._feeds = feeds
+        self._book_feeds = {feed.book_topic: feed for feed in feeds.values()}
+
+    def get_feed(self, symbol: str) -> BybitFeed:
+        return self._feeds[symbol]
+
+    def on_websocket(self, data: dict) -> None:
+        book_feed = self._book_feeds.get(data.get('topic'))
+        if book_feed is not None:
+            book_feed.on_websocket(data=data)
+            return
+        by_symbol: Dict[str, List[dict]] = {}
+        for item in data.get('data', ()):
+            by_symbol.setdefault(item.get('symbol'), []).append(item)
+        for symbol, items in by_symbol.items():
+            symbol_feed = self._feeds.get(symbol)
+            if symbol_feed is not None:
+                symbol_feed.on_websocket(data=dict(data, data=items))
+
+    def on_book_delta(self, delta: BybitBookDelta) -> None:
+        self._book_feeds[delta.topic].on_book_delta(delta=delta)
+
+    def on_book_reset(self) -> None:
+        for symbol_feed in self._feeds.values():
+            symbol_feed.on_book_reset()
+
+
+class BinanceFeedRouter:
+    _feeds: Dict[str, BinanceFeed]
+
+    def __init__(self, feeds: Dict[str, BinanceFeed]) -> None:
+        self._feeds = feeds
+
+    def get_feed(self, symbol: str) -> BinanceFeed:
+        return self._feeds[symbol]
+
+    def on_websocket(self, data: dict) -> None:
+        symbol_feed = self._feeds.get(data.get('s'))
+        if symbol_feed is not None:
+            symbol_feed.on_websocket(data=data)
+
+    def on_book_delta(self, delta: BinanceDepthUpdate) -> None:
+        symbol_feed = self._feeds.get(delta.symbol)
+        if symbol_feed is not None:
+            symbol_feed.on_book_delta(delta=delta)
+
+    def on_position_snapshot(self, data: list) -> None:
+        for symbol_feed in self._feeds.values():
+            symbol_feed.on_position_snapshot(data=data)
+
+    def on_book_reset(self) -> None:
+        for symbol_feed in self._feeds.values():
+            symbol_feed.on_book_reset()
+
+    def get_sync_stats(self) -> Dict[str, Dict[str, int]]:
+        return {symbol: symbol_feed.get_sync_stats()
+                for symbol, symbol_feed in self._feeds.items()}
@@ -1,93 +1,232 @@
-import aiohttp
 import api_auth
-from typing import List, Union
+import event_log
+from typing import Coroutine, Dict, List, Tuple, Union
 from collections import OrderedDict
 import asyncio
+from session_pool import VenueSession
+import latency
+from order_pipeline import (OrderAction, OrderLane, ACTION_NEW,
+                            ACTION_AMEND, ACTION_CANCEL)
+import order_transport
+from order_tracker import OrderTracker
+from hedge_engine import HedgeCallback, HedgeEngine
+import clock_sync
+import rate_limiter
 
 
 class Gateway:
+    _BYBIT_API_ENDPOINT = 'https://api.bybit.com'
+    _BINANCE_API_ENDPOINT = 'https://dapi.binance.com'
+    _BYBIT_ENDPOINTS = {ACTION_NEW: rate_limiter.BYBIT_ORDER_CREATE,
+                        ACTION_AMEND: rate_limiter.BYBIT_ORDER_REPLACE,
+                        ACTION_CANCEL: rate_limiter.BYBIT_ORDER_CANCEL}
     _bybit_auth: api_auth.BybitApiAuth
     _binance_auth: api_auth.BinanceApiAuth
-    is_rate_limited = False
+    bybit_session: VenueSession
+    binance_session: VenueSession
+    _bybit_lanes: Dict[Tuple[str, str], OrderLane]
+    bybit_limiter: rate_limiter.RateLimiter
+    binance_limiter: rate_limiter.RateLimiter
+    bybit_orders: order_transport.OrderTransport
+    binance_orders: order_transport.OrderTransport
+    order_tracker: OrderTracker
+    hedges: HedgeEngine
+    bybit_clock: clock_sync.ClockSampler
+    binance_clock: clock_sync.ClockSampler
 
-    def __init__(self, api_pth_bybit: str, api_pth_binance: str) -> None:
+    def __init__(self, api_pth_bybit: str, api_pth_binance: str,
+                 bybit_endpoint: str = _BYBIT_API_ENDPOINT,
+                 binance_endpoint: str = _BINANCE_API_ENDPOINT,
+                 bybit_limiter: Union[rate_limiter.RateLimiter, None] = None,
+                 binance_limiter: Union[rate_limiter.RateLimiter, None] = None,
+                 bybit_transport: str = order_transport.TRANSPORT_REST,
+                 binance_transport: str = order_transport.TRANSPORT_REST,
+                 bybit_trade_endpoint: str =
+                 api_auth.BybitApiAuth.TRADE_ENDPOINT,
+                 binance_trade_endpoint: str =
+                 api_auth.BinanceApiAuth.TRADE_ENDPOINT,
+                 order_ack_timeout: float = 2.0,
+                 hedge_window: float = 0.005) -> None:
         self._bybit_auth = api_auth.BybitApiAuth(file_path=api_pth_bybit)
         self._binance_auth = api_auth.BinanceApiAuth(file_path=api_pth_binance)
+        self.bybit_session = VenueSession(base_url=bybit_endpoint,
+                                          ping_path='/v2/public/time')
+        self.binance_session = VenueSession(base_url=binance_endpoint,
+                                            ping_path='/dapi/v1/ping')
+        self._bybit_lanes = {}
+        self.bybit_limiter = (bybit_limiter if bybit_limiter is not None
+                              else rate_limiter.get_bybit_rate_limiter())
+        self.binance_limiter = (binance_limiter
+                                if binance_limiter is not None
+                                else rate_limiter.get_binance_rate_limiter())
+        self.bybit_orders = order_transport.get_bybit_transport(
+            kind=bybit_transport, auth=self._bybit_auth,
+            session=self.bybit_session, ws_endpoint=bybit_trade_endpoint,
+            ws_ack_timeout=order_ack_timeout)
+        self.binance_orders = order_transport.get_binance_transport(
+            kind=binance_transport, auth=self._binance_auth,
+            session=self.binance_session, ws_endpoint=binance_trade_endpoint,
+            ws_ack_timeout=order_ack_timeout)
+        self.order_tracker = OrderTracker(venue=latency.VENUE_BYBIT,
+                                          ack_timeout=order_ack_timeout)
+        self.hedges = HedgeEngine(orders=self.binance_orders,
+                                  limiter=self.binance_limiter,
+                                  session=self.binance_session,
+                                  auth=self._binance_auth,
+                                  window=hedge_window)
+        self.bybit_clock = clock_sync.ClockSampler(
+            clock=self._bybit_auth.clock, session=self.bybit_session,
+            path='/v2/public/time',
+            get_server_ns=clock_sync.get_bybit_server_ns)
+        self.binance_clock = clock_sync.ClockSampler(
+            clock=self._binance_auth.clock, session=self.binance_session,
+            path='/dapi/v1/time',
+            get_server_ns=clock_sync.get_binance_server_ns)
+
+    async def start(self) -> Coroutine:
+        await asyncio.gather(self.bybit_session.start(),
+                             self.binance_session.start(),
+                             self.bybit_orders.start(),
+                             self.binance_orders.start(),
+                             self.order_tracker.run(),
+                             self.bybit_clock.run(),
+                             self.binance_clock.run())
+
+    async def close(self) -> None:
+        await asyncio.gather(self.bybit_orders.close(),
+                             self.binance_orders.close())
+        await asyncio.gather(self.bybit_session.close(),
+                             self.binance_session.close())
+
+    def get_bybit_lane(self, symbol: str, side: str) -> OrderLane:
+        lane = self._bybit_lanes.get((symbol, side))
+        if lane is None:
+            lane = self._bybit_lanes[(symbol, side)] = OrderLane(
+                send=self.send_bybit_action)
+        return lane
 
     def prepare_bybit_new_order(self, order: OrderedDict,
-                                is_queued: List[bool],
                                 ord_link_id: List[Union[str, None]]) -> None:
-        is_queued[0] = True
-        order_bdy_str = self._bybit_auth.get_order_auth_body(order=order)
-        asyncio.create_task(
-            coro=self.send_bybit_new_order(order=order_bdy_str,
-                                           is_queued=is_queued,
-                                           ord_link_id=ord_link_id))
+        latency.RECORDER.record_tick_to_order(venue=latency.VENUE_BYBIT)
+        self.get_bybit_lane(symbol=order.get('symbol'),
+                            side=order.get('side')).submit(
+            action=OrderAction(kind=ACTION_NEW, order=order,
+                               ord_link_id=ord_link_id))
 
-    def prepare_binance_new_order(self, order: OrderedDict) -> None:
-        order_bdy_str = self._binance_auth.get_order_auth_body(order=order)
+    def prepare_binance_new_order(
+            self, order: OrderedDict,
+            priority: int = rate_limiter.PRIORITY_HEDGE) -> None:
+        latency.RECORDER.record_tick_to_order(venue=latency.VENUE_BINANCE)
         asyncio.create_task(
-            coro=self.send_binance_new_order(order=order_bdy_str))
+            coro=self.send_binance_new_order(order=order, priority=priority))
 
-    def prepare_bybit_amend_order(self, order: OrderedDict,
-                                  is_queued: List[bool]) -> None:
-        is_queued[0] = True
-        order_bdy_str = self._bybit_auth.get_order_auth_body(order=order)
-        asyncio.create_task(
-            coro=self.amend_bybit_order(order=order_bdy_str,
-                                        is_queued=is_queued))
-
-    async def check_bybit_rate_limits(self, res_bdy: dict) -> None:
-        if (res_bdy.get('rate_limit_status') == 0
-                and not self.is_rate_limited):
-            sleep_for = (res_bdy.get('rate_limit_reset_ms')
-                         - api_auth.get_milli_timestamp()) / 1000.0
-            if sleep_for > 0:
-                self.is_rate_limited = True
-                print(sleep_for)
-                await asyncio.sleep(delay=sleep_for)
-                self.is_rate_limited = False
-
-    async def send_bybit_new_order(self, order: str,
-                                   is_queued: List[bool],
-                                   ord_link_id: List[Union[str, None]]) -> None:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                    url='https://api.bybit.com/v2/private/order/create',
-                    data=order, headers={'Content-Type': 'application/json'},
-                    ssl=True) as res:
-                try:
-                    res_bdy = await res.json()
-                    if res_bdy.get('ret_code') != 0:
-                        ord_link_id[0] = None
-                    await self.check_bybit_rate_limits(res_bdy=res_bdy)
-                except aiohttp.ContentTypeError as e:
-                    print(e)
-                finally:
-                    is_queued[0] = False
-
-    async def send_binance_new_order(self, order: str) -> None:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                    url='https://dapi.binance.com/dapi/v1/order', data=order,
-                    headers=self._binance_auth.headers, ssl=True) as res:
-                try:
-                    resp = await res.json()
-                    print('Binance Response Status:', res.status)
-                except aiohttp.ContentTypeError as e:
-                    print(e)
-
-    async def amend_bybit_order(self, order: str,
-                                is_queued: List[bool]) -> None:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                    url='https://api.bybit.com/v2/private/order/replace',
-                    data=order, headers={'Content-Type': 'application/json'},
-                    ssl=True) as res:
-                try:
-                    res_bdy = await res.json()
-                    await self.check_bybit_rate_limits(res_bdy=res_bdy)
-                except aiohttp.ContentTypeError as e:
-                    print(e)
-                finally:
-                    is_queued[0] = False
\ No newline at end of file
+    def prepare_binance_hedge(self, order: OrderedDict, ref_price: float,
+                              on_result: HedgeCallback) -> None:
+        latency.RECORDER.record_tick_to_order(venue=latency.VENUE_BINANCE)
+        self.hedges.submit(order=order, ref_price=ref_price,
+                           on_result=on_result)
+
+    def prepare_bybit_cancel_order(
+            self, order: OrderedDict, side: str,
+            priority: int = rate_limiter.PRIORITY_CANCEL) -> None:
+        self.get_bybit_lane(symbol=order.get('symbol'), side=side).submit(
+            action=OrderAction(kind=ACTION_CANCEL, order=order,
+                               priority=priority))
+
+    def prepare_bybit_amend_order(
+            self, order: OrderedDict, side: str,
+            priority: int = rate_limiter.PRIORITY_REPRICE) -> bool:
+        latency.RECORDER.record_tick_to_order(venue=latency.VENUE_BYBIT)
+        return self.get_bybit_lane(
+            symbol=order.get('symbol'), side=side).submit(
+            action=OrderAction(kind=ACTION_AMEND, order=order,
+                               priority=priority))
+
+    def on_bybit_order_update(self, order: dict) -> None:
+        self.order_tracker.on_confirm(ord_link_id=order.get('order_link_id'))
+
+    async def send_bybit_action(self, action: OrderAction) -> bool:
+        endpoint = self._BYBIT_ENDPOINTS[action.kind]
+        if not self.bybit_limiter.try_acquire(endpoint=endpoint,
+                                              priority=action.priority):
+            event_log.LOGGER.debug(event=event_log.EVENT_RATE_LIMITED,
+                                   text=endpoint, value0=action.priority)
+            if action.kind == ACTION_NEW:
+                action.ord_link_id[0] = None
+            return False
+        if action.kind == ACTION_NEW:
+            return await self.send_bybit_new_order(
+                order=action.order, ord_link_id=action.ord_link_id)
+        if action.kind == ACTION_AMEND:
+            return await self.amend_bybit_order(order=action.order)
+        return await self.cancel_bybit_order(order=action.order)
+
+    async def send_bybit_order(self, op: str, endpoint: str,
+                               order: OrderedDict,
+                               ord_link_id: Union[List[Union[str, None]],
+                                                  None] = None
+                               ) -> Union[dict, None]:
+        entry = self.order_tracker.on_send(
+            ord_link_id=order.get('order_link_id'), kind=op)
+        try:
+            reply = await asyncio.wait_for(
+                fut=self.bybit_orders.request(op=op, order=order),
+                timeout=self.order_tracker.ack_timeout)
+        except asyncio.TimeoutError:
+            self.order_tracker.on_ack_timeout(entry=entry)
+            if ord_link_id is not None:
+                self.cancel_unknown_order(order=order,
+                                          ord_link_id=ord_link_id)
+            return None
+        except order_transport.TRANSPORT_ERRORS as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            self.order_tracker.on_error(entry=entry)
+            if ord_link_id is not None:
+                self.cancel_unknown_order(order=order,
+                                          ord_link_id=ord_link_id)
+            return None
+        self.bybit_limiter.on_bybit_response(endpoint=endpoint,
+                                             res_bdy=reply.body)
+        self.order_tracker.on_ack(entry=entry,
+                                  accepted=reply.body.get('ret_code') == 0)
+        return reply.body
+
+    def cancel_unknown_order(self, order: OrderedDict,
+                             ord_link_id: List[Union[str, None]]) -> None:
+        if ord_link_id[0] == order.get('order_link_id'):
+            ord_link_id[0] = None
+        self.prepare_bybit_cancel_order(
+            order=OrderedDict({'order_link_id': order.get('order_link_id'),
+                               'symbol': order.get('symbol')}),
+            side=order.get('side'))
+
+    async def send_bybit_new_order(self, order: OrderedDict,
+                                   ord_link_id: List[Union[str, None]]
+                                   ) -> bool:
+        res_bdy = await self.send_bybit_order(
+            op=order_transport.OP_CREATE,
+            endpoint=rate_limiter.BYBIT_ORDER_CREATE, order=order,
+            ord_link_id=ord_link_id)
+        if res_bdy is None:
+            return False
+        if res_bdy.get('ret_code') != 0:
+            ord_link_id[0] = None
+        return res_bdy.get('ret_code') == 0
+
+    async def send_binance_new_order(self, order: OrderedDict,
+                                     priority: int) -> None:
+        await self.hedges.send_order(op=order_transport.OP_CREATE,
+                                     endpoint=rate_limiter.BINANCE_ORDER,
+                                     order=order, priority=priority)
+
+    async def amend_bybit_order(self, order: OrderedDict) -> bool:
+        res_bdy = await self.send_bybit_order(
+            op=order_transport.OP_AMEND,
+            endpoint=rate_limiter.BYBIT_ORDER_REPLACE, order=order)
+        return res_bdy is not None and res_bdy.get('ret_code') == 0
+
+    async def cancel_bybit_order(self, order: OrderedDict) -> bool:
+        res_bdy = await self.send_bybit_order(
+            op=order_transport.OP_CANCEL,
+            endpoint=rate_limiter.BYBIT_ORDER_CANCEL, order=order)
+        return res_bdy is not None and res_bdy.get('ret_code') == 0
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from typing import Callable, Coroutine, Dict, List, Union
+import event_log
+import latency
+import order_transport
+import rate_limiter
+from api_auth import BinanceApiAuth
+from session_pool import VenueSession
+
+HedgeCallback = Callable[[int, int], None]
+_TERMINAL_STATUSES = frozenset(('FILLED', 'CANCELED', 'EXPIRED',
+                                'REJECTED'))
+_ORDER_NOT_FOUND = -2013
+
+
+class PendingHedge:
+    __slots__ = ('symbol', 'contracts', 'ref_price', 'first_ns', 'on_result',
+                 'client_order_id')
+    symbol: str
+    contracts: int
+    ref_price: float
+    first_ns: int
+    on_result: HedgeCallback
+    client_order_id: str
+
+    def __init__(self, symbol: str, ref_price: float,
+                 on_result: HedgeCallback) -> None:
+        self.symbol = symbol
+        self.contracts = 0
+        self.ref_price = ref_price
+        self.first_ns = latency.clock()
+        self.on_result = on_result
+        self.client_order_id = uuid.uuid4().hex
+
+    def get_order(self) -> OrderedDict:
+        return OrderedDict({'symbol': self.symbol,
+                            'side': 'BUY' if self.contracts > 0 else 'SELL',
+                            'type': 'MARKET',
+                            'quantity': abs(self.contracts),
+                            'newClientOrderId': self.client_order_id,
+                            'newOrderRespType': 'RESULT'})
+
+
+class HedgeEngine:
+    _orders: order_transport.OrderTransport
+    _limiter: rate_limiter.RateLimiter
+    _session: VenueSession
+    _auth: BinanceApiAuth
+    _window: float
+    _pending: Dict[str, PendingHedge]
+    _flush_task: Union[asyncio.Task, None]
+    _MAX_BATCH = 5
+    _BUDGET_POLL_INTERVAL = 0.1
+    _QUERY_DELAY = 0.5
+    _QUERY_ATTEMPTS = 5
+    requests: int
+    netted: int
+    offset: int
+    orders: int
+    batches: int
+    filled: int
+    failed: int
+    unknown: int
+    queries: int
+    unresolved: int
+    slippage_count: int
+    slippage_total: float
+    slippage_max: float
+
+    def __init__(self, orders: order_transport.OrderTransport,
+                 limiter: rate_limiter.RateLimiter, session: VenueSession,
+                 auth: BinanceApiAuth, window: float = 0.005) -> None:
+        self._orders = orders
+        self._limiter = limiter
+        self._session = session
+        self._auth = auth
+        self._window = window
+        self._pending = {}
+        self._flush_task = None
+        self.requests = 0
+        self.netted = 0
+        self.offset = 0
+        self.orders = 0
+        self.batches = 0
+        self.filled = 0
+        self.failed = 0
+        self.unknown = 0
+        self.queries = 0
+        self.unresolved = 0
+        self.slippage_count = 0
+        self.slippage_total = 0.0
+        self.slippage_max = float('-inf')
+
+    def submit(self, order: OrderedDict, ref_price: float,
+               on_result: HedgeCallback) -> None:
+        self.requests += 1
+        symbol = order.get('symbol')
+        hedge = self._pending.get(symbol)
+        if hedge is None:
+            hedge = self._pending[symbol] = PendingHedge(
+                symbol=symbol, ref_price=ref_price, on_result=on_result)
+        else:
+            self.netted += 1
+            hedge.on_result = on_result
+        quantity = int(order.get('quantity'))
+        hedge.contracts += quantity if order.get('side') == 'BUY' \
+            else -quantity
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(coro=self.flush_later())
+
+    async def flush_later(self) -> Coroutine:
+        await asyncio.sleep(delay=self._window)
+        self._flush_task = None
+        self.flush()
+
+    def flush(self) -> None:
+        hedges = []
+        for hedge in self._pending.values():
+            if hedge.contracts == 0:
+                self.offset += 1
+            else:
+                hedges.append(hedge)
+        self._pending = {}
+        batch = self._orders.supports(op=order_transport.OP_BATCH_CREATE)
+        for i in range(0, len(hedges), self._MAX_BATCH):
+            chunk = hedges[i:i + self._MAX_BATCH]
+            if batch and len(chunk) > 1:
+                asyncio.create_task(coro=self.send_batch(hedges=chunk))
+            else:
+                for hedge in chunk:
+                    asyncio.create_task(coro=self.send_hedge(hedge=hedge))
+
+    async def acquire(self, endpoint: str, priority: int) -> None:
+        if self._limiter.try_acquire(endpoint=endpoint, priority=priority):
+            return
+        event_log.LOGGER.warning(event=event_log.EVENT_RATE_LIMITED,
+                                 text=endpoint, value0=priority)
+        while not self._limiter.try_acquire(endpoint=endpoint,
+                                            priority=priority):
+            await asyncio.sleep(delay=self._BUDGET_POLL_INTERVAL)
+
+    async def send_order(self, op: str, endpoint: str, order: OrderedDict,
+                         priority: int = rate_limiter.PRIORITY_HEDGE
+                         ) -> Union[order_transport.OrderReply, None]:
+        await self.acquire(endpoint=endpoint, priority=priority)
+        try:
+            reply = await self._orders.request(op=op, order=order)
+        except order_transport.TRANSPORT_ERRORS as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            return None
+        self._limiter.on_binance_response(status=reply.status,
+                                          headers=reply.headers)
+        event_log.LOGGER.info(event=event_log.EVENT_BINANCE_RESPONSE,
+                              value0=reply.status)
+        return reply
+
+    async def send_hedge(self, hedge: PendingHedge) -> None:
+        self.orders += 1
+        reply = await self.send_order(op=order_transport.OP_CREATE,
+                                      endpoint=rate_limiter.BINANCE_ORDER,
+                                      order=hedge.get_order())
+        await self.settle(hedge=hedge, result=(
+            None if reply is None or reply.status >= 500 else reply.body))
+
+    async def send_batch(self, hedges: List[PendingHedge]) -> None:
+        self.batches += 1
+        self.orders += len(hedges)
+        batch_orders = json.dumps(
+            obj=[{key: str(value) for key, value
+                  in hedge.get_order().items()} for hedge in hedges],
+            separators=(',', ':'))
+        reply = await self.send_order(
+            op=order_transport.OP_BATCH_CREATE,
+            endpoint=rate_limiter.BINANCE_BATCH_ORDERS,
+            order=OrderedDict({'batchOrders': batch_orders}))
+        if reply is None or reply.status >= 500:
+            results = []
+        elif isinstance(reply.body, list):
+            results = reply.body
+        else:
+            results = [reply.body] * len(hedges)
+        await asyncio.gather(*(
+            self.settle(hedge=hedge,
+                        result=results[i] if i < len(results) else None)
+            for i, hedge in enumerate(hedges)))
+
+    async def settle(self, hedge: PendingHedge,
+                     result: Union[dict, None]) -> None:
+        if result is None or ('orderId' in result and result.get('status')
+                              not in _TERMINAL_STATUSES):
+            self.unknown += abs(hedge.contracts)
+            result = await self.query_order(hedge=hedge)
+            if result is None:
+                self.unresolved += abs(hedge.contracts)
+                event_log.LOGGER.warning(
+                    event=event_log.EVENT_HEDGE_UNRESOLVED, text=hedge.symbol,
+                    value0=abs(hedge.contracts))
+                return
+        self.on_order_result(hedge=hedge, result=result)
+
+    async def query_order(self, hedge: PendingHedge) -> Union[dict, None]:
+        delay = self._QUERY_DELAY
+        for _ in range(self._QUERY_ATTEMPTS):
+            await asyncio.sleep(delay=delay)
+            delay *= 2
+            await self.acquire(endpoint=rate_limiter.BINANCE_QUERY_ORDER,
+                               priority=rate_limiter.PRIORITY_HEDGE)
+            self.queries += 1
+            try:
+                async with self._session.get(
+                        path=self._auth.get_order_query_auth(
+                            symbol=hedge.symbol,
+                            client_order_id=hedge.client_order_id),
+                        headers={'X-MBX-APIKEY': self._auth.key}) as res:
+                    status = res.status
+                    headers = res.headers
+                    result = await res.json()
+            except order_transport.TRANSPORT_ERRORS + (ValueError,) as e:
+                event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION,
+                                       text=e)
+                continue
+            self._limiter.on_binance_response(status=status, headers=headers)
+            if status == 200 and result.get('status') in _TERMINAL_STATUSES:
+                return result
+            if status == 400 and result.get('code') == _ORDER_NOT_FOUND:
+                return result
+        return None
+
+    def on_order_result(self, hedge: PendingHedge, result: dict) -> None:
+        latency.RECORDER.record(stage=latency.STAGE_HEDGE,
+                                venue=latency.VENUE_BINANCE,
+                                start_ns=hedge.first_ns)
+        filled = (int(result.get('executedQty', 0)) if 'orderId' in result
+                  else 0)
+        if filled > 0:
+            self.record_slippage(hedge=hedge,
+                                 avg_price=float(result.get('avgPrice', 0)))
+        self.filled += filled
+        missed = abs(hedge.contracts) - filled
+        if missed > 0:
+            self.failed += missed
+            event_log.LOGGER.warning(event=event_log.EVENT_HEDGE_FAILED,
+                                     text=hedge.symbol, value0=missed)
+        hedge.on_result(hedge.contracts,
+                        filled if hedge.contracts > 0 else -filled)
+
+    def record_slippage(self, hedge: PendingHedge, avg_price: float) -> None:
+        if hedge.ref_price <= 0 or avg_price <= 0:
+            return
+        slippage = (avg_price - hedge.ref_price) / hedge.ref_price * 1e4
+        if hedge.contracts < 0:
+            slippage = -slippage
+        self.slippage_count += 1
+        self.slippage_total += slippage
+        self.slippage_max = max(self.slippage_max, slippage)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {'requests': self.requests, 'netted': self.netted,
+                'offset': self.offset, 'orders': self.orders,
+                'batches': self.batches, 'filled': self.filled,
+                'failed': self.failed, 'unknown': self.unknown,
+                'queries': self.queries, 'unresolved': self.unresolved,
+                'pending': len(self._pending),
+                'slippage_mean_bps': (
+                    self.slippage_total / self.slippage_count
+                    if self.slippage_count else 0.0),
+                'slippage_max_bps': (self.slippage_max
+                                     if self.slippage_count else 0.0)}
@@ -0,0 +1,153 @@
+import json
+import signal
+import sys
+import time
+from asyncio import AbstractEventLoop
+from typing import Dict, List, TextIO, Tuple, Union
+
+clock = time.perf_counter_ns
+
+VENUE_BYBIT = 'bybit'
+VENUE_BINANCE = 'binance'
+STAGE_DECODE = 'decode'
+STAGE_BOOK = 'book'
+STAGE_QUOTE = 'quote'
+STAGE_SIGN = 'sign'
+STAGE_HTTP = 'http'
+STAGE_WS_ACK = 'ws_ack'
+STAGE_ORDER_ACK = 'order_ack'
+STAGE_ORDER_CONFIRM = 'order_confirm'
+STAGE_HEDGE = 'hedge'
+STAGE_EXCHANGE = 'exchange_to_local'
+STAGE_TICK_TO_ORDER = 'tick_to_order'
+DUMP_PERCENTILES = (0.5, 0.9, 0.99, 0.999, 1.0)
+
+
+class LatencyHistogram:
+    SUB_BUCKET_BITS = 5
+    _sub_bucket_count: int
+    _half_count: int
+    _counts: List[int]
+    count: int
+    total: int
+    min: Union[int, None]
+    max: int
+
+    def __init__(self, max_value_bits: int = 40) -> None:
+        self._sub_bucket_count = 1 << self.SUB_BUCKET_BITS
+        self._half_count = self._sub_bucket_count >> 1
+        self._counts = [0] * (self._sub_bucket_count + (
+            max_value_bits - self.SUB_BUCKET_BITS) * self._half_count)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def get_index(self, value: int) -> int:
+        if value < self._sub_bucket_count:
+            return value if value > 0 else 0
+        shift = value.bit_length() - self.SUB_BUCKET_BITS
+        index = (self._sub_bucket_count + (shift - 1) * self._half_count
+                 + (value >> shift) - self._half_count)
+        return min(index, len(self._counts) - 1)
+
+    def get_value(self, index: int) -> int:
+        if index < self._sub_bucket_count:
+            return index
+        shift = (index - self._sub_bucket_count) // self._half_count + 1
+        mantissa = ((index - self._sub_bucket_count) % self._half_count
+                    + self._half_count)
+        return ((mantissa << shift) + ((mantissa + 1) << shift)) >> 1
+
+    def record(self, value: int) -> None:
+        self._counts[self.get_index(value=value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def get_percentile(self, q: float) -> int:
+        if self.count == 0:
+            return 0
+        if q >= 1.0:
+            return self.max
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self.get_value(index=index), self.max)
+        return self.max
+
+    def get_summary(self) -> Dict[str, float]:
+        summary = {'count': self.count,
+                   'mean_us': self.total / self.count / 1e3
+                   if self.count else 0.0,
+                   'min_us': (self.min or 0) / 1e3}
+        for q in DUMP_PERCENTILES:
+            summary['p%g_us' % (q * 100)] = (
+                self.get_percentile(q=q) / 1e3)
+        return summary
+
+
+class LatencyRecorder:
+    enabled: bool
+    tick_ts: int
+    _histograms: Dict[Tuple[str, str], LatencyHistogram]
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self.tick_ts = 0
+        self._histograms = {}
+
+    def get_histogram(self, stage: str, venue: str) -> LatencyHistogram:
+        key = (stage, venue)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        return histogram
+
+    def record(self, stage: str, venue: str, start_ns: int) -> None:
+        if self.enabled:
+            self.get_histogram(stage=stage, venue=venue).record(
+                value=clock() - start_ns)
+
+    def record_value(self, stage: str, venue: str, value: int) -> None:
+        if self.enabled:
+            self.get_histogram(stage=stage, venue=venue).record(value=value)
+
+    def record_tick_to_order(self, venue: str) -> None:
+        if self.enabled and self.tick_ts:
+            self.get_histogram(stage=STAGE_TICK_TO_ORDER, venue=venue).record(
+                value=clock() - self.tick_ts)
+
+    def get_snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        snapshot = {}
+        for (stage, venue), histogram in sorted(self._histograms.items()):
+            snapshot.setdefault(stage, {})[venue] = histogram.get_summary()
+        return snapshot
+
+    def dump(self, fp: TextIO = sys.stdout) -> None:
+        fp.write(json.dumps(obj=self.get_snapshot(), indent=2) + '\n')
+        fp.flush()
+
+    def dump_to_file(self, file_path: str) -> None:
+        with open(file=file_path, mode='w') as fp:
+            self.dump(fp=fp)
+
+    def reset(self) -> None:
+        self._histograms = {}
+
+
+RECORDER = LatencyRecorder()
+
+
+def install_dump_signal(loop: AbstractEventLoop,
+                        file_path: Union[str, None] = None,
+                        signum: int = signal.SIGUSR1) -> None:
+    if file_path is None:
+        loop.add_signal_handler(signum, RECORDER.dump)
+    else:
+        loop.add_signal_handler(signum, RECORDER.dump_to_file, file_path)
@@ -1,26 +1,44 @@
-from feed import BybitFeed, BinanceFeed
-from ws_client import BybitWsClient, BinanceWsClient
-import strategy
-import asyncio
-from typing import Coroutine
-import gateway
+import sharding
+import symbols
 
 API_KEY_PATH_BYBIT = '../bybit_api_keys.json'
 API_KEY_PATH_BINANCE = '../binance_api_keys.json'
-
-
-async def run_async(*args: Coroutine) -> None:
-    await asyncio.gather(*args)
+CAPTURE_PATH = None
+LATENCY_DUMP_PATH = None
+CONFLATE_BBO = False
+MOCK_EXCHANGE_HOST = None
+SYMBOLS_PATH = None
+SHARDS = 1
+MAX_GROSS_EXPOSURE = float('inf')
+SHM_BOOK_DEPTH = None
+LOG_PATH = None
+LOG_BINARY = False
+FEED_LINES = 1
+LINE_ENDPOINTS = None
+BYBIT_ORDER_TRANSPORT = 'rest'
+BINANCE_ORDER_TRANSPORT = 'rest'
+HEDGE_WINDOW = 0.005
 
 if __name__ == '__main__':
-    gw = gateway.Gateway(api_pth_bybit=API_KEY_PATH_BYBIT,
-                         api_pth_binance=API_KEY_PATH_BINANCE)
-    strategy = strategy.MMStrategy(gateway=gw)
-    bybit_feed = BybitFeed(strat=strategy)
-    binance_feed = BinanceFeed(strat=strategy)
-    bybit_ws_client = BybitWsClient(api_file_path=API_KEY_PATH_BYBIT,
-                                    feed_object=bybit_feed)
-    binance_ws_client = BinanceWsClient(api_file_path=API_KEY_PATH_BINANCE,
-                                        feed_object=binance_feed)
-    asyncio.get_event_loop().run_until_complete(
-        future=run_async(bybit_ws_client.start(), binance_ws_client.start()))
+    symbol_configs = (symbols.load_symbol_configs(file_path=SYMBOLS_PATH)
+                      if SYMBOLS_PATH is not None
+                      else symbols.DEFAULT_SYMBOLS)
+    endpoints = None
+    if MOCK_EXCHANGE_HOST is not None:
+        import mock_exchange
+        endpoints = mock_exchange.get_client_endpoints(
+            host=MOCK_EXCHANGE_HOST)
+    shared_state = sharding.get_shared_state(
+        symbol_configs=symbol_configs, max_gross_exposure=MAX_GROSS_EXPOSURE)
+    sharding.run_sharded(
+        symbol_configs=symbol_configs, n_shards=SHARDS, shared=shared_state,
+        settings=sharding.ShardSettings(
+            api_pth_bybit=API_KEY_PATH_BYBIT,
+            api_pth_binance=API_KEY_PATH_BINANCE, endpoints=endpoints,
+            conflate=CONFLATE_BBO, capture_path=CAPTURE_PATH,
+            latency_dump_path=LATENCY_DUMP_PATH, shm_depth=SHM_BOOK_DEPTH,
+            log_path=LOG_PATH, log_binary=LOG_BINARY, feed_lines=FEED_LINES,
+            line_endpoints=LINE_ENDPOINTS,
+            bybit_order_transport=BYBIT_ORDER_TRANSPORT,
+            binance_order_transport=BINANCE_ORDER_TRANSPORT,
+            hedge_window=HEDGE_WINDOW))
@@ -0,0 +1,193 @@
+import bisect
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Set, Tuple, Union
+
+
+class RestingOrder:
+    order_id: str
+    owner: str
+    is_bid: bool
+    tick: int
+    qty: int
+    leaves_qty: int
+    seq: int
+
+    def __init__(self, order_id: str, owner: str, is_bid: bool, tick: int,
+                 qty: int, seq: int) -> None:
+        self.order_id = order_id
+        self.owner = owner
+        self.is_bid = is_bid
+        self.tick = tick
+        self.qty = qty
+        self.leaves_qty = qty
+        self.seq = seq
+
+
+class Fill(NamedTuple):
+    maker: RestingOrder
+    taker_id: str
+    tick: int
+    qty: int
+
+
+class MatchingEngine:
+    ticks_per_unit: int
+    _queues: Tuple[Dict[int, Deque[RestingOrder]],
+                   Dict[int, Deque[RestingOrder]]]
+    _sizes: Tuple[Dict[int, int], Dict[int, int]]
+    _ticks: Tuple[List[int], List[int]]
+    _orders: Dict[str, RestingOrder]
+    _changed: Set[Tuple[bool, int]]
+    _seq: int
+    update_id: int
+
+    def __init__(self, ticks_per_unit: int) -> None:
+        self.ticks_per_unit = ticks_per_unit
+        self._queues = ({}, {})
+        self._sizes = ({}, {})
+        self._ticks = ([], [])
+        self._orders = {}
+        self._changed = set()
+        self._seq = 0
+        self.update_id = 0
+
+    def to_tick(self, price: float) -> int:
+        return int(round(price * self.ticks_per_unit))
+
+    def to_price(self, tick: int) -> float:
+        return tick / self.ticks_per_unit
+
+    def get_order(self, order_id: str) -> Union[RestingOrder, None]:
+        return self._orders.get(order_id)
+
+    def get_orders(self, owner: str) -> List[RestingOrder]:
+        return [order for order in self._orders.values()
+                if order.owner == owner]
+
+    def get_best(self, is_bid: bool) -> Union[int, None]:
+        ticks = self._ticks[is_bid]
+        if not ticks:
+            return None
+        return ticks[-1] if is_bid else ticks[0]
+
+    def get_level_size(self, is_bid: bool, tick: int) -> int:
+        return self._sizes[is_bid].get(tick, 0)
+
+    def get_depth(self, is_bid: bool, n: int) -> List[Tuple[int, int]]:
+        ticks = self._ticks[is_bid]
+        sizes = self._sizes[is_bid]
+        levels = ticks[-n:][::-1] if is_bid else ticks[:n]
+        return [(tick, sizes[tick]) for tick in levels]
+
+    def is_crossing(self, is_bid: bool, tick: int) -> bool:
+        best = self.get_best(is_bid=not is_bid)
+        if best is None:
+            return False
+        return tick >= best if is_bid else tick <= best
+
+    def pop_changes(self) -> Set[Tuple[bool, int]]:
+        changed = self._changed
+        self._changed = set()
+        return changed
+
+    def add_level_size(self, is_bid: bool, tick: int, qty: int) -> None:
+        sizes = self._sizes[is_bid]
+        size = sizes.get(tick, 0) + qty
+        if size:
+            if tick not in sizes:
+                bisect.insort(self._ticks[is_bid], tick)
+            sizes[tick] = size
+        else:
+            del sizes[tick]
+            del self._queues[is_bid][tick]
+            ticks = self._ticks[is_bid]
+            del ticks[bisect.bisect_left(ticks, tick)]
+        self._changed.add((is_bid, tick))
+
+    def rest(self, order: RestingOrder) -> None:
+        queues = self._queues[order.is_bid]
+        queue = queues.get(order.tick)
+        if queue is None:
+            queue = queues[order.tick] = deque()
+        queue.append(order)
+        self._orders[order.order_id] = order
+        self.add_level_size(is_bid=order.is_bid, tick=order.tick,
+                            qty=order.leaves_qty)
+
+    def match(self, taker_id: str, is_bid: bool, qty: int,
+              limit_tick: Union[int, None] = None) -> List[Fill]:
+        fills = []
+        maker_side = not is_bid
+        queues = self._queues[maker_side]
+        while qty > 0:
+            best = self.get_best(is_bid=maker_side)
+            if best is None or (limit_tick is not None and (
+                    best > limit_tick if is_bid else best < limit_tick)):
+                break
+            queue = queues[best]
+            maker = queue[0]
+            fill_qty = min(qty, maker.leaves_qty)
+            maker.leaves_qty -= fill_qty
+            qty -= fill_qty
+            if maker.leaves_qty == 0:
+                queue.popleft()
+                del self._orders[maker.order_id]
+            self.add_level_size(is_bid=maker_side, tick=best, qty=-fill_qty)
+            fills.append(Fill(maker=maker, taker_id=taker_id, tick=best,
+                              qty=fill_qty))
+        if fills:
+            self.update_id += 1
+        return fills
+
+    def submit_limit(self, order_id: str, owner: str, is_bid: bool,
+                     tick: int, qty: int) -> Tuple[RestingOrder, List[Fill]]:
+        self._seq += 1
+        order = RestingOrder(order_id=order_id, owner=owner, is_bid=is_bid,
+                             tick=tick, qty=qty, seq=self._seq)
+        fills = self.match(taker_id=order_id, is_bid=is_bid, qty=qty,
+                           limit_tick=tick)
+        order.leaves_qty -= sum(fill.qty for fill in fills)
+        if order.leaves_qty > 0:
+            self.rest(order=order)
+            self.update_id += 1
+        return order, fills
+
+    def submit_market(self, order_id: str, is_bid: bool,
+                      qty: int) -> List[Fill]:
+        return self.match(taker_id=order_id, is_bid=is_bid, qty=qty)
+
+    def cancel(self, order_id: str) -> Union[RestingOrder, None]:
+        order = self._orders.pop(order_id, None)
+        if order is None:
+            return None
+        self._queues[order.is_bid][order.tick].remove(order)
+        self.add_level_size(is_bid=order.is_bid, tick=order.tick,
+                            qty=-order.leaves_qty)
+        self.update_id += 1
+        return order
+
+    def replace(self, order_id: str, tick: int,
+                qty: Union[int, None] = None
+                ) -> Union[Tuple[RestingOrder, List[Fill]], None]:
+        order = self._orders.get(order_id)
+        if order is None:
+            return None
+        filled = order.qty - order.leaves_qty
+        leaves_qty = order.leaves_qty if qty is None else qty - filled
+        if leaves_qty <= 0:
+            self.cancel(order_id=order_id)
+            order.leaves_qty = 0
+            return order, []
+        if tick == order.tick and leaves_qty <= order.leaves_qty:
+            self.add_level_size(is_bid=order.is_bid, tick=tick,
+                                qty=leaves_qty - order.leaves_qty)
+            order.leaves_qty = leaves_qty
+            order.qty = filled + leaves_qty
+            self.update_id += 1
+            return order, []
+        self.cancel(order_id=order_id)
+        order, fills = self.submit_limit(
+            order_id=order_id, owner=order.owner, is_bid=order.is_bid,
+            tick=tick, qty=leaves_qty)
+        order.qty += filled
+        return order, fills
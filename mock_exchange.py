@@ -0,0 +1,1161 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from abc import abstractmethod
+from typing import Callable, Coroutine, Dict, List, Mapping, Set, Tuple, \
+    Union
+import aiohttp
+from aiohttp import web
+from matching_engine import Fill, MatchingEngine
+
+OWNER_SIM = 'sim'
+OWNER_ACCOUNT = 'account'
+BYBIT_BOOK_TOPIC = 'orderBookL2_25.BTCUSD'
+BINANCE_DEPTH_TOPIC = 'btcusd_perp@depth@100ms'
+
+
+def dumps(obj: Union[dict, list]) -> str:
+    return json.dumps(obj=obj, separators=(',', ':'))
+
+
+def get_client_endpoints(host: str = '127.0.0.1', bybit_port: int = 8081,
+                         binance_port: int = 8082) -> Dict[str, str]:
+    return {'bybit_api': 'http://%s:%d' % (host, bybit_port),
+            'bybit_ws': 'ws://%s:%d/realtime' % (host, bybit_port),
+            'bybit_trade_ws': 'ws://%s:%d/v5/trade' % (host, bybit_port),
+            'binance_api': 'http://%s:%d' % (host, binance_port),
+            'binance_ws': 'ws://%s:%d/ws/' % (host, binance_port),
+            'binance_trade_ws': 'ws://%s:%d/ws-dapi/v1' % (host,
+                                                           binance_port)}
+
+
+class FairValue:
+    price: float
+    _volatility: float
+    _rng: random.Random
+
+    def __init__(self, price: float, volatility: float,
+                 rng: random.Random) -> None:
+        self.price = price
+        self._volatility = volatility
+        self._rng = rng
+
+    def step(self, dt: float) -> float:
+        self.price *= math.exp(
+            self._volatility * math.sqrt(dt) * self._rng.gauss(mu=0, sigma=1))
+        return self.price
+
+    async def run(self, interval: float = 0.01) -> Coroutine:
+        while True:
+            await asyncio.sleep(delay=interval)
+            self.step(dt=interval)
+
+
+class WindowCounter:
+    limit: int
+    _window_ms: int
+    _window_start_ms: int
+    used: int
+
+    def __init__(self, limit: int, window_ms: int = 60000) -> None:
+        self.limit = limit
+        self._window_ms = window_ms
+        self._window_start_ms = 0
+        self.used = 0
+
+    def roll(self, now_ms: int) -> None:
+        if now_ms - self._window_start_ms >= self._window_ms:
+            self._window_start_ms = now_ms - now_ms % self._window_ms
+            self.used = 0
+
+    def hit(self, now_ms: int, cost: int = 1) -> bool:
+        self.roll(now_ms=now_ms)
+        if self.used + cost > self.limit:
+            return False
+        self.used += cost
+        return True
+
+    def get_remaining(self) -> int:
+        return self.limit - self.used
+
+    def get_reset_ms(self) -> int:
+        return self._window_start_ms + self._window_ms
+
+
+class MockConnection:
+    _ws: web.WebSocketResponse
+    _queue: asyncio.Queue
+    _get_delay: Callable[[], float]
+    topics: Set[str]
+    authenticated: bool
+
+    def __init__(self, ws: web.WebSocketResponse,
+                 get_delay: Callable[[], float]) -> None:
+        self._ws = ws
+        self._queue = asyncio.Queue()
+        self._get_delay = get_delay
+        self.topics = set()
+        self.authenticated = False
+
+    def send(self, message: str) -> None:
+        self._queue.put_nowait(
+            (asyncio.get_running_loop().time() + self._get_delay(), message))
+
+    async def run_sender(self) -> Coroutine:
+        loop = asyncio.get_running_loop()
+        while True:
+            due, message = await self._queue.get()
+            wait = due - loop.time()
+            if wait > 0:
+                await asyncio.sleep(delay=wait)
+            try:
+                await self._ws.send_str(data=message)
+            except ConnectionResetError:
+                return
+
+    async def close(self) -> None:
+        await self._ws.close()
+
+
+class MockVenue:
+    _SIM_INTERVAL = 0.001
+    _TICKS_PER_UNIT = 2
+    _ws_paths = ('/ws',)
+    _trade_ws_paths = ()
+    _engine: MatchingEngine
+    _fair_value: FairValue
+    _rng: random.Random
+    _rate: float
+    _latency_ms: float
+    _jitter_ms: float
+    _clock_skew_ns: int
+    _RECV_WINDOW_MS = 5000
+    _MAX_AHEAD_MS = 1000
+    _cancel_prob: float
+    _market_prob: float
+    _mean_offset: float
+    _max_lots: int
+    _lot_size: int
+    _max_sim_orders: int
+    _min_depth: int
+    _sim_order_ids: List[str]
+    _sim_seq: int
+    _connections: List[MockConnection]
+    _runner: Union[web.AppRunner, None]
+    stats: Dict[str, int]
+
+    def __init__(self, fair_value: FairValue, rng: random.Random,
+                 rate: float = 200.0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, cancel_prob: float = 0.4,
+                 market_prob: float = 0.1, mean_offset: float = 8.0,
+                 max_lots: int = 20, lot_size: int = 1,
+                 max_sim_orders: int = 2000, min_depth: int = 5,
+                 clock_skew_ms: float = 0.0) -> None:
+        self._engine = MatchingEngine(ticks_per_unit=self._TICKS_PER_UNIT)
+        self._fair_value = fair_value
+        self._rng = rng
+        self._rate = rate
+        self._latency_ms = latency_ms
+        self._jitter_ms = jitter_ms
+        self._clock_skew_ns = int(clock_skew_ms * 1e6)
+        self._cancel_prob = cancel_prob
+        self._market_prob = market_prob
+        self._mean_offset = mean_offset
+        self._max_lots = max_lots
+        self._lot_size = lot_size
+        self._max_sim_orders = max_sim_orders
+        self._min_depth = min_depth
+        self._sim_order_ids = []
+        self._sim_seq = 0
+        self._connections = []
+        self._runner = None
+        self.stats = {'events': 0, 'book_messages': 0, 'orders': 0,
+                      'amends': 0, 'cancels': 0, 'rejects': 0,
+                      'account_fills': 0, 'ws_requests': 0, 'batches': 0,
+                      'reseeds': 0}
+
+    @abstractmethod
+    def get_routes(self) -> List[web.RouteDef]:
+        pass
+
+    @abstractmethod
+    def on_ws_message(self, conn: MockConnection, message: dict) -> None:
+        pass
+
+    def on_trade_message(self, conn: MockConnection, message: dict) -> None:
+        pass
+
+    def on_account_fills(self, fills: List[Fill]) -> None:
+        pass
+
+    def publish_book(self) -> None:
+        pass
+
+    def get_time_ns(self) -> int:
+        return time.time_ns() + self._clock_skew_ns
+
+    def is_timestamp_valid(self, timestamp: Union[str, int, None]) -> bool:
+        if timestamp is None:
+            return True
+        lag_ms = self.get_time_ns() // 1000000 - int(timestamp)
+        return -self._MAX_AHEAD_MS <= lag_ms <= self._RECV_WINDOW_MS
+
+    def get_delay(self) -> float:
+        return max(0.0, self._rng.gauss(mu=self._latency_ms,
+                                        sigma=self._jitter_ms)) / 1000.0
+
+    async def inject_latency(self) -> None:
+        delay = self.get_delay()
+        if delay > 0:
+            await asyncio.sleep(delay=delay)
+
+    def broadcast(self, topic: str, message: str) -> None:
+        for conn in self._connections:
+            if topic in conn.topics:
+                conn.send(message=message)
+
+    def get_sim_qty(self) -> int:
+        return self._rng.randint(1, self._max_lots) * self._lot_size
+
+    def get_sim_order_id(self) -> str:
+        self._sim_seq += 1
+        return '%s-%d' % (OWNER_SIM, self._sim_seq)
+
+    def add_sim_order(self, is_bid: bool, tick: int) -> None:
+        order_id = self.get_sim_order_id()
+        order, fills = self._engine.submit_limit(
+            order_id=order_id, owner=OWNER_SIM, is_bid=is_bid, tick=tick,
+            qty=self.get_sim_qty())
+        if order.leaves_qty > 0:
+            self._sim_order_ids.append(order_id)
+        self.on_fills(fills=fills)
+
+    def cancel_sim_order(self) -> None:
+        ids = self._sim_order_ids
+        index = self._rng.randrange(len(ids))
+        ids[index], ids[-1] = ids[-1], ids[index]
+        self._engine.cancel(order_id=ids.pop())
+
+    def seed_book(self, levels: int) -> None:
+        fair_tick = self._engine.to_tick(price=self._fair_value.price)
+        for offset in range(1, levels + 1):
+            self.add_sim_order(is_bid=True, tick=fair_tick - offset)
+            self.add_sim_order(is_bid=False, tick=fair_tick + offset)
+        self._engine.pop_changes()
+
+    def simulate_event(self) -> None:
+        self.stats['events'] += 1
+        rng = self._rng
+        engine = self._engine
+        fair_tick = engine.to_tick(price=self._fair_value.price)
+        roll = rng.random()
+        if self._sim_order_ids and (
+                roll < self._cancel_prob
+                or len(self._sim_order_ids) >= self._max_sim_orders):
+            self.cancel_sim_order()
+        elif roll < self._cancel_prob + self._market_prob:
+            best_bid = engine.get_best(is_bid=True)
+            best_ask = engine.get_best(is_bid=False)
+            if best_bid is None or best_ask is None:
+                is_bid = rng.random() < 0.5
+            else:
+                is_bid = rng.random() < (0.5 + 0.1 * (
+                    fair_tick * 2 - best_bid - best_ask))
+            self.on_fills(fills=engine.submit_market(
+                order_id=self.get_sim_order_id(),
+                is_bid=is_bid, qty=self.get_sim_qty()))
+        else:
+            is_bid = rng.random() < 0.5
+            offset = int(rng.expovariate(lambd=1.0 / self._mean_offset))
+            tick = fair_tick - offset if is_bid else fair_tick + offset
+            self.add_sim_order(is_bid=is_bid, tick=tick)
+        self.replenish_book(fair_tick=fair_tick)
+
+    def replenish_book(self, fair_tick: int) -> None:
+        engine = self._engine
+        for is_bid in (True, False):
+            levels = engine.get_depth(is_bid=is_bid, n=self._min_depth)
+            missing = self._min_depth - len(levels)
+            if missing <= 0:
+                continue
+            self.stats['reseeds'] += 1
+            step = -1 if is_bid else 1
+            if levels:
+                edge = levels[-1][0]
+            else:
+                opposite = engine.get_best(is_bid=not is_bid)
+                edge = fair_tick if opposite is None else (
+                    min(fair_tick, opposite) if is_bid
+                    else max(fair_tick, opposite))
+            for i in range(1, missing + 1):
+                self.add_sim_order(is_bid=is_bid, tick=edge + step * i)
+
+    def on_fills(self, fills: List[Fill]) -> None:
+        account_fills = [fill for fill in fills
+                         if fill.maker.owner == OWNER_ACCOUNT]
+        if account_fills:
+            self.stats['account_fills'] += len(account_fills)
+            self.on_account_fills(fills=account_fills)
+
+    async def run_simulation(self) -> Coroutine:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        done = 0
+        while True:
+            await asyncio.sleep(delay=self._SIM_INTERVAL)
+            due = int((loop.time() - start) * self._rate)
+            while done < due:
+                self.simulate_event()
+                done += 1
+            self.publish_book()
+
+    async def serve_websocket(
+            self, request: web.Request,
+            on_message: Callable[[MockConnection, dict], None]
+    ) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        conn = MockConnection(ws=ws, get_delay=self.get_delay)
+        self._connections.append(conn)
+        sender = asyncio.create_task(coro=conn.run_sender())
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    on_message(conn, json.loads(s=msg.data))
+        finally:
+            self._connections.remove(conn)
+            sender.cancel()
+        return ws
+
+    async def handle_websocket(self, request: web.Request
+                               ) -> web.WebSocketResponse:
+        return await self.serve_websocket(request=request,
+                                          on_message=self.on_ws_message)
+
+    async def handle_trade_websocket(self, request: web.Request
+                                     ) -> web.WebSocketResponse:
+        return await self.serve_websocket(request=request,
+                                          on_message=self.on_trade_message)
+
+    def get_app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes(routes=[web.get(path=path,
+                                       handler=self.handle_websocket)
+                               for path in self._ws_paths])
+        app.add_routes(routes=[web.get(path=path,
+                                       handler=self.handle_trade_websocket)
+                               for path in self._trade_ws_paths])
+        app.add_routes(routes=self.get_routes())
+        return app
+
+    async def start(self, host: str, port: int) -> Coroutine:
+        self._runner = web.AppRunner(app=self.get_app())
+        await self._runner.setup()
+        await web.TCPSite(runner=self._runner, host=host, port=port).start()
+
+    async def stop(self) -> None:
+        for conn in list(self._connections):
+            await conn.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class MockBybit(MockVenue):
+    _TICKS_PER_UNIT = 2
+    _BOOK_DEPTH = 25
+    _SYMBOL = 'BTCUSD'
+    _ws_paths = ('/realtime',)
+    _trade_ws_paths = ('/v5/trade',)
+    _TIME_IN_FORCE = {'GTC': 'GoodTillCancel', 'IOC': 'ImmediateOrCancel',
+                      'FOK': 'FillOrKill', 'PostOnly': 'PostOnly'}
+    _account_orders: Dict[str, dict]
+    _published: List[Dict[int, int]]
+    _limits: Dict[str, WindowCounter]
+    _cross_seq: int
+    position: int
+
+    def __init__(self, fair_value: FairValue, rng: random.Random,
+                 **kwargs) -> None:
+        kwargs.setdefault('max_lots', 200)
+        kwargs.setdefault('lot_size', 100)
+        super().__init__(fair_value=fair_value, rng=rng, **kwargs)
+        self._account_orders = {}
+        self._published = [{}, {}]
+        self._limits = {'create': WindowCounter(limit=100),
+                        'replace': WindowCounter(limit=100),
+                        'cancel': WindowCounter(limit=100)}
+        self._cross_seq = 0
+        self.position = 0
+
+    def get_routes(self) -> List[web.RouteDef]:
+        return [web.get(path='/v2/public/time', handler=self.handle_time),
+                web.post(path='/v2/private/order/create',
+                         handler=self.handle_order_create),
+                web.post(path='/v2/private/order/replace',
+                         handler=self.handle_order_replace),
+                web.post(path='/v2/private/order/cancel',
+                         handler=self.handle_order_cancel),
+                web.get(path='/v2/private/order',
+                        handler=self.handle_active_orders),
+                web.get(path='/v2/private/position/list',
+                        handler=self.handle_position_list)]
+
+    def seed_book(self, levels: int) -> None:
+        super().seed_book(levels=levels)
+        self._published = [dict(self._engine.get_depth(
+            is_bid=is_bid, n=self._BOOK_DEPTH)) for is_bid in (False, True)]
+
+    def get_level(self, is_bid: bool, tick: int,
+                  size: Union[int, None] = None) -> dict:
+        level = {'price': '%.1f' % self._engine.to_price(tick=tick),
+                 'symbol': self._SYMBOL, 'id': tick * 5000,
+                 'side': 'Buy' if is_bid else 'Sell'}
+        if size is not None:
+            level['size'] = size
+        return level
+
+    def get_snapshot_message(self) -> str:
+        self.publish_book()
+        data = []
+        for is_bid in (True, False):
+            data.extend(self.get_level(is_bid=is_bid, tick=tick, size=size)
+                        for tick, size in self._published[is_bid].items())
+        return dumps(obj={'topic': BYBIT_BOOK_TOPIC, 'type': 'snapshot',
+                          'data': data, 'cross_seq': self._cross_seq,
+                          'timestamp_e6': self.get_time_ns() // 1000})
+
+    def publish_book(self) -> None:
+        if not self._engine.pop_changes():
+            return
+        deletes = []
+        updates = []
+        inserts = []
+        for is_bid in (True, False):
+            published = self._published[is_bid]
+            current = dict(self._engine.get_depth(is_bid=is_bid,
+                                                  n=self._BOOK_DEPTH))
+            for tick in published.keys() - current.keys():
+                deletes.append(self.get_level(is_bid=is_bid, tick=tick))
+            for tick, size in current.items():
+                prev = published.get(tick)
+                if prev is None:
+                    inserts.append(self.get_level(is_bid=is_bid, tick=tick,
+                                                  size=size))
+                elif prev != size:
+                    updates.append(self.get_level(is_bid=is_bid, tick=tick,
+                                                  size=size))
+            self._published[is_bid] = current
+        if not (deletes or updates or inserts):
+            return
+        self._cross_seq += 1
+        self.stats['book_messages'] += 1
+        self.broadcast(topic=BYBIT_BOOK_TOPIC, message=dumps(
+            obj={'topic': BYBIT_BOOK_TOPIC, 'type': 'delta',
+                 'data': {'delete': deletes, 'update': updates,
+                          'insert': inserts},
+                 'cross_seq': self._cross_seq,
+                 'timestamp_e6': self.get_time_ns() // 1000}))
+
+    def on_ws_message(self, conn: MockConnection, message: dict) -> None:
+        op = message.get('op')
+        if op == 'subscribe':
+            conn.topics.update(message.get('args'))
+            conn.send(message=dumps(
+                obj={'success': True, 'ret_msg': '',
+                     'conn_id': str(id(conn)), 'request': message}))
+            if BYBIT_BOOK_TOPIC in conn.topics:
+                conn.send(message=self.get_snapshot_message())
+        elif op == 'unsubscribe':
+            conn.topics.difference_update(message.get('args'))
+            conn.send(message=dumps(
+                obj={'success': True, 'ret_msg': '',
+                     'conn_id': str(id(conn)), 'request': message}))
+        elif op == 'ping':
+            conn.send(message=dumps(
+                obj={'success': True, 'ret_msg': 'pong',
+                     'conn_id': str(id(conn)), 'request': message}))
+
+    def get_ws_order(self, record: dict) -> dict:
+        ws_order = dict(record)
+        ws_order['price'] = '%.1f' % record['price']
+        return ws_order
+
+    def push_order(self, record: dict) -> None:
+        self.broadcast(topic='order', message=dumps(
+            obj={'topic': 'order', 'data': [self.get_ws_order(
+                record=record)]}))
+
+    def push_execution(self, record: dict, tick: int, qty: int,
+                       is_maker: bool) -> None:
+        self.broadcast(topic='execution', message=dumps(
+            obj={'topic': 'execution', 'data': [{
+                'symbol': self._SYMBOL, 'side': record['side'],
+                'order_id': record['order_id'], 'exec_id': str(uuid.uuid4()),
+                'order_link_id': record['order_link_id'],
+                'price': '%.1f' % self._engine.to_price(tick=tick),
+                'order_qty': record['qty'], 'exec_type': 'Trade',
+                'exec_qty': qty, 'leaves_qty': record['leaves_qty'],
+                'is_maker': is_maker,
+                'trade_time': time.strftime('%Y-%m-%dT%H:%M:%S.000Z',
+                                            time.gmtime())}]}))
+
+    def apply_account_fill(self, order_id: str, tick: int, qty: int,
+                           is_maker: bool) -> None:
+        record = self._account_orders.get(order_id)
+        if record is None:
+            return
+        record['cum_exec_qty'] += qty
+        record['leaves_qty'] -= qty
+        record['order_status'] = ('Filled' if record['leaves_qty'] == 0
+                                  else 'PartiallyFilled')
+        self.position += qty if record['side'] == 'Buy' else -qty
+        self.push_execution(record=record, tick=tick, qty=qty,
+                            is_maker=is_maker)
+        self.push_order(record=record)
+        if record['leaves_qty'] == 0:
+            del self._account_orders[order_id]
+
+    def on_account_fills(self, fills: List[Fill]) -> None:
+        for fill in fills:
+            self.apply_account_fill(order_id=fill.maker.order_id,
+                                    tick=fill.tick, qty=fill.qty,
+                                    is_maker=True)
+
+    def get_response_body(self, result: Union[dict, list, None],
+                          ret_code: int = 0, ret_msg: str = 'OK',
+                          limit: Union[WindowCounter, None] = None
+                          ) -> dict:
+        body = {'ret_code': ret_code, 'ret_msg': ret_msg, 'ext_code': '',
+                'result': result,
+                'time_now': '%.6f' % (self.get_time_ns() / 1e9)}
+        if limit is not None:
+            body.update({'rate_limit_status': limit.get_remaining(),
+                         'rate_limit_reset_ms': limit.get_reset_ms(),
+                         'rate_limit': limit.limit})
+        return body
+
+    def get_response(self, result: Union[dict, list, None],
+                     ret_code: int = 0, ret_msg: str = 'OK',
+                     limit: Union[WindowCounter, None] = None
+                     ) -> web.Response:
+        return web.json_response(data=self.get_response_body(
+            result=result, ret_code=ret_code, ret_msg=ret_msg, limit=limit),
+            dumps=dumps)
+
+    def check_rate_limit(self, name: str) -> bool:
+        if self._limits[name].hit(now_ms=self.get_time_ns() // 1000000):
+            return True
+        self.stats['rejects'] += 1
+        return False
+
+    def find_order_id(self, order_link_id: str) -> Union[str, None]:
+        for order_id, record in self._account_orders.items():
+            if record['order_link_id'] == order_link_id:
+                return order_id
+        return None
+
+    def cancel_account_order(self, order_id: str) -> None:
+        self._engine.cancel(order_id=order_id)
+        record = self._account_orders.pop(order_id)
+        record['order_status'] = 'Cancelled'
+        self.push_order(record=record)
+
+    async def handle_time(self, request: web.Request) -> web.Response:
+        await self.inject_latency()
+        return self.get_response(result={})
+
+    def get_timestamp_error(self, limit: WindowCounter) -> dict:
+        self.stats['rejects'] += 1
+        return self.get_response_body(
+            result=None, ret_code=10002,
+            ret_msg='invalid request, please check your timestamp and '
+                    'recv_window param', limit=limit)
+
+    def create_order(self, order: dict) -> dict:
+        self.stats['orders'] += 1
+        limit = self._limits['create']
+        if not self.check_rate_limit(name='create'):
+            return self.get_response_body(
+                result=None, ret_code=10006, ret_msg='too many visits',
+                limit=limit)
+        if not self.is_timestamp_valid(timestamp=order.get('timestamp')):
+            return self.get_timestamp_error(limit=limit)
+        side = order.get('side')
+        qty = order.get('qty')
+        price = float(order.get('price', 0))
+        tick = self._engine.to_tick(price=price)
+        if (side not in ('Buy', 'Sell') or not isinstance(qty, int)
+                or qty <= 0 or tick <= 0
+                or tick != price * self._TICKS_PER_UNIT):
+            self.stats['rejects'] += 1
+            return self.get_response_body(result=None, ret_code=10001,
+                                          ret_msg='params error',
+                                          limit=limit)
+        order_id = str(uuid.uuid4())
+        record = {'order_id': order_id,
+                  'order_link_id': order.get('order_link_id', ''),
+                  'symbol': self._SYMBOL, 'side': side,
+                  'order_type': order.get('order_type', 'Limit'),
+                  'price': self._engine.to_price(tick=tick), 'qty': qty,
+                  'time_in_force': order.get('time_in_force', 'GoodTillCancel'),
+                  'order_status': 'Created', 'leaves_qty': qty,
+                  'cum_exec_qty': 0,
+                  'create_time': time.strftime('%Y-%m-%dT%H:%M:%S.000Z',
+                                               time.gmtime())}
+        body = self.get_response_body(result=dict(record), limit=limit)
+        self.submit_account_order(record=record, tick=tick)
+        return body
+
+    async def handle_order_create(self, request: web.Request
+                                  ) -> web.Response:
+        await self.inject_latency()
+        return web.json_response(
+            data=self.create_order(order=await request.json()), dumps=dumps)
+
+    def submit_account_order(self, record: dict, tick: int) -> None:
+        is_bid = record['side'] == 'Buy'
+        order_id = record['order_id']
+        self._account_orders[order_id] = record
+        if (record['time_in_force'] == 'PostOnly'
+                and self._engine.is_crossing(is_bid=is_bid, tick=tick)):
+            record['order_status'] = 'Cancelled'
+            del self._account_orders[order_id]
+            self.push_order(record=record)
+            return
+        record['order_status'] = 'New'
+        self.push_order(record=record)
+        _, fills = self._engine.submit_limit(
+            order_id=order_id, owner=OWNER_ACCOUNT, is_bid=is_bid, tick=tick,
+            qty=record['leaves_qty'])
+        self.on_fills(fills=fills)
+        for fill in fills:
+            self.apply_account_fill(order_id=order_id, tick=fill.tick,
+                                    qty=fill.qty, is_maker=False)
+
+    def replace_order(self, order: dict) -> dict:
+        self.stats['amends'] += 1
+        limit = self._limits['replace']
+        if not self.check_rate_limit(name='replace'):
+            return self.get_response_body(
+                result=None, ret_code=10006, ret_msg='too many visits',
+                limit=limit)
+        if not self.is_timestamp_valid(timestamp=order.get('timestamp')):
+            return self.get_timestamp_error(limit=limit)
+        order_id = self.find_order_id(
+            order_link_id=order.get('order_link_id'))
+        if order_id is None:
+            self.stats['rejects'] += 1
+            return self.get_response_body(
+                result=None, ret_code=20001,
+                ret_msg='order not exists or too late to replace',
+                limit=limit)
+        record = self._account_orders[order_id]
+        price = float(order.get('p_r_price', record['price']))
+        qty = int(order.get('p_r_qty', record['qty']))
+        tick = self._engine.to_tick(price=price)
+        if qty <= record['cum_exec_qty']:
+            self.cancel_account_order(order_id=order_id)
+            return self.get_response_body(result={'order_id': order_id},
+                                          limit=limit)
+        is_bid = record['side'] == 'Buy'
+        if (record['time_in_force'] == 'PostOnly'
+                and self._engine.is_crossing(is_bid=is_bid, tick=tick)):
+            self.cancel_account_order(order_id=order_id)
+            return self.get_response_body(result={'order_id': order_id},
+                                          limit=limit)
+        order_obj, fills = self._engine.replace(order_id=order_id, tick=tick,
+                                                qty=qty)
+        record['price'] = self._engine.to_price(tick=tick)
+        record['qty'] = qty
+        record['leaves_qty'] = qty - record['cum_exec_qty']
+        record['order_status'] = 'New'
+        self.push_order(record=record)
+        self.on_fills(fills=fills)
+        for fill in fills:
+            self.apply_account_fill(order_id=order_id, tick=fill.tick,
+                                    qty=fill.qty, is_maker=False)
+        return self.get_response_body(result={'order_id': order_id},
+                                      limit=limit)
+
+    async def handle_order_replace(self, request: web.Request
+                                   ) -> web.Response:
+        await self.inject_latency()
+        return web.json_response(
+            data=self.replace_order(order=await request.json()), dumps=dumps)
+
+    def cancel_order(self, order: dict) -> dict:
+        self.stats['cancels'] += 1
+        limit = self._limits['cancel']
+        if not self.check_rate_limit(name='cancel'):
+            return self.get_response_body(
+                result=None, ret_code=10006, ret_msg='too many visits',
+                limit=limit)
+        if not self.is_timestamp_valid(timestamp=order.get('timestamp')):
+            return self.get_timestamp_error(limit=limit)
+        order_id = self.find_order_id(
+            order_link_id=order.get('order_link_id'))
+        if order_id is None:
+            self.stats['rejects'] += 1
+            return self.get_response_body(
+                result=None, ret_code=20001,
+                ret_msg='order not exists or too late to cancel',
+                limit=limit)
+        self.cancel_account_order(order_id=order_id)
+        return self.get_response_body(result={'order_id': order_id},
+                                      limit=limit)
+
+    async def handle_order_cancel(self, request: web.Request
+                                  ) -> web.Response:
+        await self.inject_latency()
+        return web.json_response(
+            data=self.cancel_order(order=await request.json()), dumps=dumps)
+
+    def get_v2_order(self, op: str, args: dict, header: dict) -> dict:
+        order = {'symbol': args.get('symbol'),
+                 'order_link_id': args.get('orderLinkId'),
+                 'timestamp': int(header.get('X-BAPI-TIMESTAMP', 0))}
+        if op == 'order.create':
+            qty = args.get('qty', '')
+            order.update({'side': args.get('side'),
+                          'order_type': args.get('orderType'),
+                          'qty': int(qty) if qty.isdigit() else None,
+                          'price': float(args.get('price', 0)),
+                          'time_in_force': self._TIME_IN_FORCE.get(
+                              args.get('timeInForce'), 'GoodTillCancel')})
+        elif op == 'order.amend':
+            order['p_r_price'] = float(args.get('price', 0))
+            if 'qty' in args:
+                order['p_r_qty'] = int(args.get('qty'))
+        return order
+
+    def on_trade_message(self, conn: MockConnection, message: dict) -> None:
+        op = message.get('op')
+        conn_id = str(id(conn))
+        if op == 'auth':
+            conn.authenticated = True
+            conn.send(message=dumps(obj={'retCode': 0, 'retMsg': 'OK',
+                                         'op': 'auth', 'connId': conn_id}))
+            return
+        if op == 'ping':
+            conn.send(message=dumps(obj={'retCode': 0, 'retMsg': 'OK',
+                                         'op': 'pong', 'connId': conn_id}))
+            return
+        self.stats['ws_requests'] += 1
+        handler = {'order.create': self.create_order,
+                   'order.amend': self.replace_order,
+                   'order.cancel': self.cancel_order}.get(op)
+        if not conn.authenticated:
+            body = self.get_response_body(result=None, ret_code=10003,
+                                          ret_msg='not authenticated')
+        elif handler is None:
+            body = self.get_response_body(result=None, ret_code=10001,
+                                          ret_msg='unknown op')
+        else:
+            order = self.get_v2_order(op=op, args=message.get('args')[0],
+                                      header=message.get('header') or {})
+            body = handler(order)
+            if body['result'] is not None:
+                body['result'] = {
+                    'orderId': body['result'].get('order_id'),
+                    'orderLinkId': order.get('order_link_id')}
+        header = {'Timenow': str(self.get_time_ns() // 1000000)}
+        if 'rate_limit_status' in body:
+            header.update({
+                'X-Bapi-Limit-Status': str(body['rate_limit_status']),
+                'X-Bapi-Limit': str(body['rate_limit']),
+                'X-Bapi-Limit-Reset-Timestamp':
+                    str(body['rate_limit_reset_ms'])})
+        conn.send(message=dumps(obj={
+            'reqId': message.get('reqId'), 'retCode': body['ret_code'],
+            'retMsg': body['ret_msg'], 'op': op,
+            'data': body['result'] or {}, 'header': header,
+            'connId': conn_id}))
+
+    async def handle_active_orders(self, request: web.Request
+                                   ) -> web.Response:
+        await self.inject_latency()
+        return self.get_response(result=[dict(record) for record
+                                         in self._account_orders.values()])
+
+    async def handle_position_list(self, request: web.Request
+                                   ) -> web.Response:
+        await self.inject_latency()
+        side = ('None' if self.position == 0
+                else 'Buy' if self.position > 0 else 'Sell')
+        return self.get_response(result={'symbol': self._SYMBOL,
+                                         'side': side,
+                                         'size': abs(self.position)})
+
+
+class MockBinance(MockVenue):
+    _TICKS_PER_UNIT = 10
+    _BOOK_DEPTH = 1000
+    _SYMBOL = 'BTCUSD_PERP'
+    _PAIR = 'BTCUSD'
+    _ws_paths = ('/ws', '/ws/')
+    _trade_ws_paths = ('/ws-dapi/v1',)
+    _depth_interval: float
+    _last_published_id: int
+    _pending_changes: Set[Tuple[bool, int]]
+    _weight: WindowCounter
+    _order_count: WindowCounter
+    _last_order_id: int
+    _account_orders: Dict[str, dict]
+    position: int
+
+    def __init__(self, fair_value: FairValue, rng: random.Random,
+                 depth_interval: float = 0.1, **kwargs) -> None:
+        kwargs.setdefault('max_lots', 50)
+        super().__init__(fair_value=fair_value, rng=rng, **kwargs)
+        self._depth_interval = depth_interval
+        self._last_published_id = 0
+        self._pending_changes = set()
+        self._weight = WindowCounter(limit=2400)
+        self._order_count = WindowCounter(limit=1200)
+        self._last_order_id = 0
+        self._account_orders = {}
+        self.position = 0
+
+    def seed_book(self, levels: int) -> None:
+        super().seed_book(levels=levels)
+        self._last_published_id = self._engine.update_id - 1
+
+    def get_routes(self) -> List[web.RouteDef]:
+        return [web.get(path='/dapi/v1/ping', handler=self.handle_ping),
+                web.get(path='/dapi/v1/time', handler=self.handle_time),
+                web.get(path='/dapi/v1/depth', handler=self.handle_depth),
+                web.post(path='/dapi/v1/order', handler=self.handle_order),
+                web.get(path='/dapi/v1/order',
+                        handler=self.handle_query_order),
+                web.post(path='/dapi/v1/batchOrders',
+                         handler=self.handle_batch_orders),
+                web.get(path='/dapi/v1/positionRisk',
+                        handler=self.handle_position_risk)]
+
+    def get_levels(self, is_bid: bool, ticks: List[int]) -> List[List[str]]:
+        engine = self._engine
+        return [['%.1f' % engine.to_price(tick=tick),
+                 str(engine.get_level_size(is_bid=is_bid, tick=tick))]
+                for tick in ticks]
+
+    def publish_book(self) -> None:
+        self._pending_changes |= self._engine.pop_changes()
+
+    def publish_depth_update(self) -> None:
+        update_id = self._engine.update_id
+        if update_id == self._last_published_id:
+            return
+        changes = self._pending_changes
+        self._pending_changes = set()
+        event_ms = self.get_time_ns() // 1000000
+        message = dumps(obj={
+            'e': 'depthUpdate', 'E': event_ms, 'T': event_ms,
+            's': self._SYMBOL, 'ps': self._PAIR,
+            'U': self._last_published_id + 1, 'u': update_id,
+            'pu': self._last_published_id,
+            'b': self.get_levels(is_bid=True, ticks=sorted(
+                tick for is_bid, tick in changes if is_bid)),
+            'a': self.get_levels(is_bid=False, ticks=sorted(
+                tick for is_bid, tick in changes if not is_bid))})
+        self._last_published_id = update_id
+        self.stats['book_messages'] += 1
+        self.broadcast(topic=BINANCE_DEPTH_TOPIC, message=message)
+
+    async def run_depth_stream(self) -> Coroutine:
+        while True:
+            await asyncio.sleep(delay=self._depth_interval)
+            self.publish_book()
+            self.publish_depth_update()
+
+    def on_ws_message(self, conn: MockConnection, message: dict) -> None:
+        if message.get('method') == 'SUBSCRIBE':
+            conn.topics.update(message.get('params'))
+            conn.send(message=dumps(obj={'result': None,
+                                         'id': message.get('id')}))
+
+    def get_response(self, data: Union[dict, list], status: int = 200,
+                     headers: Union[Dict[str, str], None] = None
+                     ) -> web.Response:
+        response_headers = {
+            'X-MBX-USED-WEIGHT-1M': str(self._weight.used),
+            'X-MBX-ORDER-COUNT-1M': str(self._order_count.used)}
+        if headers is not None:
+            response_headers.update(headers)
+        return web.json_response(data=data, status=status,
+                                 headers=response_headers, dumps=dumps)
+
+    def get_weight_error(self, weight: int
+                         ) -> Union[Tuple[int, dict, Dict[str, str]], None]:
+        now_ms = self.get_time_ns() // 1000000
+        if self._weight.hit(now_ms=now_ms, cost=weight):
+            return None
+        self.stats['rejects'] += 1
+        retry_after = max(1, (self._weight.get_reset_ms() - now_ms) // 1000)
+        return (429, {'code': -1003, 'msg': 'Too many requests.'},
+                {'Retry-After': str(retry_after)})
+
+    def check_weight(self, weight: int) -> Union[web.Response, None]:
+        error = self.get_weight_error(weight=weight)
+        if error is None:
+            return None
+        status, data, headers = error
+        return self.get_response(data=data, status=status, headers=headers)
+
+    async def handle_ping(self, request: web.Request) -> web.Response:
+        await self.inject_latency()
+        return self.check_weight(weight=1) or self.get_response(data={})
+
+    async def handle_time(self, request: web.Request) -> web.Response:
+        await self.inject_latency()
+        return self.check_weight(weight=1) or self.get_response(
+            data={'serverTime': self.get_time_ns() // 1000000})
+
+    async def handle_depth(self, request: web.Request) -> web.Response:
+        await self.inject_latency()
+        limit = min(int(request.query.get('limit', 500)), self._BOOK_DEPTH)
+        rejected = self.check_weight(weight=20 if limit > 500 else 10)
+        if rejected is not None:
+            return rejected
+        engine = self._engine
+        event_ms = self.get_time_ns() // 1000000
+        return self.get_response(data={
+            'lastUpdateId': engine.update_id, 'E': event_ms, 'T': event_ms,
+            'symbol': self._SYMBOL, 'pair': self._PAIR,
+            'bids': self.get_levels(is_bid=True, ticks=[
+                tick for tick, _ in engine.get_depth(is_bid=True, n=limit)]),
+            'asks': self.get_levels(is_bid=False, ticks=[
+                tick for tick, _ in engine.get_depth(is_bid=False,
+                                                     n=limit)])})
+
+    def place_order(self, order: Mapping[str, str], weight: int = 1
+                    ) -> Tuple[int, dict, Dict[str, str]]:
+        self.stats['orders'] += 1
+        error = self.get_weight_error(weight=weight)
+        if error is not None:
+            return error
+        if not self.is_timestamp_valid(timestamp=order.get('timestamp')):
+            return self.get_timestamp_error()
+        self._order_count.hit(now_ms=self.get_time_ns() // 1000000)
+        side = order.get('side')
+        qty = int(order.get('quantity', 0))
+        if (side not in ('BUY', 'SELL') or order.get('type') != 'MARKET'
+                or qty <= 0):
+            self.stats['rejects'] += 1
+            return 400, {'code': -1102, 'msg': 'Mandatory parameter missing '
+                                               'or malformed.'}, {}
+        self._last_order_id += 1
+        order_id = self._last_order_id
+        fills = self._engine.submit_market(order_id=str(order_id),
+                                           is_bid=side == 'BUY', qty=qty)
+        executed = sum(fill.qty for fill in fills)
+        self.stats['account_fills'] += len(fills)
+        self.position += executed if side == 'BUY' else -executed
+        avg_price = (sum(fill.tick * fill.qty for fill in fills)
+                     / executed / self._TICKS_PER_UNIT if executed else 0.0)
+        result = {
+            'orderId': order_id, 'symbol': self._SYMBOL, 'pair': self._PAIR,
+            'status': 'FILLED' if executed == qty else 'EXPIRED',
+            'clientOrderId': order.get('newClientOrderId', str(uuid.uuid4())),
+            'price': '0', 'avgPrice': '%.1f' % avg_price,
+            'origQty': str(qty), 'executedQty': str(executed),
+            'cumBase': '0', 'type': 'MARKET', 'side': side,
+            'positionSide': 'BOTH', 'timeInForce': 'GTC',
+            'updateTime': self.get_time_ns() // 1000000}
+        self._account_orders[result['clientOrderId']] = result
+        return 200, result, {}
+
+    async def handle_order(self, request: web.Request) -> web.Response:
+        await self.inject_latency()
+        status, data, headers = self.place_order(order=await request.post())
+        return self.get_response(data=data, status=status, headers=headers)
+
+    async def handle_query_order(self, request: web.Request
+                                 ) -> web.Response:
+        await self.inject_latency()
+        rejected = self.check_weight(weight=1)
+        if rejected is not None:
+            return rejected
+        if not self.is_timestamp_valid(
+                timestamp=request.query.get('timestamp')):
+            status, data, headers = self.get_timestamp_error()
+            return self.get_response(data=data, status=status,
+                                     headers=headers)
+        order = self._account_orders.get(
+            request.query.get('origClientOrderId'))
+        if order is None:
+            return self.get_response(data={
+                'code': -2013, 'msg': 'Order does not exist.'}, status=400)
+        return self.get_response(data=order)
+
+    def get_timestamp_error(self) -> Tuple[int, dict, Dict[str, str]]:
+        self.stats['rejects'] += 1
+        return 400, {'code': -1021, 'msg': 'Timestamp for this request is '
+                                           'outside of the recvWindow.'}, {}
+
+    def place_batch_orders(self, orders: List[Mapping[str, str]],
+                           timestamp: Union[str, None] = None
+                           ) -> Tuple[int, Union[dict, list],
+                                      Dict[str, str]]:
+        self.stats['batches'] += 1
+        error = self.get_weight_error(weight=5)
+        if error is not None:
+            return error
+        if not self.is_timestamp_valid(timestamp=timestamp):
+            return self.get_timestamp_error()
+        if not 0 < len(orders) <= 5:
+            self.stats['rejects'] += 1
+            return 400, {'code': -1130,
+                         'msg': "Data sent for parameter 'batchOrders' "
+                                'is not valid.'}, {}
+        return 200, [self.place_order(order=order, weight=0)[1]
+                     for order in orders], {}
+
+    async def handle_batch_orders(self, request: web.Request
+                                  ) -> web.Response:
+        await self.inject_latency()
+        form = await request.post()
+        status, data, headers = self.place_batch_orders(
+            orders=json.loads(form.get('batchOrders', '[]')),
+            timestamp=form.get('timestamp'))
+        return self.get_response(data=data, status=status, headers=headers)
+
+    def get_rate_limits(self) -> List[dict]:
+        return [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE',
+                 'intervalNum': 1, 'limit': self._weight.limit,
+                 'count': self._weight.used},
+                {'rateLimitType': 'ORDERS', 'interval': 'MINUTE',
+                 'intervalNum': 1, 'limit': self._order_count.limit,
+                 'count': self._order_count.used}]
+
+    def on_trade_message(self, conn: MockConnection, message: dict) -> None:
+        self.stats['ws_requests'] += 1
+        reply = {'id': message.get('id')}
+        if message.get('method') == 'order.place':
+            status, data, _ = self.place_order(order=message.get('params'))
+        else:
+            status, data = 400, {'code': -1100, 'msg': 'Unknown method.'}
+        reply['status'] = status
+        if status == 200:
+            reply['result'] = data
+        else:
+            if status == 429:
+                data = dict(data, data={
+                    'retryAfter': self._weight.get_reset_ms()})
+            reply['error'] = data
+        reply['rateLimits'] = self.get_rate_limits()
+        conn.send(message=dumps(obj=reply))
+
+    async def handle_position_risk(self, request: web.Request
+                                   ) -> web.Response:
+        await self.inject_latency()
+        rejected = self.check_weight(weight=1)
+        if rejected is not None:
+            return rejected
+        return self.get_response(data=[{
+            'symbol': self._SYMBOL, 'pair': self._PAIR,
+            'positionAmt': str(self.position), 'positionSide': 'BOTH',
+            'markPrice': '%.1f' % self._fair_value.price}])
+
+
+class MockExchange:
+    _host: str
+    _bybit_port: int
+    _binance_port: int
+    fair_value: FairValue
+    bybit: MockBybit
+    binance: MockBinance
+    _tasks: List[asyncio.Task]
+
+    def __init__(self, host: str = '127.0.0.1', bybit_port: int = 8081,
+                 binance_port: int = 8082, price: float = 50000.0,
+                 volatility: float = 0.0005, rate: float = 200.0,
+                 latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 depth_interval: float = 0.1,
+                 seed: Union[int, None] = None,
+                 clock_skew_ms: float = 0.0) -> None:
+        self._host = host
+        self._bybit_port = bybit_port
+        self._binance_port = binance_port
+        rng = random.Random(seed)
+        self.fair_value = FairValue(price=price, volatility=volatility,
+                                    rng=rng)
+        self.bybit = MockBybit(fair_value=self.fair_value, rng=rng,
+                               rate=rate, latency_ms=latency_ms,
+                               jitter_ms=jitter_ms,
+                               clock_skew_ms=clock_skew_ms)
+        self.binance = MockBinance(fair_value=self.fair_value, rng=rng,
+                                   rate=rate, latency_ms=latency_ms,
+                                   jitter_ms=jitter_ms,
+                                   depth_interval=depth_interval,
+                                   clock_skew_ms=clock_skew_ms)
+        self._tasks = []
+
+    def get_client_endpoints(self) -> Dict[str, str]:
+        return get_client_endpoints(host=self._host,
+                                    bybit_port=self._bybit_port,
+                                    binance_port=self._binance_port)
+
+    async def start(self) -> None:
+        self.bybit.seed_book(levels=40)
+        self.binance.seed_book(levels=200)
+        await self.bybit.start(host=self._host, port=self._bybit_port)
+        await self.binance.start(host=self._host, port=self._binance_port)
+        self._tasks = [asyncio.create_task(coro=coro) for coro in (
+            self.fair_value.run(), self.bybit.run_simulation(),
+            self.binance.run_simulation(), self.binance.run_depth_stream())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await self.bybit.stop()
+        await self.binance.stop()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {'bybit': dict(self.bybit.stats, position=self.bybit.position),
+                'binance': dict(self.binance.stats,
+                                position=self.binance.position)}
+
+
+async def run_forever(exchange: MockExchange) -> Coroutine:
+    await exchange.start()
+    print('Mock exchange endpoints:', exchange.get_client_endpoints())
+    try:
+        while True:
+            await asyncio.sleep(delay=3600)
+    finally:
+        await exchange.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--bybit-port', type=int, default=8081)
+    parser.add_argument('--binance-port', type=int, default=8082)
+    parser.add_argument('--price', type=float, default=50000.0)
+    parser.add_argument('--volatility', type=float, default=0.0005,
+                        help='fair value volatility per sqrt(second)')
+    parser.add_argument('--rate', type=float, default=200.0,
+                        help='simulated book events per second per venue')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--depth-interval', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--clock-skew-ms', type=float, default=0.0,
+                        help='offset of the venue clocks from local time')
+    args = parser.parse_args()
+    mock_exchange = MockExchange(
+        host=args.host, bybit_port=args.bybit_port,
+        binance_port=args.binance_port, price=args.price,
+        volatility=args.volatility, rate=args.rate,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        depth_interval=args.depth_interval, seed=args.seed,
+        clock_skew_ms=args.clock_skew_ms)
+    try:
+        asyncio.get_event_loop().run_until_complete(
+            future=run_forever(exchange=mock_exchange))
+    except KeyboardInterrupt:
+        print(json.dumps(obj=mock_exchange.get_stats(), indent=2))
@@ -1,40 +1,434 @@
-from typing import List, Union
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
+
+
+class BookMetrics(NamedTuple):
+    microprice: Union[float, None]
+    imbalance: float
+    bid_depth: int
+    ask_depth: int
+    bid_band_size: int
+    ask_band_size: int
+    bid_vwap: Union[float, None]
+    ask_vwap: Union[float, None]
+
+
+class PriceLadder:
+    _ticks_per_unit: int
+    _is_bid: bool
+    _capacity: int
+    _mask: int
+    _sizes: List[int]
+    _low: int
+    _ring_depth: int
+    _overflow: Dict[int, int]
+    _band_ticks: int
+    _vwap_size: int
+    _vwap_reach: Union[int, None]
+    _vwap_price: Union[float, None]
+    _vwap_dirty: bool
+    best: Union[int, None]
+    depth: int
+    total_size: int
+    band_size: int
+    band_notional: int
+
+    def __init__(self, ticks_per_unit: int, is_bid: bool,
+                 capacity_bits: int = 16, band_ticks: int = 10,
+                 vwap_size: int = 0) -> None:
+        self._ticks_per_unit = ticks_per_unit
+        self._is_bid = is_bid
+        self._capacity = 1 << capacity_bits
+        self._mask = self._capacity - 1
+        self._sizes = [0] * self._capacity
+        self._low = 0
+        self._ring_depth = 0
+        self._overflow = {}
+        self._band_ticks = band_ticks
+        self._vwap_size = vwap_size
+        self._vwap_reach = None
+        self._vwap_price = None
+        self._vwap_dirty = True
+        self.best = None
+        self.depth = 0
+        self.total_size = 0
+        self.band_size = 0
+        self.band_notional = 0
+
+    def __len__(self) -> int:
+        return self.depth
+
+    def __getitem__(self, index: int) -> List[Union[float, int]]:
+        if index < 0:
+            index += self.depth
+        if 0 <= index < self.depth:
+            if index == 0:
+                return [self.best / self._ticks_per_unit,
+                        self._sizes[self.best & self._mask]]
+            for i, level in enumerate(self):
+                if i == index:
+                    return level
+        raise IndexError('price ladder index out of range')
+
+    def __iter__(self) -> Iterator[List[Union[float, int]]]:
+        for tick, size in self.iter_ticks():
+            yield [tick / self._ticks_per_unit, size]
+
+    def iter_ticks(self) -> Iterator[Tuple[int, int]]:
+        if self.best is None:
+            return
+        sizes = self._sizes
+        mask = self._mask
+        step = -1 if self._is_bid else 1
+        tick = self.best
+        found = 0
+        while found < self._ring_depth:
+            size = sizes[tick & mask]
+            if size:
+                found += 1
+                yield tick, size
+            tick += step
+        for tick in sorted(self._overflow, reverse=self._is_bid):
+            yield tick, self._overflow[tick]
+
+    def to_tick(self, price: float) -> int:
+        return int(round(price * self._ticks_per_unit))
+
+    def get_best_price(self) -> Union[float, None]:
+        if self.best is None:
+            return None
+        return self.best / self._ticks_per_unit
+
+    def get_size(self, tick: int) -> int:
+        offset = tick - self._low
+        if 0 <= offset <= self._mask:
+            return self._sizes[tick & self._mask]
+        return self._overflow.get(tick, 0)
+
+    def set(self, tick: int, size: int) -> None:
+        if size == 0:
+            self.remove(tick=tick)
+            return
+        best = self.best
+        offset = tick - self._low
+        if offset < 0 or offset > self._mask:
+            if best is None or self._is_better(tick=tick, than=best):
+                self._move_window(new_low=self._get_window_low(tick=tick))
+            else:
+                old = self._overflow.get(tick, 0)
+                if not old:
+                    self.depth += 1
+                self._overflow[tick] = size
+                self._on_size_change(tick=tick, change=size - old)
+                return
+        slot = tick & self._mask
+        sizes = self._sizes
+        old = sizes[slot]
+        if old == 0:
+            self._ring_depth += 1
+            self.depth += 1
+        sizes[slot] = size
+        change = size - old
+        self.total_size += change
+        if best is None:
+            self.best = tick
+            self._move_band(old_best=best)
+            return
+        if self._is_bid:
+            distance = best - tick
+            better_than_reach = (self._vwap_reach is None
+                                 or tick >= self._vwap_reach)
+        else:
+            distance = tick - best
+            better_than_reach = (self._vwap_reach is None
+                                 or tick <= self._vwap_reach)
+        if distance < 0:
+            self.best = tick
+            self._move_band(old_best=best)
+            return
+        if distance < self._band_ticks:
+            self.band_size += change
+            self.band_notional += change * tick
+        if better_than_reach:
+            self._vwap_dirty = True
+
+    def remove(self, tick: int) -> None:
+        offset = tick - self._low
+        if offset < 0 or offset > self._mask:
+            old = self._overflow.pop(tick, None)
+            if old is not None:
+                self.depth -= 1
+                self._on_size_change(tick=tick, change=-old)
+            return
+        slot = tick & self._mask
+        sizes = self._sizes
+        old = sizes[slot]
+        if old == 0:
+            return
+        sizes[slot] = 0
+        self._ring_depth -= 1
+        self.depth -= 1
+        self.total_size -= old
+        best = self.best
+        if tick == best:
+            self.band_size -= old
+            self.band_notional -= old * tick
+            self._find_next_best(removed=tick)
+            self._move_band(old_best=tick)
+            return
+        if self._is_bid:
+            distance = best - tick
+            better_than_reach = (self._vwap_reach is None
+                                 or tick >= self._vwap_reach)
+        else:
+            distance = tick - best
+            better_than_reach = (self._vwap_reach is None
+                                 or tick <= self._vwap_reach)
+        if distance < self._band_ticks:
+            self.band_size -= old
+            self.band_notional -= old * tick
+        if better_than_reach:
+            self._vwap_dirty = True
+
+    def clear(self) -> None:
+        self._sizes = [0] * self._capacity
+        self._ring_depth = 0
+        self._overflow = {}
+        self.best = None
+        self.depth = 0
+        self.total_size = 0
+        self.band_size = 0
+        self.band_notional = 0
+        self._vwap_dirty = True
+
+    def _get_distance(self, tick: int) -> int:
+        return self.best - tick if self._is_bid else tick - self.best
+
+    def _on_size_change(self, tick: int, change: int) -> None:
+        self.total_size += change
+        distance = self._get_distance(tick=tick)
+        if distance < self._band_ticks:
+            self.band_size += change
+            self.band_notional += change * tick
+        if (self._vwap_reach is None
+                or not self._is_better(tick=self._vwap_reach, than=tick)):
+            self._vwap_dirty = True
+
+    def _get_band_sums(self, start: int, stop: int) -> Tuple[int, int]:
+        size_sum = 0
+        notional_sum = 0
+        if start >= self._low and stop - 1 - self._low <= self._mask:
+            sizes = self._sizes
+            mask = self._mask
+            for tick in range(start, stop):
+                size = sizes[tick & mask]
+                if size:
+                    size_sum += size
+                    notional_sum += size * tick
+            return size_sum, notional_sum
+        get_size = self.get_size
+        for tick in range(start, stop):
+            size = get_size(tick=tick)
+            if size:
+                size_sum += size
+                notional_sum += size * tick
+        return size_sum, notional_sum
+
+    def _get_band_range(self, best: int) -> Tuple[int, int]:
+        if self._is_bid:
+            return best - self._band_ticks + 1, best + 1
+        return best, best + self._band_ticks
+
+    def _move_band(self, old_best: Union[int, None]) -> None:
+        self._vwap_dirty = True
+        best = self.best
+        if best is None:
+            self.band_size = 0
+            self.band_notional = 0
+            return
+        new_start, new_stop = self._get_band_range(best=best)
+        if old_best is None or abs(best - old_best) >= self._band_ticks:
+            self.band_size, self.band_notional = self._get_band_sums(
+                start=new_start, stop=new_stop)
+            return
+        old_start, old_stop = self._get_band_range(best=old_best)
+        if new_start > old_start:
+            left_size, left_notional = self._get_band_sums(
+                start=old_start, stop=new_start)
+            entered_size, entered_notional = self._get_band_sums(
+                start=old_stop, stop=new_stop)
+        else:
+            left_size, left_notional = self._get_band_sums(
+                start=new_stop, stop=old_stop)
+            entered_size, entered_notional = self._get_band_sums(
+                start=new_start, stop=old_start)
+        self.band_size += entered_size - left_size
+        self.band_notional += entered_notional - left_notional
+
+    def get_best_size(self) -> int:
+        if self.best is None:
+            return 0
+        return self.get_size(tick=self.best)
+
+    def get_band_vwap(self) -> Union[float, None]:
+        if not self.band_size:
+            return None
+        return self.band_notional / self.band_size / self._ticks_per_unit
+
+    def get_vwap_to_size(self) -> Union[float, None]:
+        if self._vwap_dirty:
+            self._vwap_dirty = False
+            self._vwap_reach = None
+            self._vwap_price = None
+            remaining = self._vwap_size
+            filled = 0
+            notional = 0
+            for tick, size in self.iter_ticks():
+                take = size if size < remaining else remaining
+                filled += take
+                notional += take * tick
+                remaining -= take
+                if remaining <= 0:
+                    self._vwap_reach = tick
+                    break
+            if filled:
+                self._vwap_price = notional / filled / self._ticks_per_unit
+        return self._vwap_price
+
+    def _is_better(self, tick: int, than: int) -> bool:
+        return tick > than if self._is_bid else tick < than
+
+    def _get_window_low(self, tick: int) -> int:
+        if self._is_bid:
+            return tick - self._capacity + (self._capacity >> 2)
+        return tick - (self._capacity >> 2)
+
+    def _find_next_best(self, removed: int) -> None:
+        if self._ring_depth == 0:
+            if self._overflow:
+                if self._is_bid:
+                    best = max(self._overflow)
+                else:
+                    best = min(self._overflow)
+                self._move_window(new_low=self._get_window_low(tick=best))
+                self.best = best
+            else:
+                self.best = None
+            return
+        sizes = self._sizes
+        mask = self._mask
+        step = -1 if self._is_bid else 1
+        tick = removed + step
+        while sizes[tick & mask] == 0:
+            tick += step
+        self.best = tick
+
+    def _move_window(self, new_low: int) -> None:
+        old_low = self._low
+        self._low = new_low
+        sizes = self._sizes
+        mask = self._mask
+        if self._ring_depth > 0:
+            shift = new_low - old_low
+            if abs(shift) >= self._capacity:
+                leaving = range(old_low, old_low + self._capacity)
+            elif shift > 0:
+                leaving = range(old_low, new_low)
+            else:
+                leaving = range(new_low + self._capacity,
+                                old_low + self._capacity)
+            for tick in leaving:
+                slot = tick & mask
+                size = sizes[slot]
+                if size:
+                    self._overflow[tick] = size
+                    sizes[slot] = 0
+                    self._ring_depth -= 1
+        if self._overflow:
+            entering = [tick for tick in self._overflow
+                        if 0 <= tick - new_low <= mask]
+            for tick in entering:
+                sizes[tick & mask] = self._overflow.pop(tick)
+                self._ring_depth += 1
 
 
 class OrderBook:
-    bids: List[List[Union[float, int]]]
-    asks: List[List[Union[float, int]]]
+    bids: PriceLadder
+    asks: PriceLadder
     BID_STR = 'BID'
     ASK_STR = 'ASK'
+    TICKS_PER_UNIT = 2
+    BAND_TICKS = 10
+    VWAP_SIZE = 0
+    ticks_per_unit: int
 
     def __init__(self, bids: List[List[Union[float, int]]],
-                 asks: List[List[Union[float, int]]]) -> None:
-        self.bids = bids
-        self.asks = asks
+                 asks: List[List[Union[float, int]]],
+                 ticks_per_unit: Union[int, None] = None) -> None:
+        self.ticks_per_unit = (ticks_per_unit if ticks_per_unit is not None
+                               else self.TICKS_PER_UNIT)
+        self.bids = PriceLadder(ticks_per_unit=self.ticks_per_unit,
+                                is_bid=True, band_ticks=self.BAND_TICKS,
+                                vwap_size=self.VWAP_SIZE)
+        self.asks = PriceLadder(ticks_per_unit=self.ticks_per_unit,
+                                is_bid=False, band_ticks=self.BAND_TICKS,
+                                vwap_size=self.VWAP_SIZE)
+        for level in bids:
+            self.bids.set(tick=self.bids.to_tick(price=level[0]),
+                          size=level[1])
+        for level in asks:
+            self.asks.set(tick=self.asks.to_tick(price=level[0]),
+                          size=level[1])
+
+    def get_ladder(self, side: str) -> PriceLadder:
+        return self.bids if side == self.BID_STR else self.asks
+
+    def get_bbo(self) -> Union[Tuple[float, float], None]:
+        if self.bids.best is None or self.asks.best is None:
+            return None
+        return (self.bids.best / self.ticks_per_unit,
+                self.asks.best / self.ticks_per_unit)
+
+    def get_microprice(self) -> Union[float, None]:
+        if self.bids.best is None or self.asks.best is None:
+            return None
+        bid_size = self.bids.get_best_size()
+        ask_size = self.asks.get_best_size()
+        return ((self.bids.best * ask_size + self.asks.best * bid_size)
+                / (bid_size + ask_size) / self.ticks_per_unit)
+
+    def get_imbalance(self) -> float:
+        bid_size = self.bids.band_size
+        ask_size = self.asks.band_size
+        total = bid_size + ask_size
+        return (bid_size - ask_size) / total if total else 0.0
+
+    def get_metrics(self) -> BookMetrics:
+        return BookMetrics(
+            microprice=self.get_microprice(), imbalance=self.get_imbalance(),
+            bid_depth=self.bids.total_size, ask_depth=self.asks.total_size,
+            bid_band_size=self.bids.band_size,
+            ask_band_size=self.asks.band_size,
+            bid_vwap=self.bids.get_vwap_to_size(),
+            ask_vwap=self.asks.get_vwap_to_size())
 
     def delete(self, side: str, level: List[Union[float, int]]) -> None:
-        remove_level = None
-        if side == self.BID_STR:
-            for compare in self.bids:
-                if compare[0] == level[0]:
-                    remove_level = compare
-                    break
-            if remove_level is not None:
-                self.bids.remove(remove_level)
-        else:
-            for compare in self.asks:
-                if compare[0] == level[0]:
-                    remove_level = compare
-                    break
-            if remove_level is not None:
-                self.asks.remove(remove_level)
+        ladder = self.get_ladder(side=side)
+        ladder.remove(tick=ladder.to_tick(price=level[0]))
+
+    def set_level(self, side: str, level: List[Union[float, int]]) -> None:
+        ladder = self.get_ladder(side=side)
+        ladder.set(tick=ladder.to_tick(price=level[0]), size=level[1])
 
 
 class BybitOrderBook(OrderBook):
     BID_STR = 'Buy'
     ASK_STR = 'Sell'
+    TICKS_PER_UNIT = 2
+    BAND_TICKS = 10
+    VWAP_SIZE = 100000
 
-    def __init__(self, depth_snapshot: dict) -> None:
+    def __init__(self, depth_snapshot: dict,
+                 ticks_per_unit: Union[int, None] = None) -> None:
         bids = []
         asks = []
         for level in depth_snapshot.get('data'):
@@ -42,33 +436,32 @@ class BybitOrderBook(OrderBook):
                 bids.append(self.get_parsed_lvl(level=level))
             else:
                 asks.append(self.get_parsed_lvl(level=level))
-        bids.sort(key=lambda x: x[0], reverse=True)
-        asks.sort(key=lambda x: x[0])
-        super().__init__(bids=bids, asks=asks)
+        super().__init__(bids=bids, asks=asks, ticks_per_unit=ticks_per_unit)
 
     @staticmethod
     def get_parsed_lvl(level: dict) -> List[Union[float, int]]:
         return [float(level.get('price')), level.get('size')]
 
     def update(self, side: str, level: List[Union[float, int]]) -> None:
-        if side == self.BID_STR:
-            for compare in self.bids:
-                if compare[0] == level[0]:
-                    compare[1] = level[1]
-                    return
-        else:
-            for compare in self.asks:
-                if compare[0] == level[0]:
-                    compare[1] = level[1]
-                    return
+        self.set_level(side=side, level=level)
 
     def insert(self, side: str, level: List[Union[float, int]]) -> None:
-        if side == self.BID_STR:
-            self.bids.append(level)
-            self.bids.sort(key=lambda x: x[0], reverse=True)
-        else:
-            self.asks.append(level)
-            self.asks.sort(key=lambda x: x[0])
+        self.set_level(side=side, level=level)
+
+    def apply_levels(self, deletes: List[Tuple[bool, float]],
+                     updates: List[Tuple[bool, float, int]],
+                     inserts: List[Tuple[bool, float, int]]) -> None:
+        bids = self.bids
+        asks = self.asks
+        for is_bid, price in deletes:
+            ladder = bids if is_bid else asks
+            ladder.remove(tick=ladder.to_tick(price=price))
+        for is_bid, price, size in updates:
+            ladder = bids if is_bid else asks
+            ladder.set(tick=ladder.to_tick(price=price), size=size)
+        for is_bid, price, size in inserts:
+            ladder = bids if is_bid else asks
+            ladder.set(tick=ladder.to_tick(price=price), size=size)
 
     def handle_delta(self, delta_message: dict) -> None:
         data = delta_message.get('data')
@@ -84,10 +477,16 @@ class BybitOrderBook(OrderBook):
 
 
 class BinanceOrderBook(OrderBook):
-    def __init__(self, depth_snapshot: dict) -> None:
+    TICKS_PER_UNIT = 10
+    BAND_TICKS = 50
+    VWAP_SIZE = 1000
+
+    def __init__(self, depth_snapshot: dict,
+                 ticks_per_unit: Union[int, None] = None) -> None:
         super().__init__(
             bids=self.convert_response_list(values=depth_snapshot.get('bids')),
-            asks=self.convert_response_list(values=depth_snapshot.get('asks')))
+            asks=self.convert_response_list(values=depth_snapshot.get('asks')),
+            ticks_per_unit=ticks_per_unit)
 
     @staticmethod
     def convert_response_list(
@@ -99,37 +498,27 @@ class BinanceOrderBook(OrderBook):
 
     def insert_or_update(self, side: str,
                          level: List[Union[float, int]]) -> None:
-        if side == self.BID_STR:
-            for compare in self.bids:
-                if compare[0] == level[0]:
-                    compare[1] = level[1]
-                    return
-            self.bids.append(level)
-            self.bids.sort(key=lambda x: x[0], reverse=True)
-        else:
-            for compare in self.asks:
-                if compare[0] == level[0]:
-                    compare[1] = level[1]
-                    return
-            self.asks.append(level)
-            self.asks.sort(key=lambda x: x[0])
+        self.set_level(side=side, level=level)
+
+    def apply_levels(self, bids: List[Tuple[float, int]],
+                     asks: List[Tuple[float, int]]) -> None:
+        ladder = self.bids
+        for price, size in bids:
+            ladder.set(tick=ladder.to_tick(price=price), size=size)
+        ladder = self.asks
+        for price, size in asks:
+            ladder.set(tick=ladder.to_tick(price=price), size=size)
 
     def parse_update(self, depth_update: dict) -> None:
         raw_bids = depth_update.get('b')
         if raw_bids is not None:
-            parsed_bids = self.convert_response_list(values=raw_bids)
-            for bid in parsed_bids:
-                if bid[1] == 0:
-                    self.delete(side=self.BID_STR, level=bid)
-                else:
-                    self.insert_or_update(side=self.BID_STR, level=bid)
+            bids = self.bids
+            for price, size in raw_bids:
+                bids.set(tick=bids.to_tick(price=float(price)),
+                         size=int(size))
         raw_asks = depth_update.get('a')
         if raw_asks is not None:
-            parsed_asks = self.convert_response_list(values=raw_asks)
-            for ask in parsed_asks:
-                if ask[1] == 0:
-                    self.delete(side=self.ASK_STR, level=ask)
-                else:
-                    self.insert_or_update(side=self.ASK_STR, level=ask)
-
-
+            asks = self.asks
+            for price, size in raw_asks:
+                asks.set(tick=asks.to_tick(price=float(price)),
+                         size=int(size))
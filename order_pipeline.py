@@ -0,0 +1,94 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, NamedTuple, \
+    Tuple, Union
+from rate_limiter import PRIORITY_NEW
+
+ACTION_NEW = 0
+ACTION_AMEND = 1
+ACTION_CANCEL = 2
+
+
+class OrderAction(NamedTuple):
+    kind: int
+    order: OrderedDict
+    ord_link_id: Union[List[Union[str, None]], None] = None
+    priority: int = PRIORITY_NEW
+
+
+class OrderLane:
+    _send: Callable[[OrderAction], Awaitable[bool]]
+    _pending: Deque[OrderAction]
+    _in_flight: Union[OrderAction, None]
+    _last_amend: Dict[str, Tuple[str, Union[str, None]]]
+    submitted: int
+    sent: int
+    coalesced: int
+    deduplicated: int
+
+    def __init__(self, send: Callable[[OrderAction], Awaitable[bool]]
+                 ) -> None:
+        self._send = send
+        self._pending = deque()
+        self._in_flight = None
+        self._last_amend = {}
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.deduplicated = 0
+
+    @property
+    def is_busy(self) -> bool:
+        return self._in_flight is not None or len(self._pending) > 0
+
+    @staticmethod
+    def get_amend_key(order: OrderedDict) -> Tuple[str, Union[str, None]]:
+        return order.get('p_r_price'), order.get('p_r_qty')
+
+    def submit(self, action: OrderAction) -> bool:
+        self.submitted += 1
+        if action.kind != ACTION_NEW:
+            ord_link_id = action.order.get('order_link_id')
+            for i, pending in enumerate(self._pending):
+                if (pending.kind == ACTION_AMEND and pending.order.get(
+                        'order_link_id') == ord_link_id):
+                    self._pending[i] = action
+                    self.coalesced += 1
+                    return True
+            if action.kind == ACTION_AMEND and (
+                    self._last_amend.get(ord_link_id)
+                    == self.get_amend_key(order=action.order)):
+                self.deduplicated += 1
+                return False
+        self._pending.append(action)
+        self.dispatch_next()
+        return True
+
+    def dispatch_next(self) -> None:
+        if self._in_flight is not None or not self._pending:
+            return
+        action = self._pending.popleft()
+        self._in_flight = action
+        if action.kind == ACTION_AMEND:
+            self._last_amend[action.order.get('order_link_id')] = (
+                self.get_amend_key(order=action.order))
+        else:
+            self._last_amend.clear()
+        asyncio.create_task(coro=self.run(action=action))
+
+    async def run(self, action: OrderAction) -> None:
+        try:
+            self.sent += 1
+            if not await self._send(action):
+                if action.kind == ACTION_AMEND:
+                    self._last_amend.pop(
+                        action.order.get('order_link_id'), None)
+        finally:
+            self._in_flight = None
+            self.dispatch_next()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'submitted': self.submitted, 'sent': self.sent,
+                'coalesced': self.coalesced,
+                'deduplicated': self.deduplicated,
+                'pending': len(self._pending)}
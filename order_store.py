@@ -0,0 +1,184 @@
+from typing import Dict, Iterator, List, Tuple, Union
+
+ORDER_ACTIVE = 0
+ORDER_FILLED = 1
+ORDER_CANCELLED = 2
+ORDER_CANCEL_UNKNOWN = 3
+ORDER_IGNORED = 4
+ACTIVE_STATUSES = frozenset(('Created', 'New', 'PartiallyFilled',
+                             'PendingCancel'))
+CANCEL_STATUSES = frozenset(('Cancelled', 'Rejected'))
+
+PriceKey = Tuple[bool, float]
+
+
+class OrderRecord:
+    __slots__ = ('ord_link_id', 'order_id', 'is_bid', 'price', 'qty',
+                 'leaves_qty', 'status')
+    ord_link_id: str
+    order_id: Union[str, None]
+    is_bid: bool
+    price: float
+    qty: int
+    leaves_qty: int
+    status: str
+
+    def __init__(self, ord_link_id: str, order_id: Union[str, None],
+                 is_bid: bool, price: float, qty: int, leaves_qty: int,
+                 status: str) -> None:
+        self.ord_link_id = ord_link_id
+        self.order_id = order_id
+        self.is_bid = is_bid
+        self.price = price
+        self.qty = qty
+        self.leaves_qty = leaves_qty
+        self.status = status
+
+    def get_price_key(self) -> PriceKey:
+        return self.is_bid, self.price
+
+
+class PositionState:
+    __slots__ = ('bybit', 'binance', 'unhedged', 'binance_pending')
+    bybit: Union[int, None]
+    binance: Union[int, None]
+    unhedged: int
+    binance_pending: int
+
+    def __init__(self) -> None:
+        self.bybit = None
+        self.binance = None
+        self.unhedged = 0
+        self.binance_pending = 0
+
+    def is_ready(self) -> bool:
+        return self.bybit is not None and self.binance is not None
+
+
+class OrderStore:
+    _orders: Dict[str, OrderRecord]
+    _by_side: Tuple[Dict[str, OrderRecord], Dict[str, OrderRecord]]
+    _by_price: Dict[PriceKey, Dict[str, OrderRecord]]
+    bid_quote: List[Union[str, None]]
+    ask_quote: List[Union[str, None]]
+    position: PositionState
+
+    def __init__(self) -> None:
+        self._orders = {}
+        self._by_side = ({}, {})
+        self._by_price = {}
+        self.bid_quote = [None]
+        self.ask_quote = [None]
+        self.position = PositionState()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, ord_link_id: str) -> bool:
+        return ord_link_id in self._orders
+
+    def get(self, ord_link_id: Union[str, None]
+            ) -> Union[OrderRecord, None]:
+        return self._orders.get(ord_link_id)
+
+    def get_quote_cell(self, is_bid: bool) -> List[Union[str, None]]:
+        return self.bid_quote if is_bid else self.ask_quote
+
+    def get_quote(self, is_bid: bool) -> Union[OrderRecord, None]:
+        return self._orders.get(self.get_quote_cell(is_bid=is_bid)[0])
+
+    def get_side_orders(self, is_bid: bool) -> Iterator[OrderRecord]:
+        return iter(self._by_side[is_bid].values())
+
+    def get_orders_at(self, is_bid: bool,
+                      price: float) -> Iterator[OrderRecord]:
+        return iter(self._by_price.get((is_bid, price), {}).values())
+
+    def upsert(self, order: dict) -> OrderRecord:
+        ord_link_id = order.get('order_link_id')
+        price = float(order.get('price'))
+        qty = int(order.get('qty'))
+        leaves_qty = order.get('leaves_qty')
+        record = self._orders.get(ord_link_id)
+        if record is None:
+            record = OrderRecord(
+                ord_link_id=ord_link_id, order_id=order.get('order_id'),
+                is_bid=order.get('side') == 'Buy', price=price, qty=qty,
+                leaves_qty=qty if leaves_qty is None else int(leaves_qty),
+                status=order.get('order_status'))
+            self._orders[ord_link_id] = record
+            self._by_side[record.is_bid][ord_link_id] = record
+            self._by_price.setdefault(record.get_price_key(),
+                                      {})[ord_link_id] = record
+            return record
+        if price != record.price:
+            self.unindex_price(record=record)
+            record.price = price
+            self._by_price.setdefault(record.get_price_key(),
+                                      {})[ord_link_id] = record
+        record.qty = qty
+        if leaves_qty is not None:
+            record.leaves_qty = int(leaves_qty)
+        record.status = order.get('order_status')
+        if record.order_id is None:
+            record.order_id = order.get('order_id')
+        return record
+
+    def unindex_price(self, record: OrderRecord) -> None:
+        key = record.get_price_key()
+        at_price = self._by_price.get(key)
+        if at_price is not None:
+            at_price.pop(record.ord_link_id, None)
+            if not at_price:
+                del self._by_price[key]
+
+    def remove(self, ord_link_id: str) -> Union[OrderRecord, None]:
+        record = self._orders.pop(ord_link_id, None)
+        if record is not None:
+            del self._by_side[record.is_bid][ord_link_id]
+            self.unindex_price(record=record)
+        return record
+
+    def clear(self) -> None:
+        self._orders.clear()
+        self._by_side[0].clear()
+        self._by_side[1].clear()
+        self._by_price.clear()
+
+    def load_snapshot(self, orders: List[dict]) -> None:
+        self.clear()
+        for order in orders:
+            self.upsert(order=order)
+
+    def on_order_update(self, order: dict) -> int:
+        status = order.get('order_status')
+        if status in ACTIVE_STATUSES:
+            self.upsert(order=order)
+            return ORDER_ACTIVE
+        if status == 'Filled':
+            self.remove(ord_link_id=order.get('order_link_id'))
+            return ORDER_FILLED
+        if status in CANCEL_STATUSES:
+            if self.remove(ord_link_id=order.get('order_link_id')) is None:
+                return ORDER_CANCEL_UNKNOWN
+            return ORDER_CANCELLED
+        return ORDER_IGNORED
+
+    def on_execution(self, execution: dict) -> int:
+        exec_qty = execution.get('exec_qty')
+        is_bid = execution.get('side') == 'Buy'
+        self.position.bybit += exec_qty if is_bid else -exec_qty
+        leaves_qty = execution.get('leaves_qty')
+        record = self._orders.get(execution.get('order_link_id'))
+        if record is not None and leaves_qty is not None:
+            record.leaves_qty = leaves_qty
+        return exec_qty if is_bid else -exec_qty
+
+    def clear_quote(self, ord_link_id: str) -> Union[bool, None]:
+        if self.bid_quote[0] == ord_link_id:
+            self.bid_quote[0] = None
+            return True
+        if self.ask_quote[0] == ord_link_id:
+            self.ask_quote[0] = None
+            return False
+        return None
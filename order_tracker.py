@@ -0,0 +1,126 @@
+import asyncio
+from typing import Coroutine, Dict, List
+import event_log
+import latency
+
+
+class InflightOrder:
+    __slots__ = ('ord_link_id', 'kind', 'sent_ns', 'acked', 'confirmed')
+    ord_link_id: str
+    kind: str
+    sent_ns: int
+    acked: bool
+    confirmed: bool
+
+    def __init__(self, ord_link_id: str, kind: str, sent_ns: int) -> None:
+        self.ord_link_id = ord_link_id
+        self.kind = kind
+        self.sent_ns = sent_ns
+        self.acked = False
+        self.confirmed = False
+
+
+class OrderTracker:
+    _venue: str
+    _inflight: Dict[str, InflightOrder]
+    _confirm_timeout_ns: int
+    _SWEEP_INTERVAL = 1.0
+    ack_timeout: float
+    sent: int
+    acked: int
+    rejected: int
+    confirmed: int
+    superseded: int
+    ack_timeouts: int
+    errors: int
+    confirm_timeouts: int
+    unmatched: int
+
+    def __init__(self, venue: str, ack_timeout: float = 2.0,
+                 confirm_timeout: float = 10.0) -> None:
+        self._venue = venue
+        self._inflight = {}
+        self._confirm_timeout_ns = int(confirm_timeout * 1e9)
+        self.ack_timeout = ack_timeout
+        self.sent = 0
+        self.acked = 0
+        self.rejected = 0
+        self.confirmed = 0
+        self.superseded = 0
+        self.ack_timeouts = 0
+        self.errors = 0
+        self.confirm_timeouts = 0
+        self.unmatched = 0
+
+    def on_send(self, ord_link_id: str, kind: str) -> InflightOrder:
+        self.sent += 1
+        if ord_link_id in self._inflight:
+            self.superseded += 1
+        entry = self._inflight[ord_link_id] = InflightOrder(
+            ord_link_id=ord_link_id, kind=kind, sent_ns=latency.clock())
+        return entry
+
+    def on_ack(self, entry: InflightOrder, accepted: bool) -> None:
+        if self._inflight.get(entry.ord_link_id) is not entry:
+            self.unmatched += 1
+            return
+        latency.RECORDER.record(stage=latency.STAGE_ORDER_ACK,
+                                venue=self._venue, start_ns=entry.sent_ns)
+        entry.acked = True
+        if not accepted:
+            self.rejected += 1
+            del self._inflight[entry.ord_link_id]
+            return
+        self.acked += 1
+        if entry.confirmed:
+            del self._inflight[entry.ord_link_id]
+
+    def on_ack_timeout(self, entry: InflightOrder) -> None:
+        self.ack_timeouts += 1
+        if self._inflight.get(entry.ord_link_id) is entry:
+            del self._inflight[entry.ord_link_id]
+        event_log.LOGGER.warning(event=event_log.EVENT_ORDER_TIMEOUT,
+                                 text=entry.kind,
+                                 value0=self.ack_timeout)
+
+    def on_error(self, entry: InflightOrder) -> None:
+        self.errors += 1
+        if self._inflight.get(entry.ord_link_id) is entry:
+            del self._inflight[entry.ord_link_id]
+
+    def on_confirm(self, ord_link_id: str) -> None:
+        entry = self._inflight.get(ord_link_id)
+        if entry is None or entry.confirmed:
+            return
+        latency.RECORDER.record(stage=latency.STAGE_ORDER_CONFIRM,
+                                venue=self._venue, start_ns=entry.sent_ns)
+        self.confirmed += 1
+        entry.confirmed = True
+        if entry.acked:
+            del self._inflight[ord_link_id]
+
+    def expire(self, now_ns: int) -> List[InflightOrder]:
+        expired = [entry for entry in self._inflight.values()
+                   if entry.acked
+                   and now_ns - entry.sent_ns > self._confirm_timeout_ns]
+        for entry in expired:
+            self.confirm_timeouts += 1
+            del self._inflight[entry.ord_link_id]
+            event_log.LOGGER.warning(
+                event=event_log.EVENT_ORDER_UNCONFIRMED, text=entry.kind,
+                value0=self._confirm_timeout_ns / 1e9)
+        return expired
+
+    async def run(self) -> Coroutine:
+        while True:
+            await asyncio.sleep(delay=self._SWEEP_INTERVAL)
+            self.expire(now_ns=latency.clock())
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'sent': self.sent, 'acked': self.acked,
+                'rejected': self.rejected, 'confirmed': self.confirmed,
+                'superseded': self.superseded,
+                'ack_timeouts': self.ack_timeouts, 'errors': self.errors,
+                'confirm_timeouts': self.confirm_timeouts,
+                'unmatched': self.unmatched,
+                'inflight': len(self._inflight)}
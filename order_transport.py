@@ -0,0 +1,461 @@
+import asyncio
+import json
+import random
+import ssl
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import Coroutine, Dict, Mapping, NamedTuple, Tuple, Union
+import aiohttp
+import certifi
+import websockets
+import event_log
+import latency
+from api_auth import ApiAuth, BybitApiAuth, BinanceApiAuth
+from rate_limiter import BINANCE_WEIGHT_HEADER, BINANCE_ORDER_COUNT_HEADER
+from session_pool import VenueSession
+
+TRANSPORT_REST = 'rest'
+TRANSPORT_WS = 'ws'
+OP_CREATE = 'create'
+OP_AMEND = 'amend'
+OP_CANCEL = 'cancel'
+OP_BATCH_CREATE = 'batch_create'
+TRANSPORT_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
+BYBIT_REST_PATHS = {OP_CREATE: '/v2/private/order/create',
+                    OP_AMEND: '/v2/private/order/replace',
+                    OP_CANCEL: '/v2/private/order/cancel'}
+BINANCE_REST_PATHS = {OP_CREATE: '/dapi/v1/order',
+                      OP_BATCH_CREATE: '/dapi/v1/batchOrders'}
+BINANCE_RATE_LIMIT_HEADERS = {'REQUEST_WEIGHT': BINANCE_WEIGHT_HEADER,
+                              'ORDERS': BINANCE_ORDER_COUNT_HEADER}
+
+
+class OrderReply(NamedTuple):
+    status: int
+    headers: Mapping[str, str]
+    body: Union[dict, list]
+    transport: str
+
+
+class OrderTransport:
+    _venue: str
+    requests: int
+
+    def __init__(self, venue: str) -> None:
+        self._venue = venue
+        self.requests = 0
+
+    @abstractmethod
+    async def request(self, op: str, order: OrderedDict
+                      ) -> Union[OrderReply, None]:
+        pass
+
+    @abstractmethod
+    def supports(self, op: str) -> bool:
+        pass
+
+    async def start(self) -> Coroutine:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'requests': self.requests}
+
+
+class RestOrderTransport(OrderTransport):
+    _session: VenueSession
+    _auth: ApiAuth
+    _paths: Dict[str, str]
+    _headers: Dict[str, str]
+
+    def __init__(self, venue: str, session: VenueSession, auth: ApiAuth,
+                 paths: Dict[str, str], headers: Dict[str, str]) -> None:
+        super().__init__(venue=venue)
+        self._session = session
+        self._auth = auth
+        self._paths = paths
+        self._headers = headers
+
+    def supports(self, op: str) -> bool:
+        return op in self._paths
+
+    async def request(self, op: str, order: OrderedDict) -> OrderReply:
+        self.requests += 1
+        body = self._auth.get_order_auth_body(order=order)
+        http_ts = latency.clock()
+        async with self._session.post(path=self._paths[op], data=body,
+                                      headers=self._headers) as res:
+            res_bdy = await res.json()
+            latency.RECORDER.record(stage=latency.STAGE_HTTP,
+                                    venue=self._venue, start_ns=http_ts)
+            return OrderReply(status=res.status, headers=res.headers,
+                              body=res_bdy, transport=TRANSPORT_REST)
+
+
+class WsOrderTransport(OrderTransport):
+    _endpoint: str
+    _ssl_context: ssl.SSLContext
+    _ack_timeout: float
+    _websocket: Union[websockets.WebSocketClientProtocol, None]
+    _pending: Dict[str, asyncio.Future]
+    _next_id: int
+    _closed: bool
+    _BACKOFF_MIN = 0.5
+    _BACKOFF_MAX = 30.0
+    _HEARTBEAT_INTERVAL = 20
+    _ping_msg: Union[str, None] = None
+    _OPS: Dict[str, str] = {}
+    connections: int
+    acks: int
+    timeouts: int
+    unavailable: int
+
+    def __init__(self, venue: str, endpoint: str,
+                 ack_timeout: float = 5.0) -> None:
+        super().__init__(venue=venue)
+        self._endpoint = endpoint
+        self._ssl_context = ssl.SSLContext(protocol=ssl.PROTOCOL_TLS_CLIENT)
+        self._ssl_context.load_verify_locations(cafile=certifi.where())
+        self._ack_timeout = ack_timeout
+        self._websocket = None
+        self._pending = {}
+        self._next_id = 0
+        self._closed = False
+        self.connections = 0
+        self.acks = 0
+        self.timeouts = 0
+        self.unavailable = 0
+
+    def supports(self, op: str) -> bool:
+        return op in self._OPS
+
+    @abstractmethod
+    def get_request_message(self, op: str, order: OrderedDict,
+                            req_id: str) -> str:
+        pass
+
+    @abstractmethod
+    def parse_reply(self, data: dict
+                    ) -> Union[Tuple[str, OrderReply], None]:
+        pass
+
+    async def authenticate(self, websocket: websockets.WebSocketClientProtocol
+                           ) -> bool:
+        return True
+
+    def get_request_id(self) -> str:
+        self._next_id += 1
+        return str(self._next_id)
+
+    async def open_connection(
+            self) -> Union[websockets.WebSocketClientProtocol, None]:
+        try:
+            websocket = await websockets.connect(
+                self._endpoint, ssl=(self._ssl_context
+                                     if self._endpoint.startswith('wss')
+                                     else None))
+        except (websockets.InvalidHandshake, OSError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            return None
+        try:
+            if await asyncio.wait_for(self.authenticate(websocket=websocket),
+                                      timeout=self._ack_timeout):
+                return websocket
+            event_log.LOGGER.error(event=event_log.EVENT_MESSAGE,
+                                   text='Order websocket auth rejected')
+        except (websockets.ConnectionClosed, asyncio.TimeoutError,
+                OSError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+        await websocket.close()
+        return None
+
+    async def start(self) -> Coroutine:
+        delay = self._BACKOFF_MIN
+        while not self._closed:
+            websocket = await self.open_connection()
+            if websocket is None:
+                await asyncio.sleep(delay=random.uniform(0.5, 1.5) * delay)
+                delay = min(delay * 2, self._BACKOFF_MAX)
+                continue
+            delay = self._BACKOFF_MIN
+            self.connections += 1
+            self._websocket = websocket
+            heartbeat = (asyncio.create_task(
+                coro=self.heartbeat(websocket=websocket))
+                if self._ping_msg is not None else None)
+            try:
+                async for raw in websocket:
+                    self.on_message(raw=raw)
+            except (websockets.ConnectionClosed, OSError) as e:
+                event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            finally:
+                self._websocket = None
+                if heartbeat is not None:
+                    heartbeat.cancel()
+                self.fail_pending()
+                await websocket.close()
+
+    async def close(self) -> None:
+        self._closed = True
+        websocket = self._websocket
+        self._websocket = None
+        self.fail_pending()
+        if websocket is not None:
+            await websocket.close()
+
+    async def heartbeat(self, websocket: websockets.WebSocketClientProtocol
+                        ) -> Coroutine:
+        try:
+            while True:
+                await websocket.send(message=self._ping_msg)
+                await asyncio.sleep(delay=self._HEARTBEAT_INTERVAL)
+        except (websockets.ConnectionClosed, OSError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+
+    def on_message(self, raw: str) -> None:
+        reply = self.parse_reply(data=json.loads(raw))
+        if reply is None:
+            return
+        req_id, order_reply = reply
+        future = self._pending.pop(req_id, None)
+        if future is not None and not future.done():
+            self.acks += 1
+            future.set_result(order_reply)
+
+    def fail_pending(self) -> None:
+        pending = self._pending
+        self._pending = {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(
+                    ConnectionResetError('order websocket closed'))
+
+    async def request(self, op: str, order: OrderedDict
+                      ) -> Union[OrderReply, None]:
+        websocket = self._websocket
+        if websocket is None:
+            self.unavailable += 1
+            return None
+        req_id = self.get_request_id()
+        message = self.get_request_message(op=op, order=order,
+                                           req_id=req_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        ack_ts = latency.clock()
+        try:
+            try:
+                await websocket.send(message=message)
+            except (websockets.ConnectionClosed, OSError) as e:
+                event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION,
+                                       text=e)
+                self.unavailable += 1
+                return None
+            self.requests += 1
+            try:
+                reply = await asyncio.wait_for(fut=future,
+                                               timeout=self._ack_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+        finally:
+            self._pending.pop(req_id, None)
+        latency.RECORDER.record(stage=latency.STAGE_WS_ACK,
+                                venue=self._venue, start_ns=ack_ts)
+        return reply
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'requests': self.requests, 'acks': self.acks,
+                'timeouts': self.timeouts, 'unavailable': self.unavailable,
+                'connections': self.connections,
+                'pending': len(self._pending)}
+
+
+class BybitWsOrderTransport(WsOrderTransport):
+    _auth: BybitApiAuth
+    _recv_window: str
+    _OPS = {OP_CREATE: 'order.create', OP_AMEND: 'order.amend',
+            OP_CANCEL: 'order.cancel'}
+    _CATEGORY = 'inverse'
+    _TIME_IN_FORCE = {'GoodTillCancel': 'GTC', 'ImmediateOrCancel': 'IOC',
+                      'FillOrKill': 'FOK', 'PostOnly': 'PostOnly'}
+    _RATE_LIMIT_HEADERS = {'X-Bapi-Limit-Status': 'rate_limit_status',
+                           'X-Bapi-Limit': 'rate_limit',
+                           'X-Bapi-Limit-Reset-Timestamp':
+                               'rate_limit_reset_ms'}
+    _ping_msg = json.dumps(obj={'op': 'ping'})
+
+    def __init__(self, auth: BybitApiAuth,
+                 endpoint: str = BybitApiAuth.TRADE_ENDPOINT,
+                 ack_timeout: float = 5.0, recv_window: int = 5000) -> None:
+        super().__init__(venue=latency.VENUE_BYBIT, endpoint=endpoint,
+                         ack_timeout=ack_timeout)
+        self._auth = auth
+        self._recv_window = str(recv_window)
+
+    async def authenticate(self, websocket: websockets.WebSocketClientProtocol
+                           ) -> bool:
+        await websocket.send(message=json.dumps(
+            obj={'op': 'auth',
+                 'args': self._auth.get_websocket_auth_args()}))
+        while True:
+            res = json.loads(await websocket.recv())
+            if res.get('op') == 'auth':
+                return res.get('retCode') == 0
+
+    def get_order_args(self, op: str, order: OrderedDict) -> dict:
+        args = {'category': self._CATEGORY, 'symbol': order.get('symbol'),
+                'orderLinkId': order.get('order_link_id')}
+        if op == OP_CREATE:
+            args.update({'side': order.get('side'),
+                         'orderType': order.get('order_type'),
+                         'qty': str(order.get('qty')),
+                         'price': str(order.get('price')),
+                         'timeInForce': self._TIME_IN_FORCE.get(
+                             order.get('time_in_force'), 'GTC')})
+        elif op == OP_AMEND:
+            args['price'] = str(order.get('p_r_price'))
+            if 'p_r_qty' in order:
+                args['qty'] = str(order.get('p_r_qty'))
+        return args
+
+    def get_request_message(self, op: str, order: OrderedDict,
+                            req_id: str) -> str:
+        return json.dumps(obj={
+            'reqId': req_id,
+            'header': {'X-BAPI-TIMESTAMP':
+                       str(self._auth.clock.get_milli_timestamp()),
+                       'X-BAPI-RECV-WINDOW': self._recv_window},
+            'op': self._OPS[op],
+            'args': [self.get_order_args(op=op, order=order)]})
+
+    def parse_reply(self, data: dict
+                    ) -> Union[Tuple[str, OrderReply], None]:
+        req_id = data.get('reqId')
+        if req_id is None:
+            return None
+        headers = data.get('header') or {}
+        body = {'ret_code': data.get('retCode'),
+                'ret_msg': data.get('retMsg'), 'result': data.get('data')}
+        for header, key in self._RATE_LIMIT_HEADERS.items():
+            value = headers.get(header)
+            if value is not None:
+                body[key] = int(value)
+        return req_id, OrderReply(status=200, headers=headers, body=body,
+                                  transport=TRANSPORT_WS)
+
+
+class BinanceWsOrderTransport(WsOrderTransport):
+    _auth: BinanceApiAuth
+    _OPS = {OP_CREATE: 'order.place', OP_AMEND: 'order.modify',
+            OP_CANCEL: 'order.cancel'}
+
+    def __init__(self, auth: BinanceApiAuth,
+                 endpoint: str = BinanceApiAuth.TRADE_ENDPOINT,
+                 ack_timeout: float = 5.0) -> None:
+        super().__init__(venue=latency.VENUE_BINANCE, endpoint=endpoint,
+                         ack_timeout=ack_timeout)
+        self._auth = auth
+
+    def get_request_message(self, op: str, order: OrderedDict,
+                            req_id: str) -> str:
+        return json.dumps(obj={
+            'id': req_id, 'method': self._OPS[op],
+            'params': self._auth.get_ws_order_params(order=order)})
+
+    def parse_reply(self, data: dict
+                    ) -> Union[Tuple[str, OrderReply], None]:
+        req_id = data.get('id')
+        if req_id is None:
+            return None
+        headers = {}
+        for limit in data.get('rateLimits', ()):
+            header = BINANCE_RATE_LIMIT_HEADERS.get(
+                limit.get('rateLimitType'))
+            if header is not None:
+                headers[header] = str(limit.get('count'))
+        status = data.get('status', 200)
+        if status == 429 or status == 418:
+            retry_after_ms = data.get('error', {}).get('data', {}).get(
+                'retryAfter')
+            if retry_after_ms is not None:
+                now_ms = self._auth.clock.get_milli_timestamp()
+                headers['Retry-After'] = str(max(
+                    0.0, (retry_after_ms - now_ms) / 1000))
+        return req_id, OrderReply(
+            status=status, headers=headers,
+            body=data.get('result') if 'result' in data
+            else data.get('error', {}), transport=TRANSPORT_WS)
+
+
+class FallbackOrderTransport(OrderTransport):
+    _primary: WsOrderTransport
+    _fallback: RestOrderTransport
+    fallbacks: int
+
+    def __init__(self, venue: str, primary: WsOrderTransport,
+                 fallback: RestOrderTransport) -> None:
+        super().__init__(venue=venue)
+        self._primary = primary
+        self._fallback = fallback
+        self.fallbacks = 0
+
+    async def start(self) -> Coroutine:
+        await asyncio.gather(self._primary.start(), self._fallback.start())
+
+    async def close(self) -> None:
+        await asyncio.gather(self._primary.close(), self._fallback.close())
+
+    def supports(self, op: str) -> bool:
+        return self._primary.supports(op=op)
+
+    async def request(self, op: str, order: OrderedDict) -> OrderReply:
+        self.requests += 1
+        if not self._primary.supports(op=op):
+            return await self._fallback.request(op=op, order=order)
+        reply = await self._primary.request(op=op, order=order)
+        if reply is None:
+            self.fallbacks += 1
+            event_log.LOGGER.debug(event=event_log.EVENT_TRANSPORT_FALLBACK,
+                                   text=self._venue)
+            reply = await self._fallback.request(op=op, order=order)
+        return reply
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {'fallbacks': self.fallbacks,
+                TRANSPORT_WS: self._primary.get_stats(),
+                TRANSPORT_REST: self._fallback.get_stats()}
+
+
+def get_bybit_transport(kind: str, auth: BybitApiAuth, session: VenueSession,
+                        ws_endpoint: str = BybitApiAuth.TRADE_ENDPOINT,
+                        ws_ack_timeout: float = 5.0) -> OrderTransport:
+    rest = RestOrderTransport(venue=latency.VENUE_BYBIT, session=session,
+                              auth=auth, paths=BYBIT_REST_PATHS,
+                              headers={'Content-Type': 'application/json'})
+    if kind == TRANSPORT_REST:
+        return rest
+    if kind != TRANSPORT_WS:
+        raise ValueError(f'unknown order transport {kind}')
+    return FallbackOrderTransport(
+        venue=latency.VENUE_BYBIT, fallback=rest,
+        primary=BybitWsOrderTransport(auth=auth, endpoint=ws_endpoint,
+                                      ack_timeout=ws_ack_timeout))
+
+
+def get_binance_transport(kind: str, auth: BinanceApiAuth,
+                          session: VenueSession,
+                          ws_endpoint: str = BinanceApiAuth.TRADE_ENDPOINT,
+                          ws_ack_timeout: float = 5.0) -> OrderTransport:
+    rest = RestOrderTransport(venue=latency.VENUE_BINANCE, session=session,
+                              auth=auth, paths=BINANCE_REST_PATHS,
+                              headers=auth.headers)
+    if kind == TRANSPORT_REST:
+        return rest
+    if kind != TRANSPORT_WS:
+        raise ValueError(f'unknown order transport {kind}')
+    return FallbackOrderTransport(
+        venue=latency.VENUE_BINANCE, fallback=rest,
+        primary=BinanceWsOrderTransport(auth=auth, endpoint=ws_endpoint,
+                                        ack_timeout=ws_ack_timeout))
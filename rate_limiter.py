@@ -0,0 +1,200 @@
+import contextlib
+import multiprocessing
+import time
+from typing import ContextManager, Dict, List, Mapping, Tuple, Union
+
+PRIORITY_HEDGE = 0
+PRIORITY_CANCEL = 1
+PRIORITY_NEW = 2
+PRIORITY_REPRICE = 3
+PRIORITY_RESERVES = {PRIORITY_HEDGE: 0.0, PRIORITY_CANCEL: 0.05,
+                     PRIORITY_NEW: 0.2, PRIORITY_REPRICE: 0.4}
+
+BYBIT_ORDER_CREATE = 'order/create'
+BYBIT_ORDER_REPLACE = 'order/replace'
+BYBIT_ORDER_CANCEL = 'order/cancel'
+BINANCE_ORDER = 'order'
+BINANCE_BATCH_ORDERS = 'batchOrders'
+BINANCE_QUERY_ORDER = 'queryOrder'
+BINANCE_DEPTH = 'depth'
+BINANCE_POSITION_RISK = 'positionRisk'
+BINANCE_WEIGHT_HEADER = 'X-MBX-USED-WEIGHT-1M'
+BINANCE_ORDER_COUNT_HEADER = 'X-MBX-ORDER-COUNT-1M'
+
+
+class TokenBucket:
+    capacity: float
+    refill_per_sec: float
+    tokens: float
+    blocked_until_ms: int
+    _updated: float
+
+    def __init__(self, capacity: float, window_sec: float) -> None:
+        self.capacity = capacity
+        self.refill_per_sec = capacity / window_sec
+        self.tokens = capacity
+        self.blocked_until_ms = 0
+        self._updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens
+                          + (now - self._updated) * self.refill_per_sec)
+        self._updated = now
+
+    def get_available(self) -> float:
+        if self.blocked_until_ms:
+            if time.time() * 1000 < self.blocked_until_ms:
+                return 0.0
+            self.blocked_until_ms = 0
+            self.tokens = self.capacity
+            self._updated = time.monotonic()
+        self.refill()
+        return self.tokens
+
+    def consume(self, cost: float) -> None:
+        self.tokens -= cost
+
+    def sync(self, remaining: float, capacity: Union[float, None] = None,
+             reset_at_ms: Union[int, None] = None) -> None:
+        if capacity:
+            self.refill_per_sec *= capacity / self.capacity
+            self.capacity = capacity
+        self.refill()
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0 and reset_at_ms is not None:
+            self.blocked_until_ms = reset_at_ms
+
+    def block_for(self, seconds: float) -> None:
+        self.tokens = 0.0
+        self.blocked_until_ms = int((time.time() + seconds) * 1000)
+
+
+def get_shared_field(index: int) -> property:
+    def fget(self: 'SharedTokenBucket') -> float:
+        return self._state[index]
+
+    def fset(self: 'SharedTokenBucket', value: float) -> None:
+        self._state[index] = value
+
+    return property(fget=fget, fset=fset)
+
+
+class SharedTokenBucket(TokenBucket):
+    _state: multiprocessing.RawArray
+    capacity = get_shared_field(index=0)
+    refill_per_sec = get_shared_field(index=1)
+    tokens = get_shared_field(index=2)
+    blocked_until_ms = get_shared_field(index=3)
+    _updated = get_shared_field(index=4)
+
+    def __init__(self, capacity: float, window_sec: float) -> None:
+        self._state = multiprocessing.RawArray('d', 5)
+        super().__init__(capacity=capacity, window_sec=window_sec)
+
+
+class RateLimiter:
+    _buckets: Dict[str, TokenBucket]
+    _endpoints: Dict[str, List[Tuple[str, float]]]
+    _lock: ContextManager
+    rejected: Dict[int, int]
+
+    def __init__(self, buckets: Dict[str, TokenBucket],
+                 endpoints: Dict[str, List[Tuple[str, float]]],
+                 lock: Union[ContextManager, None] = None) -> None:
+        self._buckets = buckets
+        self._endpoints = endpoints
+        self._lock = lock if lock is not None else contextlib.nullcontext()
+        self.rejected = {priority: 0 for priority in PRIORITY_RESERVES}
+
+    def get_bucket(self, name: str) -> TokenBucket:
+        return self._buckets[name]
+
+    def has_budget(self, endpoint: str, priority: int) -> bool:
+        reserve = PRIORITY_RESERVES[priority]
+        for name, cost in self._endpoints[endpoint]:
+            bucket = self._buckets[name]
+            if bucket.get_available() - cost < reserve * bucket.capacity:
+                return False
+        return True
+
+    def can_send(self, endpoint: str, priority: int) -> bool:
+        with self._lock:
+            return self.has_budget(endpoint=endpoint, priority=priority)
+
+    def try_acquire(self, endpoint: str, priority: int) -> bool:
+        with self._lock:
+            if not self.has_budget(endpoint=endpoint, priority=priority):
+                self.rejected[priority] += 1
+                return False
+            for name, cost in self._endpoints[endpoint]:
+                self._buckets[name].consume(cost=cost)
+            return True
+
+    def get_remaining(self, endpoint: str) -> float:
+        with self._lock:
+            return min(self._buckets[name].get_available() / cost
+                       for name, cost in self._endpoints[endpoint])
+
+    def get_budget_fraction(self, endpoint: str) -> float:
+        with self._lock:
+            return min(self._buckets[name].get_available()
+                       / self._buckets[name].capacity
+                       for name, _ in self._endpoints[endpoint])
+
+    def on_bybit_response(self, endpoint: str, res_bdy: dict) -> None:
+        remaining = res_bdy.get('rate_limit_status')
+        if remaining is None:
+            return
+        with self._lock:
+            for name, _ in self._endpoints[endpoint]:
+                self._buckets[name].sync(
+                    remaining=remaining, capacity=res_bdy.get('rate_limit'),
+                    reset_at_ms=res_bdy.get('rate_limit_reset_ms'))
+
+    def on_binance_response(self, status: int,
+                            headers: Mapping[str, str]) -> None:
+        with self._lock:
+            used_weight = headers.get(BINANCE_WEIGHT_HEADER)
+            if used_weight is not None:
+                bucket = self._buckets['weight']
+                bucket.sync(remaining=bucket.capacity - int(used_weight))
+            order_count = headers.get(BINANCE_ORDER_COUNT_HEADER)
+            if order_count is not None:
+                bucket = self._buckets['orders']
+                bucket.sync(remaining=bucket.capacity - int(order_count))
+            if status == 429 or status == 418:
+                retry_after = float(headers.get('Retry-After', 60))
+                for bucket in self._buckets.values():
+                    bucket.block_for(seconds=retry_after)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: {'available': bucket.get_available(),
+                           'capacity': bucket.capacity}
+                    for name, bucket in self._buckets.items()}
+
+
+def get_bybit_rate_limiter(shared: bool = False) -> RateLimiter:
+    bucket = SharedTokenBucket if shared else TokenBucket
+    return RateLimiter(
+        buckets={BYBIT_ORDER_CREATE: bucket(capacity=100, window_sec=60),
+                 BYBIT_ORDER_REPLACE: bucket(capacity=100, window_sec=60),
+                 BYBIT_ORDER_CANCEL: bucket(capacity=100, window_sec=60)},
+        endpoints={BYBIT_ORDER_CREATE: [(BYBIT_ORDER_CREATE, 1)],
+                   BYBIT_ORDER_REPLACE: [(BYBIT_ORDER_REPLACE, 1)],
+                   BYBIT_ORDER_CANCEL: [(BYBIT_ORDER_CANCEL, 1)]},
+        lock=multiprocessing.Lock() if shared else None)
+
+
+def get_binance_rate_limiter(shared: bool = False) -> RateLimiter:
+    bucket = SharedTokenBucket if shared else TokenBucket
+    return RateLimiter(
+        buckets={'weight': bucket(capacity=2400, window_sec=60),
+                 'orders': bucket(capacity=1200, window_sec=60)},
+        endpoints={BINANCE_ORDER: [('weight', 1), ('orders', 1)],
+                   BINANCE_BATCH_ORDERS: [('weight', 5), ('orders', 5)],
+                   BINANCE_QUERY_ORDER: [('weight', 1)],
+                   BINANCE_DEPTH: [('weight', 20)],
+                   BINANCE_POSITION_RISK: [('weight', 1)]},
+        lock=multiprocessing.Lock() if shared else None)
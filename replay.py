@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Coroutine, List, Tuple, Union
+import capture
+import decoder
+import rate_limiter
+from feed import Feed, BybitFeed, BinanceFeed
+from hedge_engine import HedgeCallback
+from strategy import MMStrategy
+
+
+class StubGateway:
+    orders: List[Tuple[str, dict]]
+    bybit_limiter: rate_limiter.RateLimiter
+    binance_limiter: rate_limiter.RateLimiter
+
+    def __init__(self) -> None:
+        self.orders = []
+        self.bybit_limiter = rate_limiter.get_bybit_rate_limiter()
+        self.binance_limiter = rate_limiter.get_binance_rate_limiter()
+
+    def prepare_bybit_new_order(self, order: OrderedDict,
+                                ord_link_id: List[Union[str, None]]) -> None:
+        self.orders.append(('bybit_new', dict(order)))
+
+    def prepare_binance_new_order(
+            self, order: OrderedDict,
+            priority: int = rate_limiter.PRIORITY_HEDGE) -> None:
+        self.orders.append(('binance_new', dict(order)))
+
+    def prepare_binance_hedge(self, order: OrderedDict, ref_price: float,
+                              on_result: HedgeCallback) -> None:
+        self.orders.append(('binance_hedge', dict(order)))
+
+    def prepare_bybit_amend_order(
+            self, order: OrderedDict, side: str,
+            priority: int = rate_limiter.PRIORITY_REPRICE) -> bool:
+        self.orders.append(('bybit_amend', dict(order)))
+        return True
+
+    def on_bybit_order_update(self, order: dict) -> None:
+        pass
+
+
+class ReplayDriver:
+    _file_path: str
+    _feeds: Tuple[Feed, Feed]
+    _decoders: Tuple[decoder.BybitFrameDecoder, decoder.BinanceFrameDecoder]
+    frames: int
+
+    def __init__(self, file_path: str, bybit_feed: BybitFeed,
+                 binance_feed: BinanceFeed) -> None:
+        self._file_path = file_path
+        self._feeds = (bybit_feed, binance_feed)
+        self._decoders = (decoder.BybitFrameDecoder(),
+                          decoder.BinanceFrameDecoder())
+        self.frames = 0
+
+    def dispatch(self, venue: int, kind: int, payload: bytes) -> None:
+        target = self._feeds[venue]
+        if kind == capture.KIND_WS_FRAME:
+            frame_type, data = self._decoders[venue].decode(
+                raw=payload.decode('utf8'))
+            if frame_type == decoder.FRAME_BOOK_DELTA:
+                target.on_book_delta(delta=data)
+            elif venue == capture.VENUE_BINANCE or 'topic' in data:
+                target.on_websocket(data=data)
+        elif kind == capture.KIND_DEPTH_SNAPSHOT:
+            target.on_depth_snapshot(data=json.loads(s=payload))
+        elif kind == capture.KIND_ORDER_SNAPSHOT:
+            target.on_order_snapshot(data=json.loads(s=payload))
+        elif kind == capture.KIND_POSITION_SNAPSHOT:
+            target.on_position_snapshot(data=json.loads(s=payload))
+        self.frames += 1
+
+    def run(self) -> int:
+        for _, venue, kind, payload in capture.read_capture(
+                file_path=self._file_path):
+            self.dispatch(venue=venue, kind=kind, payload=payload)
+        return self.frames
+
+    async def run_realtime(self, speed: float = 1.0) -> Coroutine:
+        first_ts = None
+        start = time.monotonic()
+        for recv_ts, venue, kind, payload in capture.read_capture(
+                file_path=self._file_path):
+            if first_ts is None:
+                first_ts = recv_ts
+            delay = ((recv_ts - first_ts) / 1e9 / speed
+                     - (time.monotonic() - start))
+            if delay > 0:
+                await asyncio.sleep(delay=delay)
+            self.dispatch(venue=venue, kind=kind, payload=payload)
+        return self.frames
+
+
+def build_replay(file_path: str) -> Tuple[ReplayDriver, MMStrategy,
+                                          StubGateway]:
+    gw = StubGateway()
+    strat = MMStrategy(gateway=gw)
+    driver = ReplayDriver(file_path=file_path,
+                          bybit_feed=BybitFeed(strat=strat),
+                          binance_feed=BinanceFeed(strat=strat))
+    return driver, strat, gw
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture_file')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay at wall-clock speed multiplier '
+                             'instead of max speed')
+    args = parser.parse_args()
+    replay_driver, _, stub_gw = build_replay(file_path=args.capture_file)
+    t_start = time.perf_counter()
+    if args.speed is None:
+        replay_driver.run()
+    else:
+        asyncio.get_event_loop().run_until_complete(
+            future=replay_driver.run_realtime(speed=args.speed))
+    elapsed = time.perf_counter() - t_start
+    print('Frames:', replay_driver.frames, 'Orders:', len(stub_gw.orders),
+          'Elapsed: %.3fs' % elapsed,
+          'Rate: %.0f/s' % (replay_driver.frames / max(elapsed, 1e-9)))
@@ -0,0 +1,58 @@
+import multiprocessing
+from typing import ContextManager, Dict, List
+
+RISK_BYBIT_POSITION = 0
+RISK_BINANCE_POSITION = 1
+RISK_FIELDS = 2
+
+
+class RiskView:
+    _slots: Dict[str, int]
+    _state: multiprocessing.RawArray
+    _lock: ContextManager
+    max_gross_exposure: float
+
+    def __init__(self, symbols: List[str],
+                 max_gross_exposure: float = float('inf')) -> None:
+        self._slots = {symbol: i for i, symbol in enumerate(symbols)}
+        self._state = multiprocessing.RawArray('d', len(symbols)
+                                               * RISK_FIELDS)
+        self._lock = multiprocessing.Lock()
+        self.max_gross_exposure = max_gross_exposure
+
+    def update(self, symbol: str, bybit_position: float,
+               binance_position_usd: float) -> None:
+        offset = self._slots[symbol] * RISK_FIELDS
+        with self._lock:
+            self._state[offset + RISK_BYBIT_POSITION] = bybit_position
+            self._state[offset + RISK_BINANCE_POSITION] = (
+                binance_position_usd)
+
+    def get_gross_exposure(self) -> float:
+        with self._lock:
+            return sum(abs(self._state[i]) for i in range(
+                RISK_BYBIT_POSITION, len(self._state), RISK_FIELDS))
+
+    def get_net_unhedged(self) -> float:
+        with self._lock:
+            return sum(self._state)
+
+    def can_increase(self, symbol: str, qty: float) -> bool:
+        offset = self._slots[symbol] * RISK_FIELDS
+        with self._lock:
+            position = self._state[offset + RISK_BYBIT_POSITION]
+            if abs(position + qty) <= abs(position):
+                return True
+            gross = sum(abs(self._state[i]) for i in range(
+                RISK_BYBIT_POSITION, len(self._state), RISK_FIELDS))
+        return (gross - abs(position) + abs(position + qty)
+                <= self.max_gross_exposure)
+
+    def get_snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {symbol: {
+                'bybit_position': self._state[slot * RISK_FIELDS
+                                              + RISK_BYBIT_POSITION],
+                'binance_position_usd': self._state[
+                    slot * RISK_FIELDS + RISK_BINANCE_POSITION]}
+                for symbol, slot in self._slots.items()}
@@ -0,0 +1,95 @@
+import asyncio
+import ssl
+import certifi
+import aiohttp
+import event_log
+from typing import Coroutine, Union
+
+
+class VenueSession:
+    _base_url: str
+    _ping_path: str
+    _pool_size: int
+    _keepalive_timeout: float
+    _dns_cache_ttl: int
+    _health_interval: float
+    _request_timeout: float
+    _ssl_context: ssl.SSLContext
+    _session: Union[aiohttp.ClientSession, None]
+    is_healthy: bool
+
+    def __init__(self, base_url: str, ping_path: str, pool_size: int = 4,
+                 keepalive_timeout: float = 120.0, dns_cache_ttl: int = 300,
+                 health_interval: float = 15.0,
+                 request_timeout: float = 10.0) -> None:
+        self._base_url = base_url
+        self._ping_path = ping_path
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._dns_cache_ttl = dns_cache_ttl
+        self._health_interval = health_interval
+        self._request_timeout = request_timeout
+        self._ssl_context = ssl.SSLContext(protocol=ssl.PROTOCOL_TLS_CLIENT)
+        self._ssl_context.load_verify_locations(cafile=certifi.where())
+        self._session = None
+        self.is_healthy = False
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            ssl=self._ssl_context, limit=0, use_dns_cache=True,
+            ttl_dns_cache=self._dns_cache_ttl,
+            keepalive_timeout=self._keepalive_timeout,
+            enable_cleanup_closed=True)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self._request_timeout))
+
+    def get(self, path: str, **kwargs):
+        return self.session.get(url=self._base_url + path, **kwargs)
+
+    def post(self, path: str, data: str, **kwargs):
+        return self.session.post(url=self._base_url + path, data=data,
+                                 **kwargs)
+
+    async def get_json(self, path: str, **kwargs) -> dict:
+        async with self.get(path=path, **kwargs) as res:
+            return await res.json()
+
+    async def post_json(self, path: str, data: str, **kwargs) -> dict:
+        async with self.post(path=path, data=data, **kwargs) as res:
+            return await res.json()
+
+    async def ping(self) -> bool:
+        try:
+            async with self.get(path=self._ping_path) as res:
+                await res.read()
+                self.is_healthy = res.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            self.is_healthy = False
+        return self.is_healthy
+
+    async def warm_up(self) -> None:
+        await asyncio.gather(*(self.ping() for _ in range(self._pool_size)))
+
+    async def reconnect(self) -> None:
+        await self.close()
+        await self.warm_up()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def start(self) -> Coroutine:
+        await self.warm_up()
+        while True:
+            await asyncio.sleep(delay=self._health_interval)
+            if not await self.ping():
+                await self.reconnect()
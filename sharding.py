@@ -0,0 +1,234 @@
+import asyncio
+import multiprocessing
+from typing import Coroutine, Dict, List, NamedTuple, Union
+import event_log
+import gateway
+import latency
+import order_transport
+import rate_limiter
+from arbiter import BybitFeedArbiter, BinanceFeedArbiter
+from capture import CaptureWriter
+from feed import BybitFeed, BinanceFeed, BybitFeedRouter, BinanceFeedRouter
+from risk import RiskView
+from shm_book import ShmBookWriter, get_region_name
+from strategy import MMStrategy
+from symbols import SymbolConfig, get_shards
+from ws_client import BybitWsClient, BinanceWsClient
+
+
+class SharedState(NamedTuple):
+    bybit_limiter: rate_limiter.RateLimiter
+    binance_limiter: rate_limiter.RateLimiter
+    risk_view: RiskView
+
+
+class ShardSettings(NamedTuple):
+    api_pth_bybit: str
+    api_pth_binance: str
+    endpoints: Union[Dict[str, str], None] = None
+    conflate: bool = False
+    capture_path: Union[str, None] = None
+    latency_dump_path: Union[str, None] = None
+    shm_depth: Union[int, None] = None
+    log_path: Union[str, None] = None
+    log_binary: bool = False
+    feed_lines: int = 1
+    line_endpoints: Union[List[Dict[str, str]], None] = None
+    bybit_order_transport: str = order_transport.TRANSPORT_REST
+    binance_order_transport: str = order_transport.TRANSPORT_REST
+    hedge_window: float = 0.005
+
+
+def get_shared_state(symbol_configs: List[SymbolConfig],
+                     max_gross_exposure: float = float('inf')
+                     ) -> SharedState:
+    return SharedState(
+        bybit_limiter=rate_limiter.get_bybit_rate_limiter(shared=True),
+        binance_limiter=rate_limiter.get_binance_rate_limiter(shared=True),
+        risk_view=RiskView(symbols=[config.bybit_symbol
+                                    for config in symbol_configs],
+                           max_gross_exposure=max_gross_exposure))
+
+
+def get_shard_path(file_path: Union[str, None], shard_id: int,
+                   n_shards: int) -> Union[str, None]:
+    if file_path is None or n_shards == 1:
+        return file_path
+    return f'{file_path}.{shard_id}'
+
+
+class Shard:
+    symbol_configs: List[SymbolConfig]
+    gateway: gateway.Gateway
+    strategies: Dict[str, MMStrategy]
+    bybit_feed: BybitFeedRouter
+    binance_feed: BinanceFeedRouter
+    bybit_arbiter: Union[BybitFeedArbiter, None]
+    binance_arbiter: Union[BinanceFeedArbiter, None]
+    bybit_ws_clients: List[BybitWsClient]
+    binance_ws_clients: List[BinanceWsClient]
+    book_writers: List[ShmBookWriter]
+
+    def __init__(self, symbol_configs: List[SymbolConfig],
+                 shared: SharedState, settings: ShardSettings,
+                 capture_writer: Union[CaptureWriter, None] = None) -> None:
+        self.symbol_configs = symbol_configs
+        endpoints = settings.endpoints
+        self.gateway = gateway.Gateway(
+            api_pth_bybit=settings.api_pth_bybit,
+            api_pth_binance=settings.api_pth_binance,
+            bybit_limiter=shared.bybit_limiter,
+            binance_limiter=shared.binance_limiter,
+            bybit_transport=settings.bybit_order_transport,
+            binance_transport=settings.binance_order_transport,
+            hedge_window=settings.hedge_window,
+            **({'bybit_endpoint': endpoints['bybit_api'],
+                'binance_endpoint': endpoints['binance_api'],
+                'bybit_trade_endpoint': endpoints['bybit_trade_ws'],
+                'binance_trade_endpoint': endpoints['binance_trade_ws']}
+               if endpoints is not None else {}))
+        self.strategies = {}
+        self.book_writers = []
+        bybit_feeds = {}
+        binance_feeds = {}
+        for config in symbol_configs:
+            strat = MMStrategy(gateway=self.gateway, symbol_config=config,
+                               risk_view=shared.risk_view)
+            self.strategies[config.name] = strat
+            bybit_writer = self.get_book_writer(
+                venue='bybit', symbol=config.bybit_symbol,
+                depth=settings.shm_depth)
+            binance_writer = self.get_book_writer(
+                venue='binance', symbol=config.binance_symbol,
+                depth=settings.shm_depth)
+            bybit_feeds[config.bybit_symbol] = BybitFeed(
+                strat=strat, conflate=settings.conflate,
+                book_topic=config.bybit_book_topic, book_writer=bybit_writer,
+                ticks_per_unit=config.bybit_ticks_per_unit)
+            binance_feeds[config.binance_symbol] = BinanceFeed(
+                strat=strat, conflate=settings.conflate,
+                symbol=config.binance_symbol, book_writer=binance_writer,
+                ticks_per_unit=config.binance_ticks_per_unit)
+        self.bybit_feed = BybitFeedRouter(feeds=bybit_feeds)
+        self.binance_feed = BinanceFeedRouter(feeds=binance_feeds)
+        self.bybit_arbiter = None
+        self.binance_arbiter = None
+        bybit_lines = [self.bybit_feed]
+        binance_lines = [self.binance_feed]
+        if settings.feed_lines > 1:
+            self.bybit_arbiter = BybitFeedArbiter(
+                feed_object=self.bybit_feed, n_lines=settings.feed_lines)
+            self.binance_arbiter = BinanceFeedArbiter(
+                feed_object=self.binance_feed, n_lines=settings.feed_lines)
+            bybit_lines = self.bybit_arbiter.lines
+            binance_lines = self.binance_arbiter.lines
+        self.bybit_ws_clients = []
+        self.binance_ws_clients = []
+        for line_id in range(settings.feed_lines):
+            line_endpoints = self.get_line_endpoints(settings=settings,
+                                                     line_id=line_id)
+            self.bybit_ws_clients.append(BybitWsClient(
+                api_file_path=settings.api_pth_bybit,
+                feed_object=bybit_lines[line_id],
+                session=self.gateway.bybit_session,
+                capture_writer=capture_writer if line_id == 0 else None,
+                symbol_configs=symbol_configs, private=line_id == 0,
+                **({'ws_endpoint': line_endpoints['bybit_ws']}
+                   if line_endpoints is not None else {})))
+            self.binance_ws_clients.append(BinanceWsClient(
+                api_file_path=settings.api_pth_binance,
+                feed_object=binance_lines[line_id],
+                session=self.gateway.binance_session,
+                capture_writer=capture_writer if line_id == 0 else None,
+                symbol_configs=symbol_configs, private=line_id == 0,
+                **({'ws_endpoint': line_endpoints['binance_ws']}
+                   if line_endpoints is not None else {})))
+
+    @staticmethod
+    def get_line_endpoints(settings: ShardSettings, line_id: int
+                           ) -> Union[Dict[str, str], None]:
+        if settings.line_endpoints:
+            return settings.line_endpoints[line_id
+                                           % len(settings.line_endpoints)]
+        return settings.endpoints
+
+    def get_book_writer(self, venue: str, symbol: str,
+                        depth: Union[int, None]
+                        ) -> Union[ShmBookWriter, None]:
+        if depth is None:
+            return None
+        writer = ShmBookWriter(name=get_region_name(venue=venue,
+                                                    symbol=symbol),
+                               depth=depth)
+        self.book_writers.append(writer)
+        return writer
+
+    async def start(self) -> Coroutine:
+        await asyncio.gather(self.gateway.start(),
+                             *(client.start() for client
+                               in self.bybit_ws_clients
+                               + self.binance_ws_clients))
+
+    async def close(self) -> None:
+        await self.gateway.close()
+        for writer in self.book_writers:
+            writer.close()
+
+
+def run_shard(shard_id: int, n_shards: int,
+              symbol_configs: List[SymbolConfig], shared: SharedState,
+              settings: ShardSettings) -> None:
+    capture_path = get_shard_path(file_path=settings.capture_path,
+                                  shard_id=shard_id, n_shards=n_shards)
+    capture_writer = (CaptureWriter(file_path=capture_path)
+                      if capture_path is not None else None)
+    event_log.LOGGER.start(
+        file_path=get_shard_path(file_path=settings.log_path,
+                                 shard_id=shard_id, n_shards=n_shards),
+        binary=settings.log_binary)
+    event_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop=event_loop)
+    shard = Shard(symbol_configs=symbol_configs, shared=shared,
+                  settings=settings, capture_writer=capture_writer)
+    latency.install_dump_signal(
+        loop=event_loop, file_path=get_shard_path(
+            file_path=settings.latency_dump_path, shard_id=shard_id,
+            n_shards=n_shards))
+    event_log.install_level_signal(loop=event_loop)
+    try:
+        event_loop.run_until_complete(future=shard.start())
+    finally:
+        tasks = asyncio.all_tasks(loop=event_loop)
+        for task in tasks:
+            task.cancel()
+        event_loop.run_until_complete(
+            future=asyncio.gather(*tasks, return_exceptions=True))
+        event_loop.run_until_complete(future=shard.close())
+        if capture_writer is not None:
+            capture_writer.close()
+        event_loop.close()
+        event_log.LOGGER.stop()
+
+
+def run_sharded(symbol_configs: List[SymbolConfig], n_shards: int,
+                shared: SharedState, settings: ShardSettings) -> None:
+    shards = get_shards(configs=symbol_configs, n_shards=n_shards)
+    if len(shards) == 1:
+        run_shard(shard_id=0, n_shards=1, symbol_configs=shards[0],
+                  shared=shared, settings=settings)
+        return
+    processes = [multiprocessing.Process(
+        target=run_shard, name=f'shard-{shard_id}',
+        kwargs={'shard_id': shard_id, 'n_shards': len(shards),
+                'symbol_configs': shard_configs, 'shared': shared,
+                'settings': settings})
+        for shard_id, shard_configs in enumerate(shards)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
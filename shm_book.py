@@ -0,0 +1,228 @@
+import asyncio
+import mmap
+import os
+import tempfile
+import time
+from typing import Callable, Coroutine, Iterator, List, Tuple, \
+    Union
+import numpy as np
+from order_book import OrderBook
+
+SLOT_SEQ = 0
+SLOT_TS = 1
+SLOT_BID = 2
+SLOT_ASK = 3
+SLOT_N_BIDS = 4
+SLOT_N_ASKS = 5
+SLOT_DEPTH = 6
+SLOT_UPDATES = 7
+HEADER_SLOTS = 8
+SLOT_SIZE = 8
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def get_region_path(name: str) -> str:
+    return os.path.join(SHM_DIR, 'mm_book_' + name)
+
+
+def get_region_name(venue: str, symbol: str) -> str:
+    return f'{venue}_{symbol}'
+
+
+def get_region_size(depth: int) -> int:
+    return (HEADER_SLOTS + 4 * depth) * SLOT_SIZE
+
+
+class ShmBookWriter:
+    _path: str
+    _mmap: mmap.mmap
+    _i64: memoryview
+    _f64: memoryview
+    _bbo: Union[Tuple[float, float], None]
+    _levels: Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]
+    depth: int
+    skipped: int
+
+    def __init__(self, name: str, depth: int = 10) -> None:
+        self._path = get_region_path(name=name)
+        self.depth = depth
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, get_region_size(depth=depth))
+            self._mmap = mmap.mmap(fileno=fd, length=0)
+        finally:
+            os.close(fd)
+        self._i64 = memoryview(self._mmap).cast('q')
+        self._f64 = memoryview(self._mmap).cast('d')
+        self._i64[SLOT_DEPTH] = depth
+        self._bbo = None
+        self._levels = ([], [])
+        self.skipped = 0
+
+    def begin_write(self) -> None:
+        self._i64[SLOT_SEQ] += 1
+
+    def end_write(self) -> None:
+        self._i64[SLOT_UPDATES] += 1
+        self._i64[SLOT_SEQ] += 1
+
+    def get_changed_levels(self, levels: List[Tuple[int, int]],
+                           ladder_ticks: Iterator[Tuple[int, int]]
+                           ) -> Tuple[List[Tuple[int, int, int]], int]:
+        changed = []
+        n = 0
+        if self.depth:
+            for level in ladder_ticks:
+                if n == len(levels):
+                    levels.append(level)
+                    changed.append((n, level[0], level[1]))
+                elif levels[n] != level:
+                    levels[n] = level
+                    changed.append((n, level[0], level[1]))
+                n += 1
+                if n == self.depth:
+                    break
+        old_n = len(levels)
+        del levels[n:]
+        return changed, old_n
+
+    def publish_book(self, order_book: OrderBook,
+                     bbo: Tuple[float, float]) -> None:
+        bids, asks = self._levels
+        bid_changes, old_n_bids = self.get_changed_levels(
+            levels=bids, ladder_ticks=order_book.bids.iter_ticks())
+        ask_changes, old_n_asks = self.get_changed_levels(
+            levels=asks, ladder_ticks=order_book.asks.iter_ticks())
+        if (bbo == self._bbo and not bid_changes and not ask_changes
+                and old_n_bids == len(bids) and old_n_asks == len(asks)):
+            self.skipped += 1
+            return
+        f64 = self._f64
+        i64 = self._i64
+        ticks_per_unit = order_book.ticks_per_unit
+        self.begin_write()
+        i64[SLOT_TS] = time.time_ns()
+        if bbo != self._bbo:
+            self._bbo = bbo
+            f64[SLOT_BID] = bbo[0]
+            f64[SLOT_ASK] = bbo[1]
+        for slot_count, base, changes, n in (
+                (SLOT_N_BIDS, HEADER_SLOTS, bid_changes, len(bids)),
+                (SLOT_N_ASKS, HEADER_SLOTS + 2 * self.depth, ask_changes,
+                 len(asks))):
+            for index, tick, size in changes:
+                f64[base + 2 * index] = tick / ticks_per_unit
+                f64[base + 2 * index + 1] = size
+            i64[slot_count] = n
+        self.end_write()
+
+    def close(self, unlink: bool = True) -> None:
+        self._i64.release()
+        self._f64.release()
+        self._mmap.close()
+        if unlink and os.path.exists(self._path):
+            os.unlink(self._path)
+
+
+class ShmBookReader:
+    _mmap: mmap.mmap
+    _i64: memoryview
+    _f64: memoryview
+    depth: int
+    _bids: np.ndarray
+    _asks: np.ndarray
+    retries: int
+
+    def __init__(self, name: str) -> None:
+        fd = os.open(get_region_path(name=name), os.O_RDONLY)
+        try:
+            self._mmap = mmap.mmap(fileno=fd, length=0,
+                                   access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        self._i64 = memoryview(self._mmap).cast('q')
+        self._f64 = memoryview(self._mmap).cast('d')
+        self.depth = self._i64[SLOT_DEPTH]
+        self._bids = np.frombuffer(self._mmap, dtype=np.float64,
+                                  count=2 * self.depth,
+                                  offset=HEADER_SLOTS * SLOT_SIZE
+                                  ).reshape(self.depth, 2)
+        self._asks = np.frombuffer(self._mmap, dtype=np.float64,
+                                  count=2 * self.depth,
+                                  offset=(HEADER_SLOTS + 2 * self.depth)
+                                  * SLOT_SIZE).reshape(self.depth, 2)
+        self.retries = 0
+
+    def get_seq(self) -> int:
+        return self._i64[SLOT_SEQ]
+
+    def begin_read(self) -> int:
+        i64 = self._i64
+        seq = i64[SLOT_SEQ]
+        while seq & 1:
+            self.retries += 1
+            seq = i64[SLOT_SEQ]
+        return seq
+
+    def validate(self, seq: int) -> bool:
+        if self._i64[SLOT_SEQ] == seq:
+            return True
+        self.retries += 1
+        return False
+
+    def read_bbo(self) -> Tuple[int, float, float]:
+        f64 = self._f64
+        while True:
+            seq = self.begin_read()
+            bid = f64[SLOT_BID]
+            ask = f64[SLOT_ASK]
+            if self.validate(seq=seq):
+                return seq, bid, ask
+
+    def read_book(self) -> Tuple[int, int, np.ndarray, np.ndarray]:
+        i64 = self._i64
+        while True:
+            seq = self.begin_read()
+            ts = i64[SLOT_TS]
+            bids = self._bids[:i64[SLOT_N_BIDS]].copy()
+            asks = self._asks[:i64[SLOT_N_ASKS]].copy()
+            if self.validate(seq=seq):
+                return seq, ts, bids, asks
+
+    def poll(self, last_seq: int) -> Union[Tuple[int, float, float], None]:
+        if self._i64[SLOT_SEQ] == last_seq:
+            return None
+        return self.read_bbo()
+
+    async def wait_bbo(self, last_seq: int, poll_interval: float = 0.0
+                       ) -> Tuple[int, float, float]:
+        while True:
+            update = self.poll(last_seq=last_seq)
+            if update is not None:
+                return update
+            await asyncio.sleep(delay=poll_interval)
+
+    def get_stats(self) -> dict:
+        return {'seq': self._i64[SLOT_SEQ],
+                'updates': self._i64[SLOT_UPDATES],
+                'retries': self.retries}
+
+    def close(self) -> None:
+        self._bids = None
+        self._asks = None
+        self._i64.release()
+        self._f64.release()
+        self._mmap.close()
+
+
+async def forward_bbo(reader: ShmBookReader,
+                      on_bbo: Callable[[Tuple[float, float]], None],
+                      poll_interval: float = 0.0) -> Coroutine:
+    last_seq = 0
+    last_bbo = None
+    while True:
+        last_seq, bid, ask = await reader.wait_bbo(
+            last_seq=last_seq, poll_interval=poll_interval)
+        if (bid, ask) != last_bbo:
+            last_bbo = (bid, ask)
+            on_bbo(last_bbo)
@@ -5,6 +5,14 @@ from collections import OrderedDict
 import random
 import string
 from gateway import Gateway
+import event_log
+import latency
+import rate_limiter
+from order_book import OrderBook
+from order_store import (OrderStore, PositionState, ORDER_CANCELLED,
+                         ORDER_CANCEL_UNKNOWN)
+from risk import RiskView
+from symbols import SymbolConfig
 
 
 def get_random_string(n):
@@ -40,121 +48,168 @@ class Strategy:
     def on_binance_position_snap(self, data: dict) -> None:
         pass
 
+    def on_bybit_book(self, order_book: Union[OrderBook, None]) -> None:
+        pass
+
+    def on_binance_book(self, order_book: Union[OrderBook, None]) -> None:
+        pass
+
 
 class MMStrategy(Strategy):
     _gateway = Gateway
-    _bybit_bbo = []
-    _binance_bbo = []
-    _bybit_active_orders = {}
-    _bybit_bid_ord_link_id: List[Union[str, None]] = [None]
-    _bybit_ask_ord_link_id: List[Union[str, None]] = [None]
-    _bybit_position = None
-    _binance_position = None
-    _quote_targets = []
+    _bybit_bbo: List[float]
+    _binance_bbo: List[float]
+    _orders: OrderStore
+    _position: PositionState
+    _quote_targets: List[float]
     _NET_FEE_OFFSET = 0.00015
     _NET_PROFIT_OFFSET = 0.00005
     _RISK_MEASURE = 0.00015
     _bybit_symbol = 'BTCUSD'
     _binance_symbol = 'BTCUSD_PERP'
+    _binance_contract_size = 100
     _bybit_quote_size = 100
-    _is_order_op_queued = [False]
     _inventory_limit = 50000
+    _bybit_ticks_per_unit = 2
     _UPDATE_INTERVAL = 3
-    _bid_update_count = 0
-    _ask_update_count = 0
-    _bybit_unhedged_qty = 0
-
-    def __init__(self, gateway: Gateway) -> None:
+    _bid_update_count: int
+    _ask_update_count: int
+    _risk_view: Union[RiskView, None]
+    _bybit_book: Union[OrderBook, None]
+    _binance_book: Union[OrderBook, None]
+    _USE_MICROPRICE = False
+
+    def __init__(self, gateway: Gateway,
+                 symbol_config: Union[SymbolConfig, None] = None,
+                 risk_view: Union[RiskView, None] = None) -> None:
         self._gateway = gateway
+        self._bybit_bbo = []
+        self._binance_bbo = []
+        self._orders = OrderStore()
+        self._position = self._orders.position
+        self._quote_targets = []
+        self._bid_update_count = 0
+        self._ask_update_count = 0
+        self._risk_view = risk_view
+        self._bybit_book = None
+        self._binance_book = None
+        if symbol_config is not None:
+            self._bybit_symbol = symbol_config.bybit_symbol
+            self._binance_symbol = symbol_config.binance_symbol
+            self._binance_contract_size = symbol_config.binance_contract_size
+            self._bybit_quote_size = symbol_config.quote_size
+            self._inventory_limit = symbol_config.inventory_limit
+            self._bybit_ticks_per_unit = symbol_config.bybit_ticks_per_unit
 
     def on_bybit_bbo_chg(self, data: Tuple[float, float]) -> None:
         self._bybit_bbo = list(data)
-        if (len(self._binance_bbo) == 2 and self._bybit_position is not None
-                and self._binance_position is not None):
+        if len(self._binance_bbo) == 2 and self._position.is_ready():
+            quote_ts = latency.clock()
             self.compute_quote_targets()
             self.check_new_quotes()
+            latency.RECORDER.record(stage=latency.STAGE_QUOTE,
+                                    venue=latency.VENUE_BYBIT,
+                                    start_ns=quote_ts)
 
     def on_binance_bbo_chg(self, data: Tuple[float, float]) -> None:
         self._binance_bbo = list(data)
-        if (len(self._binance_bbo) == 2 and self._bybit_position is not None
-                and self._binance_position is not None):
+        if len(self._binance_bbo) == 2 and self._position.is_ready():
+            quote_ts = latency.clock()
             self.compute_quote_targets()
             self.check_new_quotes()
+            latency.RECORDER.record(stage=latency.STAGE_QUOTE,
+                                    venue=latency.VENUE_BINANCE,
+                                    start_ns=quote_ts)
+
+    def on_bybit_book(self, order_book: Union[OrderBook, None]) -> None:
+        self._bybit_book = order_book
+
+    def on_binance_book(self, order_book: Union[OrderBook, None]) -> None:
+        self._binance_book = order_book
+
+    def get_mid(self, bbo: List[float],
+                order_book: Union[OrderBook, None]) -> float:
+        if self._USE_MICROPRICE and order_book is not None:
+            microprice = order_book.get_microprice()
+            if microprice is not None:
+                return microprice
+        return np.mean(a=bbo)
 
     def on_bybit_order_update(self, data: dict) -> None:
-        orders = data.get('data')
-        for order in orders:
-            order_status = order.get('order_status')
-            ord_link_id = order.get('order_link_id')
-            if (order_status == 'Created' or order_status == 'New'
-                    or order_status == 'PartiallyFilled'
-                    or order_status == 'PendingCancel'):
-                self._bybit_active_orders[ord_link_id] = order
-            elif order_status == 'Filled':
-                if ord_link_id in self._bybit_active_orders:
-                    self._bybit_active_orders.pop(ord_link_id)
-            elif order_status == 'Cancelled' or order_status == 'Rejected':
-                print(order_status)
-                if ord_link_id in self._bybit_active_orders:
-                    self._bybit_active_orders.pop(ord_link_id)
-                else:
-                    print('Cancellation not in active orders')
-                self.on_cancel_or_reject(ord_link_id=ord_link_id)
+        for order in data.get('data'):
+            self._gateway.on_bybit_order_update(order=order)
+            transition = self._orders.on_order_update(order=order)
+            if (transition == ORDER_CANCELLED
+                    or transition == ORDER_CANCEL_UNKNOWN):
+                event_log.LOGGER.info(event=event_log.EVENT_ORDER_STATUS,
+                                      text=order.get('order_status'))
+                if transition == ORDER_CANCEL_UNKNOWN:
+                    event_log.LOGGER.warning(
+                        event=event_log.EVENT_CANCEL_UNKNOWN,
+                        text=order.get('order_link_id'))
+                self.on_cancel_or_reject(
+                    ord_link_id=order.get('order_link_id'))
 
     def on_bybit_execution(self, data: dict) -> None:
-        execs = data.get('data')
-        for execution in execs:
-            exec_side = execution.get('side')
-            exec_qty = execution.get('exec_qty')
-            exec_type = execution.get('exec_type')
-            if exec_side == 'Buy':
-                self._bybit_position += exec_qty
-                if exec_type == 'Trade':
+        for execution in data.get('data'):
+            signed_qty = self._orders.on_execution(execution=execution)
+            if execution.get('exec_type') == 'Trade':
+                if signed_qty > 0:
                     self.on_buy_trade(execution=execution)
-            elif exec_side == 'Sell':
-                self._bybit_position -= exec_qty
-                if exec_type == 'Trade':
+                else:
                     self.on_sell_trade(execution=execution)
+        self.publish_risk()
 
     def on_bybit_order_snap(self, data: dict) -> None:
-        self._bybit_active_orders = {}
-        for order in data.get('result'):
-            ord_link_id = order.get('order_link_id')
-            self._bybit_active_orders[ord_link_id] = order
+        self._orders.load_snapshot(orders=data.get('result'))
 
     def on_bybit_position_snap(self, data: dict) -> None:
         result: dict = data.get('result')
         size: int = result.get('size')
         side: str = result.get('side')
-        self._bybit_position = (
+        self._position.bybit = (
             size if side == 'Buy' or side == 'None' else -size)
-        if self._binance_position is not None:
-            self._bybit_unhedged_qty = (
-                    self._bybit_position + 100 * self._binance_position)
+        if self._position.binance is not None:
+            self._position.unhedged = (
+                    self._position.bybit
+                    + self._binance_contract_size * self._position.binance)
+        self.publish_risk()
 
     def on_binance_position_snap(self, data: dict) -> None:
         amt = int(data.get('positionAmt'))
         side: str = data.get('positionSide')
-        self._binance_position = (
+        self._position.binance = (
             amt if side == 'LONG' or side == 'BOTH' else -amt)
-        if self._bybit_position is not None:
-            self._bybit_unhedged_qty = (
-                    self._bybit_position + 100 * self._binance_position)
+        if self._position.bybit is not None:
+            self._position.unhedged = (
+                    self._position.bybit
+                    + self._binance_contract_size * self._position.binance)
+        self.publish_risk()
+
+    def publish_risk(self) -> None:
+        if self._risk_view is not None and self._position.is_ready():
+            self._risk_view.update(
+                symbol=self._bybit_symbol,
+                bybit_position=self._position.bybit,
+                binance_position_usd=(self._binance_contract_size
+                                      * self._position.binance))
 
     def on_cancel_or_reject(self, ord_link_id: str) -> None:
-        if self._bybit_bid_ord_link_id[0] == ord_link_id:
-            print('Bid cancelled/rejected')
-            self._bybit_bid_ord_link_id[0] = None
-        elif self._bybit_ask_ord_link_id[0] == ord_link_id:
-            print('Ask cancelled/rejected')
-            self._bybit_ask_ord_link_id[0] = None
+        is_bid = self._orders.clear_quote(ord_link_id=ord_link_id)
+        if is_bid is None:
+            event_log.LOGGER.warning(
+                event=event_log.EVENT_QUOTE_CANCELLED,
+                text='Unknown order link id')
         else:
-            print('Unknown order link id cancelled/rejected')
+            event_log.LOGGER.info(event=event_log.EVENT_QUOTE_CANCELLED,
+                                  text='Bid' if is_bid else 'Ask')
 
     def check_hedge(self, exec_qty: int) -> None:
-        total_unhedged_qty = self._bybit_unhedged_qty + exec_qty
-        hedge_contracts = round(total_unhedged_qty / 100)
-        self._bybit_unhedged_qty = total_unhedged_qty - hedge_contracts * 100
+        total_unhedged_qty = self._position.unhedged + exec_qty
+        hedge_contracts = round(total_unhedged_qty
+                                / self._binance_contract_size)
+        self._position.unhedged = (total_unhedged_qty - hedge_contracts
+                                   * self._binance_contract_size)
         if hedge_contracts != 0:
             self.hedge_binance(contracts=hedge_contracts)
 
@@ -162,27 +217,51 @@ class MMStrategy(Strategy):
         if contracts > 0:
             hedge_order = self.get_binance_new_market_order(side='SELL',
                                                             qty=contracts)
-            self._gateway.prepare_binance_new_order(order=hedge_order)
-            self._binance_position -= contracts
-            print('HEDGE SELL:', contracts)
+            self._gateway.prepare_binance_hedge(
+                order=hedge_order, ref_price=self.get_hedge_ref_price(
+                    is_buy=False), on_result=self.on_hedge_result)
+            self._position.binance -= contracts
+            self._position.binance_pending -= contracts
+            event_log.LOGGER.info(event=event_log.EVENT_HEDGE, text='SELL',
+                                  value0=contracts)
         elif contracts < 0:
             hedge_order = self.get_binance_new_market_order(side='BUY',
                                                             qty=abs(contracts))
-            self._gateway.prepare_binance_new_order(order=hedge_order)
-            self._binance_position += abs(contracts)
-            print('HEDGE BUY:', abs(contracts))
+            self._gateway.prepare_binance_hedge(
+                order=hedge_order, ref_price=self.get_hedge_ref_price(
+                    is_buy=True), on_result=self.on_hedge_result)
+            self._position.binance += abs(contracts)
+            self._position.binance_pending += abs(contracts)
+            event_log.LOGGER.info(event=event_log.EVENT_HEDGE, text='BUY',
+                                  value0=abs(contracts))
+        self.publish_risk()
+
+    def get_hedge_ref_price(self, is_buy: bool) -> float:
+        if len(self._binance_bbo) != 2:
+            return 0.0
+        return self._binance_bbo[1] if is_buy else self._binance_bbo[0]
+
+    def on_hedge_result(self, requested: int, filled: int) -> None:
+        self._position.binance_pending -= requested
+        missed = requested - filled
+        if missed != 0:
+            self._position.binance -= missed
+            self._position.unhedged -= missed * self._binance_contract_size
+            self.publish_risk()
 
     def on_buy_trade(self, execution: dict) -> None:
         self.check_hedge(exec_qty=execution.get('exec_qty'))
         if execution.get('leaves_qty') == 0:
-            self._bybit_bid_ord_link_id[0] = None
-            print('FILLED BUY', self._bybit_position)
+            self._orders.bid_quote[0] = None
+            event_log.LOGGER.info(event=event_log.EVENT_FILLED, text='BUY',
+                                  value0=self._position.bybit)
 
     def on_sell_trade(self, execution: dict) -> None:
         self.check_hedge(exec_qty=-execution.get('exec_qty'))
         if execution.get('leaves_qty') == 0:
-            self._bybit_ask_ord_link_id[0] = None
-            print('FILLED SELL', self._bybit_position)
+            self._orders.ask_quote[0] = None
+            event_log.LOGGER.info(event=event_log.EVENT_FILLED, text='SELL',
+                                  value0=self._position.bybit)
 
     def get_bybit_new_limit_order(self, ord_link_id: str, price: float,
                                   qty: int, side: str) -> OrderedDict:
@@ -207,147 +286,160 @@ class MMStrategy(Strategy):
                                 'p_r_price': p_r_price,
                                 'symbol': self._bybit_symbol})
 
+    def check_risk(self, qty: int) -> bool:
+        if self._risk_view is None or self._risk_view.can_increase(
+                symbol=self._bybit_symbol, qty=qty):
+            return True
+        event_log.LOGGER.info(event=event_log.EVENT_RISK_LIMIT,
+                              text='buy' if qty > 0 else 'sell')
+        return False
+
     def place_new_bybit_order(self, side: str) -> None:
-        if not self._gateway.is_rate_limited:
-            if side == 'Buy' and self._bybit_bid_ord_link_id[0] is None:
-                if not self._is_order_op_queued[0]:
-                    order_size = self.get_order_size(side='Buy')
-                    if order_size != 0:
-                        print('Placed new buy limit')
-                        self._bybit_bid_ord_link_id[0] = get_random_string(n=36)
-                        order = self.get_bybit_new_limit_order(
-                            ord_link_id=self._bybit_bid_ord_link_id[0],
-                            price=self._quote_targets[0], side=side,
-                            qty=order_size)
-                        self._gateway.prepare_bybit_new_order(
-                            order=order, is_queued=self._is_order_op_queued,
-                            ord_link_id=self._bybit_bid_ord_link_id)
-                    else:
-                        print('Buy order size 0, no order placed')
-                else:
-                    print('Buy order op queued')
-            elif side == 'Sell' and self._bybit_ask_ord_link_id[0] is None:
-                if not self._is_order_op_queued[0]:
-                    order_size = self.get_order_size(side='Sell')
-                    if order_size != 0:
-                        print('Placed new sell limit')
-                        self._bybit_ask_ord_link_id[0] = get_random_string(n=36)
-                        order = self.get_bybit_new_limit_order(
-                            ord_link_id=self._bybit_ask_ord_link_id[0],
-                            price=self._quote_targets[1], side=side,
-                            qty=order_size)
-                        self._gateway.prepare_bybit_new_order(
-                            order=order, is_queued=self._is_order_op_queued,
-                            ord_link_id=self._bybit_ask_ord_link_id)
-                    else:
-                        print('Sell order size 0, no order placed')
-                else:
-                    print('Sell order op queued')
+        if self._gateway.bybit_limiter.can_send(
+                endpoint=rate_limiter.BYBIT_ORDER_CREATE,
+                priority=rate_limiter.PRIORITY_NEW):
+            if side == 'Buy' and self._orders.bid_quote[0] is None:
+                order_size = self.get_order_size(side='Buy')
+                if order_size != 0 and self.check_risk(qty=order_size):
+                    event_log.LOGGER.info(
+                        event=event_log.EVENT_ORDER_PLACED, text='buy',
+                        value0=self._quote_targets[0], value1=order_size)
+                    self._orders.bid_quote[0] = get_random_string(n=36)
+                    order = self.get_bybit_new_limit_order(
+                        ord_link_id=self._orders.bid_quote[0],
+                        price=self._quote_targets[0], side=side,
+                        qty=order_size)
+                    self._gateway.prepare_bybit_new_order(
+                        order=order, ord_link_id=self._orders.bid_quote)
+                elif order_size == 0:
+                    event_log.LOGGER.debug(
+                        event=event_log.EVENT_ORDER_SIZE_ZERO, text='Buy')
+            elif side == 'Sell' and self._orders.ask_quote[0] is None:
+                order_size = self.get_order_size(side='Sell')
+                if order_size != 0 and self.check_risk(qty=-order_size):
+                    event_log.LOGGER.info(
+                        event=event_log.EVENT_ORDER_PLACED, text='sell',
+                        value0=self._quote_targets[1], value1=order_size)
+                    self._orders.ask_quote[0] = get_random_string(n=36)
+                    order = self.get_bybit_new_limit_order(
+                        ord_link_id=self._orders.ask_quote[0],
+                        price=self._quote_targets[1], side=side,
+                        qty=order_size)
+                    self._gateway.prepare_bybit_new_order(
+                        order=order, ord_link_id=self._orders.ask_quote)
+                elif order_size == 0:
+                    event_log.LOGGER.debug(
+                        event=event_log.EVENT_ORDER_SIZE_ZERO, text='Sell')
 
     def compute_quote_targets(self) -> None:
-        bybit_mid = np.mean(a=self._bybit_bbo)
-        binance_mid = np.mean(a=self._binance_bbo)
+        bybit_mid = self.get_mid(bbo=self._bybit_bbo,
+                                 order_book=self._bybit_book)
+        binance_mid = self.get_mid(bbo=self._binance_bbo,
+                                   order_book=self._binance_book)
         overall_mid = np.mean(a=(bybit_mid, binance_mid))
+        ticks = self._bybit_ticks_per_unit
         minimum_quotes = [
             np.floor((1 - self._NET_FEE_OFFSET - self._NET_PROFIT_OFFSET
-                      - self._RISK_MEASURE) * overall_mid * 2) / 2,
+                      - self._RISK_MEASURE) * overall_mid * ticks) / ticks,
             np.ceil((1 + self._NET_FEE_OFFSET + self._NET_PROFIT_OFFSET
-                     + self._RISK_MEASURE) * overall_mid * 2) / 2]
+                     + self._RISK_MEASURE) * overall_mid * ticks) / ticks]
         if bybit_mid < binance_mid:
-            max_bid = self._bybit_bbo[1] - 0.5
+            max_bid = (round(self._bybit_bbo[1] * ticks) - 1) / ticks
             if max_bid < minimum_quotes[0]:
                 minimum_quotes[0] = max_bid
             if self._binance_bbo[1] > minimum_quotes[1]:
-                minimum_quotes[1] = np.ceil(self._binance_bbo[1] * 2) / 2
+                minimum_quotes[1] = np.ceil(
+                    self._binance_bbo[1] * ticks) / ticks
         elif bybit_mid > binance_mid:
-            min_ask = self._bybit_bbo[0] + 0.5
+            min_ask = (round(self._bybit_bbo[0] * ticks) + 1) / ticks
             if min_ask > minimum_quotes[1]:
                 minimum_quotes[1] = min_ask
             if self._binance_bbo[0] < minimum_quotes[0]:
-                minimum_quotes[0] = np.floor(self._binance_bbo[0] * 2) / 2
+                minimum_quotes[0] = np.floor(
+                    self._binance_bbo[0] * ticks) / ticks
         self._quote_targets = minimum_quotes
 
     def get_order_size(self, side: str) -> int:
         if side == 'Buy':
-            if self._bybit_position < 0:
-                return abs(self._bybit_position)
+            if self._position.bybit < 0:
+                return abs(self._position.bybit)
             else:
-                rmd = self._bybit_position % self._bybit_quote_size
+                rmd = self._position.bybit % self._bybit_quote_size
                 if rmd == 0:
-                    if (self._bybit_position + self._bybit_quote_size
+                    if (self._position.bybit + self._bybit_quote_size
                             <= self._inventory_limit):
                         return self._bybit_quote_size
                 else:
                     order_size = self._bybit_quote_size - rmd
-                    if (self._bybit_position + order_size
+                    if (self._position.bybit + order_size
                             + self._bybit_quote_size <= self._inventory_limit):
                         order_size += self._bybit_quote_size
                     return order_size
         elif side == 'Sell':
-            if self._bybit_position > 0:
-                return self._bybit_position
+            if self._position.bybit > 0:
+                return self._position.bybit
             else:
-                rmd = abs(self._bybit_position) % self._bybit_quote_size
+                rmd = abs(self._position.bybit) % self._bybit_quote_size
                 if rmd == 0:
-                    if (self._bybit_position - self._bybit_quote_size
+                    if (self._position.bybit - self._bybit_quote_size
                             >= -self._inventory_limit):
                         return self._bybit_quote_size
                 else:
                     order_size = self._bybit_quote_size - rmd
-                    if (self._bybit_position - order_size
+                    if (self._position.bybit - order_size
                             - self._bybit_quote_size >= -self._inventory_limit):
                         order_size += self._bybit_quote_size
                     return order_size
         return 0
 
     def check_new_quotes(self) -> None:
-        if self._bybit_bid_ord_link_id[0] is not None:
-            order_local = self._bybit_active_orders.get(
-                self._bybit_bid_ord_link_id[0])
-            if (order_local is not None and not self._is_order_op_queued[0]
-                    and order_local.get('price') != self._quote_targets[0]
-                    and not self._gateway.is_rate_limited):
-                self._bid_update_count += 1
-                if self._bid_update_count == self._UPDATE_INTERVAL:
-                    new_order_sz = self.get_order_size(side='Buy')
-                    if order_local.get('size') != new_order_sz:
+        if self._orders.bid_quote[0] is not None:
+            order_local = self._orders.get_quote(is_bid=True)
+            if (order_local is not None
+                    and order_local.price != self._quote_targets[0]):
+                new_order_sz = self.get_order_size(side='Buy')
+                priority = (rate_limiter.PRIORITY_NEW
+                            if order_local.qty != new_order_sz
+                            else rate_limiter.PRIORITY_REPRICE)
+                if self._gateway.bybit_limiter.can_send(
+                        endpoint=rate_limiter.BYBIT_ORDER_REPLACE,
+                        priority=priority):
+                    self._bid_update_count += 1
+                    if self._bid_update_count >= self._UPDATE_INTERVAL:
                         order = self.get_bybit_order_cancel_replace(
-                            ord_link_id=self._bybit_bid_ord_link_id[0],
+                            ord_link_id=self._orders.bid_quote[0],
                             p_r_price=str(self._quote_targets[0]),
-                            p_r_qty=new_order_sz)
-                        self._gateway.prepare_bybit_amend_order(
-                            order=order, is_queued=self._is_order_op_queued)
-                    else:
-                        order = self.get_bybit_order_cancel_replace(
-                            ord_link_id=self._bybit_bid_ord_link_id[0],
-                            p_r_price=str(self._quote_targets[0]))
-                        self._gateway.prepare_bybit_amend_order(
-                            order=order, is_queued=self._is_order_op_queued)
-                    self._bid_update_count = 0
+                            p_r_qty=(new_order_sz
+                                     if order_local.qty != new_order_sz
+                                     else None))
+                        if self._gateway.prepare_bybit_amend_order(
+                                order=order, side='Buy',
+                                priority=priority):
+                            self._bid_update_count = 0
         else:
             self.place_new_bybit_order(side='Buy')
-        if self._bybit_ask_ord_link_id[0] is not None:
-            order_local = self._bybit_active_orders.get(
-                self._bybit_ask_ord_link_id[0])
-            if (order_local is not None and not self._is_order_op_queued[0]
-                    and order_local.get('price') != self._quote_targets[1]
-                    and not self._gateway.is_rate_limited):
-                self._ask_update_count += 1
-                if self._ask_update_count == self._UPDATE_INTERVAL:
-                    new_order_sz = self.get_order_size(side='Sell')
-                    if order_local.get('size') != new_order_sz:
+        if self._orders.ask_quote[0] is not None:
+            order_local = self._orders.get_quote(is_bid=False)
+            if (order_local is not None
+                    and order_local.price != self._quote_targets[1]):
+                new_order_sz = self.get_order_size(side='Sell')
+                priority = (rate_limiter.PRIORITY_NEW
+                            if order_local.qty != new_order_sz
+                            else rate_limiter.PRIORITY_REPRICE)
+                if self._gateway.bybit_limiter.can_send(
+                        endpoint=rate_limiter.BYBIT_ORDER_REPLACE,
+                        priority=priority):
+                    self._ask_update_count += 1
+                    if self._ask_update_count >= self._UPDATE_INTERVAL:
                         order = self.get_bybit_order_cancel_replace(
-                            ord_link_id=self._bybit_ask_ord_link_id[0],
+                            ord_link_id=self._orders.ask_quote[0],
                             p_r_price=str(self._quote_targets[1]),
-                            p_r_qty=new_order_sz)
-                        self._gateway.prepare_bybit_amend_order(
-                            order=order, is_queued=self._is_order_op_queued)
-                    else:
-                        order = self.get_bybit_order_cancel_replace(
-                            ord_link_id=self._bybit_ask_ord_link_id[0],
-                            p_r_price=str(self._quote_targets[1]))
-                        self._gateway.prepare_bybit_amend_order(
-                            order=order, is_queued=self._is_order_op_queued)
-                    self._ask_update_count = 0
+                            p_r_qty=(new_order_sz
+                                     if order_local.qty != new_order_sz
+                                     else None))
+                        if self._gateway.prepare_bybit_amend_order(
+                                order=order, side='Sell',
+                                priority=priority):
+                            self._ask_update_count = 0
         else:
             self.place_new_bybit_order(side='Sell')
\ No newline at end of file
@@ -0,0 +1,128 @@
+import argparse
+import csv
+import itertools
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Union
+import numpy as np
+import backtest
+from backtest import BacktestParams
+
+DEFAULT_GRID = {'net_fee_offset': [0.0001, 0.00015, 0.0002],
+                'net_profit_offset': [0.0, 0.00005, 0.0001],
+                'risk_measure': [0.0001, 0.00015, 0.0002],
+                'update_interval': [1, 3, 5]}
+TABLE_COLUMNS = ['final_equity', 'max_drawdown', 'fills', 'hedges',
+                 'max_inventory', 'amends', 'elapsed']
+
+_worker_bbo: Union[np.ndarray, None] = None
+
+
+def init_worker(file_path: str) -> None:
+    global _worker_bbo
+    _worker_bbo = backtest.load_bbo(file_path=file_path, mmap=True)
+
+
+def get_param_grid(grid: Dict[str, Sequence],
+                   base: BacktestParams = BacktestParams()
+                   ) -> List[BacktestParams]:
+    names = list(grid)
+    return [base._replace(**dict(zip(names, values)))
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+def parse_grid_arg(arg: str) -> Dict[str, list]:
+    name, _, values = arg.partition('=')
+    name = name.strip().replace('-', '_')
+    if name not in BacktestParams._fields:
+        raise ValueError(f'unknown parameter {name}')
+    cast = type(BacktestParams._field_defaults[name])
+    return {name: [cast(value) for value in values.split(',') if value]}
+
+
+def get_max_drawdown(equity: np.ndarray) -> float:
+    if not len(equity):
+        return 0.0
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def run_params(params: BacktestParams) -> Dict[str, Union[int, float]]:
+    t_start = time.perf_counter()
+    result = backtest.run_backtest(bbo=_worker_bbo, params=params)
+    elapsed = time.perf_counter() - t_start
+    return dict(params._asdict(), **result.stats,
+                max_drawdown=get_max_drawdown(equity=result.equity),
+                elapsed=elapsed)
+
+
+def run_sweep(file_path: str, param_grid: List[BacktestParams],
+              workers: Union[int, None] = None,
+              sort_by: str = 'final_equity'
+              ) -> List[Dict[str, Union[int, float]]]:
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(param_grid) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(file_path,)) as executor:
+        rows = list(executor.map(run_params, param_grid,
+                                 chunksize=chunk_size))
+    rows.sort(key=lambda row: row[sort_by], reverse=True)
+    return rows
+
+
+def format_table(rows: List[Dict[str, Union[int, float]]],
+                 columns: List[str]) -> str:
+    cells = [[f'{row[column]:.6g}' if isinstance(row[column], float)
+              else str(row[column]) for column in columns] for row in rows]
+    widths = [max([len(column)] + [len(cell[i]) for cell in cells])
+              for i, column in enumerate(columns)]
+    lines = ['  '.join(column.rjust(width)
+                       for column, width in zip(columns, widths))]
+    lines.extend('  '.join(cell.rjust(width)
+                           for cell, width in zip(cell_row, widths))
+                 for cell_row in cells)
+    return '\n'.join(lines)
+
+
+def save_csv(file_path: str,
+             rows: List[Dict[str, Union[int, float]]]) -> None:
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default=None,
+                        help='BBO array saved with backtest.py --save')
+    parser.add_argument('--synthetic', type=int, default=1000000,
+                        help='rows of synthetic BBO data when no input')
+    parser.add_argument('--grid', action='append', default=[],
+                        help='name=v1,v2,... for any BacktestParams field')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sort', default='final_equity')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--csv', default=None)
+    args = parser.parse_args()
+    sweep_grid = {}
+    for grid_arg in args.grid:
+        sweep_grid.update(parse_grid_arg(arg=grid_arg))
+    sweep_params = get_param_grid(grid=sweep_grid or DEFAULT_GRID)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = args.data
+        if data_path is None:
+            data_path = os.path.join(tmp_dir, 'bbo.npy')
+            backtest.save_bbo(file_path=data_path, bbo=backtest.generate_bbo(
+                n=args.synthetic))
+        t_start = time.perf_counter()
+        sweep_rows = run_sweep(file_path=data_path, param_grid=sweep_params,
+                               workers=args.workers, sort_by=args.sort)
+        sweep_elapsed = time.perf_counter() - t_start
+    param_columns = list(sweep_grid or DEFAULT_GRID)
+    print(format_table(rows=sweep_rows[:args.top],
+                       columns=param_columns + TABLE_COLUMNS))
+    print(f'{len(sweep_rows)} runs in {sweep_elapsed:.2f}s')
+    if args.csv is not None:
+        save_csv(file_path=args.csv, rows=sweep_rows)
@@ -0,0 +1,51 @@
+import json
+from typing import List, NamedTuple
+
+
+class SymbolConfig(NamedTuple):
+    name: str
+    bybit_symbol: str
+    binance_symbol: str
+    binance_pair: str
+    binance_contract_size: int = 100
+    quote_size: int = 100
+    inventory_limit: int = 50000
+    bybit_tick_size: float = 0.5
+    binance_tick_size: float = 0.1
+
+    @property
+    def bybit_ticks_per_unit(self) -> int:
+        return int(round(1 / self.bybit_tick_size))
+
+    @property
+    def binance_ticks_per_unit(self) -> int:
+        return int(round(1 / self.binance_tick_size))
+
+    @property
+    def bybit_book_topic(self) -> str:
+        return 'orderBookL2_25.' + self.bybit_symbol
+
+    @property
+    def binance_depth_stream(self) -> str:
+        return self.binance_symbol.lower() + '@depth@100ms'
+
+
+BTCUSD = SymbolConfig(name='BTCUSD', bybit_symbol='BTCUSD',
+                      binance_symbol='BTCUSD_PERP', binance_pair='BTCUSD')
+ETHUSD = SymbolConfig(name='ETHUSD', bybit_symbol='ETHUSD',
+                      binance_symbol='ETHUSD_PERP', binance_pair='ETHUSD',
+                      binance_contract_size=10, quote_size=10,
+                      inventory_limit=5000, bybit_tick_size=0.05,
+                      binance_tick_size=0.01)
+DEFAULT_SYMBOLS = [BTCUSD]
+
+
+def load_symbol_configs(file_path: str) -> List[SymbolConfig]:
+    with open(file_path) as f:
+        return [SymbolConfig(**config) for config in json.load(fp=f)]
+
+
+def get_shards(configs: List[SymbolConfig],
+               n_shards: int) -> List[List[SymbolConfig]]:
+    n_shards = max(1, min(n_shards, len(configs)))
+    return [configs[i::n_shards] for i in range(n_shards)]
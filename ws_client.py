@@ -1,5 +1,8 @@
 import asyncio
+import functools
+import random
 import ssl
+import time
 import certifi
 from abc import abstractmethod
 import websockets
@@ -7,166 +10,509 @@ import json
 import aiohttp
 from api_auth import BybitApiAuth, BinanceApiAuth
 import feed
-from typing import Coroutine
+from session_pool import VenueSession
+from collections import deque
+from typing import Coroutine, Deque, Dict, List, Set, Tuple, Union
+import capture
+import latency
+import decoder
+import event_log
+import symbols
+
+
+class WsConnection:
+    websocket: websockets.WebSocketClientProtocol
+    buffer: Deque[str]
+    heartbeat: Union[asyncio.Task, None]
+    pong_recv: bool
+
+    def __init__(self, websocket: websockets.WebSocketClientProtocol,
+                 buffer_size: int) -> None:
+        self.websocket = websocket
+        self.buffer = deque(maxlen=buffer_size)
+        self.heartbeat = None
+        self.pong_recv = False
+
+
+def get_int_field(raw: str, key: str, start: int) -> Union[int, None]:
+    i = raw.find(key, start)
+    if i < 0:
+        return None
+    i += len(key)
+    j = i
+    while raw[j] in '-0123456789':
+        j += 1
+    return int(raw[i:j]) if j > i else None
 
 
 class WsClient:
     _ssl_context: ssl.SSLContext
     _sub_message: str
     _feed: feed.Feed
+    _session: VenueSession
+    _capture: Union[capture.CaptureWriter, None]
+    _VENUE: int
+    _LATENCY_VENUE: str
+    _decoder: Union[decoder.BybitFrameDecoder, decoder.BinanceFrameDecoder]
+    _standby_enabled: bool
+    _standby: Union[WsConnection, None]
+    _standby_task: Union[asyncio.Task, None]
+    _seen: Set[int]
+    _seen_order: Deque[int]
+    _last_seq: Dict[str, int]
+    _DATA_MARKER: str
+    _BACKOFF_MIN = 0.5
+    _BACKOFF_MAX = 30.0
+    _HISTORY_SIZE = 4096
+    connections: int
+    failovers: int
+    resyncs: int
+    replayed: int
 
-    def __init__(self, sub_message: str, feed_object: feed.Feed) -> None:
+    def __init__(self, sub_message: str, feed_object: feed.Feed,
+                 session: VenueSession,
+                 capture_writer: Union[capture.CaptureWriter, None] = None,
+                 standby: bool = True) -> None:
         self._ssl_context = ssl.SSLContext(protocol=ssl.PROTOCOL_TLS_CLIENT)
         self._ssl_context.load_verify_locations(cafile=certifi.where())
         self._sub_message = sub_message
         self._feed = feed_object
+        self._session = session
+        self._capture = capture_writer
+        self._standby_enabled = standby
+        self._standby = None
+        self._standby_task = None
+        self._seen = set()
+        self._seen_order = deque()
+        self._last_seq = {}
+        self.connections = 0
+        self.failovers = 0
+        self.resyncs = 0
+        self.replayed = 0
 
     @abstractmethod
-    async def start(self) -> Coroutine:
+    def get_uri(self) -> str:
+        pass
+
+    @abstractmethod
+    def on_frame(self, conn: WsConnection, raw: str) -> None:
         pass
 
     @abstractmethod
-    async def on_connect(self,
-                         websocket: websockets.WebSocketClientProtocol) -> Coroutine:
+    def get_book_seq(self, raw: str) -> Union[Tuple[str, int], None]:
+        pass
+
+    def get_connect_kwargs(self) -> dict:
+        return {}
+
+    def on_open(self, conn: WsConnection) -> None:
+        pass
+
+    def on_standby_frame(self, conn: WsConnection, raw: str) -> None:
         pass
 
     def on_disconnect(self) -> None:
         pass
 
-    async def connect(self, uri: str, **kwargs) -> Coroutine:
+    async def start(self) -> Coroutine:
+        try:
+            await self.supervise()
+        finally:
+            if self._standby_task is not None:
+                self._standby_task.cancel()
+
+    def get_backoff(self, delay: float) -> float:
+        return min(delay * 2, self._BACKOFF_MAX)
+
+    async def open_connection(self) -> Union[WsConnection, None]:
+        uri = self.get_uri()
         try:
             websocket = await websockets.connect(
-                uri=uri, ssl=self._ssl_context, **kwargs)
+                uri, ssl=(self._ssl_context if uri.startswith('wss')
+                          else None), **self.get_connect_kwargs())
+        except (websockets.InvalidHandshake, OSError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            return None
+        conn = WsConnection(websocket=websocket,
+                            buffer_size=self._HISTORY_SIZE)
+        try:
+            await websocket.send(message=self._sub_message)
+        except (websockets.ConnectionClosed, OSError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            await self.close_connection(conn=conn)
+            return None
+        self.on_open(conn=conn)
+        return conn
+
+    async def close_connection(self, conn: WsConnection) -> None:
+        if conn.heartbeat is not None:
+            conn.heartbeat.cancel()
+        await conn.websocket.close()
+
+    async def supervise(self) -> Coroutine:
+        delay = self._BACKOFF_MIN
+        while True:
+            conn = await self.take_standby()
+            if conn is None:
+                conn = await self.open_connection()
+                if conn is None:
+                    await asyncio.sleep(delay=random.uniform(0.5, 1.5)
+                                        * delay)
+                    delay = self.get_backoff(delay=delay)
+                    continue
+                self.connections += 1
+                self.on_disconnect()
+            else:
+                self.failovers += 1
+                await self.replay_standby(conn=conn)
+            delay = self._BACKOFF_MIN
+            self.ensure_standby()
             try:
-                await websocket.send(message=self._sub_message)
-                return await self.on_connect(websocket=websocket)
-            except (websockets.ConnectionClosed, TimeoutError) as e:
-                print(e)
-                return await self.start()
-        except (websockets.InvalidHandshake, TimeoutError) as e:
-            print(e)
-            return await self.start()
-
-    async def http_get(self, uri: str, **kwargs) -> dict:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=uri, ssl=self._ssl_context,
-                                   **kwargs) as res:
-                return await res.json()
-
-    async def http_post(self, uri: str, data: str, **kwargs) -> dict:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url=uri, data=data, ssl=self._ssl_context,
-                                    **kwargs) as res:
-                return await res.json()
+                await self.read_primary(conn=conn)
+            except (websockets.ConnectionClosed, OSError) as e:
+                event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            finally:
+                await self.close_connection(conn=conn)
+
+    async def read_primary(self, conn: WsConnection) -> Coroutine:
+        websocket = conn.websocket
+        while True:
+            raw = await websocket.recv()
+            self.remember(raw=raw)
+            self.on_frame(conn=conn, raw=raw)
+
+    def remember(self, raw: str) -> None:
+        book_seq = self.get_book_seq(raw=raw)
+        if book_seq is not None:
+            stream, seq = book_seq
+            if seq > self._last_seq.get(stream, -1):
+                self._last_seq[stream] = seq
+            return
+        if self._DATA_MARKER not in raw:
+            return
+        key = hash(raw)
+        if len(self._seen_order) == self._HISTORY_SIZE:
+            self._seen.discard(self._seen_order.popleft())
+        self._seen_order.append(key)
+        self._seen.add(key)
+
+    def ensure_standby(self) -> None:
+        if self._standby_enabled and (self._standby_task is None
+                                      or self._standby_task.done()):
+            self._standby_task = asyncio.create_task(
+                coro=self.maintain_standby())
+
+    async def maintain_standby(self) -> Coroutine:
+        delay = self._BACKOFF_MIN
+        while True:
+            conn = await self.open_connection()
+            if conn is None:
+                await asyncio.sleep(delay=random.uniform(0.5, 1.5) * delay)
+                delay = self.get_backoff(delay=delay)
+                continue
+            delay = self._BACKOFF_MIN
+            self._standby = conn
+            try:
+                await self.read_standby(conn=conn)
+            except (websockets.ConnectionClosed, OSError) as e:
+                event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+            if self._standby is conn:
+                self._standby = None
+            await self.close_connection(conn=conn)
+
+    async def read_standby(self, conn: WsConnection) -> Coroutine:
+        websocket = conn.websocket
+        buffer = conn.buffer
+        while True:
+            raw = await websocket.recv()
+            buffer.append(raw)
+            self.on_standby_frame(conn=conn, raw=raw)
+
+    async def take_standby(self) -> Union[WsConnection, None]:
+        conn = self._standby
+        task = self._standby_task
+        if conn is None or task is None or task.done():
+            return None
+        self._standby = None
+        self._standby_task = None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return conn
+
+    async def replay_standby(self, conn: WsConnection) -> None:
+        frames = list(conn.buffer)
+        conn.buffer.clear()
+        last_seq = self._last_seq
+        first_seq = {}
+        for raw in frames:
+            book_seq = self.get_book_seq(raw=raw)
+            if book_seq is not None and book_seq[0] not in first_seq:
+                first_seq[book_seq[0]] = book_seq[1]
+        if any(seq > last_seq[stream] for stream, seq in first_seq.items()
+               if stream in last_seq):
+            self.resyncs += 1
+            await self.resync(conn=conn)
+            return
+        for raw in frames:
+            book_seq = self.get_book_seq(raw=raw)
+            if book_seq is not None:
+                if book_seq[1] <= last_seq.get(book_seq[0], -1):
+                    continue
+            elif self._DATA_MARKER not in raw or hash(raw) in self._seen:
+                continue
+            self.replayed += 1
+            self.remember(raw=raw)
+            self.on_frame(conn=conn, raw=raw)
+
+    async def resync(self, conn: WsConnection) -> None:
+        self.on_disconnect()
+        await conn.websocket.send(message=self._sub_message)
+
+    def get_connection_stats(self) -> Dict[str, int]:
+        return {'connections': self.connections,
+                'failovers': self.failovers, 'resyncs': self.resyncs,
+                'replayed': self.replayed,
+                'standby': int(self._standby is not None)}
+
+    def capture_frame(self, kind: int, payload: str) -> None:
+        if self._capture is not None:
+            self._capture.write(venue=self._VENUE, kind=kind, payload=payload)
+
+    def capture_snapshot(self, kind: int, data: Union[dict, list]) -> None:
+        if self._capture is not None:
+            self._capture.write(venue=self._VENUE, kind=kind,
+                                payload=json.dumps(obj=data))
+
+    async def http_get(self, path: str, **kwargs) -> dict:
+        return await self._session.get_json(path=path, **kwargs)
+
+    async def http_post(self, path: str, data: str, **kwargs) -> dict:
+        return await self._session.post_json(path=path, data=data, **kwargs)
 
 
 class BinanceWsClient(WsClient):
-    _BASE_API_ENDPOINT = 'https://dapi.binance.com'
+    _VENUE = capture.VENUE_BINANCE
+    _LATENCY_VENUE = latency.VENUE_BINANCE
     _api_auth: BinanceApiAuth
-    _depth_snapshot_path = '/dapi/v1/depth?symbol=BTCUSD_PERP&limit=1000'
+    _ws_endpoint: str
+    _symbol_configs: List[symbols.SymbolConfig]
+    _private: bool
+    _DATA_MARKER = '"e":'
+    _DEPTH_PREFIX = '{"e":"depthUpdate"'
+    _WS_ENDPOINT = 'wss://dstream.binance.com/ws/'
+    _DEPTH_SNAPSHOT_PATH = '/dapi/v1/depth?symbol=%s&limit=1000'
+    _SNAPSHOT_RETRY_DELAY = 0.5
 
     def __init__(self, api_file_path: str,
-                 feed_object: feed.BinanceFeed) -> None:
+                 feed_object: Union[feed.BinanceFeed,
+                                    feed.BinanceFeedRouter],
+                 session: VenueSession,
+                 capture_writer: Union[capture.CaptureWriter, None] = None,
+                 ws_endpoint: str = _WS_ENDPOINT,
+                 symbol_configs: List[symbols.SymbolConfig] =
+                 symbols.DEFAULT_SYMBOLS, standby: bool = True,
+                 private: bool = True) -> None:
         self._api_auth = BinanceApiAuth(file_path=api_file_path)
+        self._decoder = decoder.BinanceFrameDecoder()
+        self._ws_endpoint = ws_endpoint
+        self._symbol_configs = symbol_configs
+        self._private = private
         sub_message = json.dumps(
-            obj={'method': 'SUBSCRIBE', 'params': ['btcusd_perp@depth@100ms']})
-        super().__init__(sub_message=sub_message, feed_object=feed_object)
+            obj={'method': 'SUBSCRIBE',
+                 'params': [config.binance_depth_stream
+                            for config in symbol_configs],
+                 'id': 1})
+        super().__init__(sub_message=sub_message, feed_object=feed_object,
+                         session=session, capture_writer=capture_writer,
+                         standby=standby)
+        for config in symbol_configs:
+            feed_object.get_feed(
+                symbol=config.binance_symbol).set_snapshot_requester(
+                requester=functools.partial(
+                    self.request_depth_snapshot,
+                    symbol=config.binance_symbol))
 
-    async def start(self) -> Coroutine:
-        return await self.connect(uri='wss://dstream.binance.com/ws/')
+    def get_uri(self) -> str:
+        return self._ws_endpoint
+
+    def get_book_seq(self, raw: str) -> Union[Tuple[str, int], None]:
+        if not raw.startswith(self._DEPTH_PREFIX):
+            return None
+        i = raw.find('"s":"') + 5
+        j = raw.find('"', i)
+        seq = get_int_field(raw=raw, key='"u":', start=j)
+        return (raw[i:j], seq) if seq is not None else None
+
+    def request_depth_snapshot(self, symbol: str) -> None:
+        asyncio.create_task(coro=self.get_depth_snapshot(symbol=symbol))
 
     def on_disconnect(self) -> None:
         self._feed.on_book_reset()
 
-    async def get_depth_snapshot(self) -> None:
-        res = await self.http_get(
-            uri=self._BASE_API_ENDPOINT + self._depth_snapshot_path)
-        self._feed.on_depth_snapshot(data=res)
+    async def get_depth_snapshot(self, symbol: str) -> None:
+        while True:
+            try:
+                res = await self.http_get(
+                    path=self._DEPTH_SNAPSHOT_PATH % symbol)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)
+                await asyncio.sleep(delay=self._SNAPSHOT_RETRY_DELAY)
+        self.capture_snapshot(kind=capture.KIND_DEPTH_SNAPSHOT, data=res)
+        self._feed.get_feed(symbol=symbol).on_depth_snapshot(data=res)
 
-    async def get_positions(self) -> None:
+    async def get_positions(self, pair: str) -> None:
         res = await self.http_get(
-            uri=self._BASE_API_ENDPOINT + self._api_auth.get_position_risk_auth(
-                pair='BTCUSD'),
+            path=self._api_auth.get_position_risk_auth(pair=pair),
             headers={'X-MBX-APIKEY': self._api_auth.key})
+        self.capture_snapshot(kind=capture.KIND_POSITION_SNAPSHOT, data=res)
         self._feed.on_position_snapshot(data=res)
 
-    async def on_connect(self,
-                         websocket: websockets.WebSocketClientProtocol
-                         ) -> Coroutine:
-        while True:
-            try:
-                res = json.loads(s=await websocket.recv())
-                self._feed.on_websocket(data=res)
-                if res.get('result') is None and res.get('id') == 1:
-                    asyncio.create_task(coro=self.get_depth_snapshot())
-                    asyncio.create_task(coro=self.get_positions())
-            except (websockets.ConnectionClosed, TimeoutError) as e:
-                print(e)
-                self.on_disconnect()
-                return await self.start()
+    def on_frame(self, conn: WsConnection, raw: str) -> None:
+        recv_ts = latency.clock()
+        recv_wall_ns = time.time_ns()
+        latency.RECORDER.tick_ts = recv_ts
+        self.capture_frame(kind=capture.KIND_WS_FRAME, payload=raw)
+        frame_type, res = self._decoder.decode(raw=raw)
+        latency.RECORDER.record(stage=latency.STAGE_DECODE,
+                                venue=self._LATENCY_VENUE, start_ns=recv_ts)
+        if frame_type == decoder.FRAME_BOOK_DELTA:
+            self._api_auth.clock.on_event_time(
+                event_ns=res.event_time * 1000000, recv_ns=recv_wall_ns)
+            self._feed.on_book_delta(delta=res)
+            return
+        self._feed.on_websocket(data=res)
+        if res.get('result') is None and res.get('id') == 1:
+            for config in self._symbol_configs:
+                symbol_feed = self._feed.get_feed(
+                    symbol=config.binance_symbol)
+                if not symbol_feed.is_live():
+                    symbol_feed.request_snapshot()
+            if not self._private:
+                return
+            for pair in {config.binance_pair
+                         for config in self._symbol_configs}:
+                asyncio.create_task(coro=self.get_positions(pair=pair))
 
 
 class BybitWsClient(WsClient):
-    _BASE_API_ENDPOINT = 'https://api.bybit.com'
+    _VENUE = capture.VENUE_BYBIT
+    _LATENCY_VENUE = latency.VENUE_BYBIT
     _api_auth: BybitApiAuth
-    _pong_recv = False
+    _ws_endpoint: str
+    _symbol_configs: List[symbols.SymbolConfig]
+    _unsub_message: str
+    _private: bool
+    _book_prefixes: Tuple[str, ...]
+    _DATA_MARKER = '"topic":'
     _ping_msg = json.dumps(obj={'op': 'ping'})
+    _HEARTBEAT_INTERVAL = 30
 
-    def __init__(self, api_file_path: str, feed_object: feed.BybitFeed) -> None:
+    def __init__(self, api_file_path: str,
+                 feed_object: Union[feed.BybitFeed, feed.BybitFeedRouter],
+                 session: VenueSession,
+                 capture_writer: Union[capture.CaptureWriter, None] = None,
+                 ws_endpoint: str = BybitApiAuth.WEBSOCKET_ENDPOINT,
+                 symbol_configs: List[symbols.SymbolConfig] =
+                 symbols.DEFAULT_SYMBOLS, standby: bool = True,
+                 private: bool = True) -> None:
         self._api_auth = BybitApiAuth(file_path=api_file_path)
+        book_topics = [config.bybit_book_topic for config in symbol_configs]
+        self._decoder = decoder.BybitFrameDecoder(book_topics=book_topics)
+        self._book_prefixes = tuple('{"topic":"%s",' % topic
+                                    for topic in book_topics)
+        self._ws_endpoint = ws_endpoint
+        self._symbol_configs = symbol_configs
+        self._private = private
         sub_message = json.dumps(
             obj={'op': 'subscribe',
-                 'args': ['orderBookL2_25.BTCUSD', 'order', 'execution',
-                          'position']})
-        super().__init__(sub_message=sub_message, feed_object=feed_object)
+                 'args': book_topics + (['order', 'execution', 'position']
+                                        if private else [])})
+        self._unsub_message = json.dumps(obj={'op': 'unsubscribe',
+                                              'args': book_topics})
+        super().__init__(sub_message=sub_message, feed_object=feed_object,
+                         session=session, capture_writer=capture_writer,
+                         standby=standby)
 
-    async def start(self) -> Coroutine:
-        return await self.connect(uri=self._api_auth.get_websocket_uri(),
-                                  ping_interval=None)
+    def get_uri(self) -> str:
+        return self._api_auth.get_websocket_uri(endpoint=self._ws_endpoint)
+
+    def get_book_seq(self, raw: str) -> Union[Tuple[str, int], None]:
+        if not raw.startswith(self._book_prefixes):
+            return None
+        seq = get_int_field(raw=raw, key='"cross_seq":',
+                            start=raw.rfind('"cross_seq":'))
+        return (raw[10:raw.find('"', 10)], seq) if seq is not None else None
+
+    def on_disconnect(self) -> None:
+        self._feed.on_book_reset()
+
+    def get_connect_kwargs(self) -> dict:
+        return {'ping_interval': None}
+
+    def on_open(self, conn: WsConnection) -> None:
+        conn.heartbeat = asyncio.create_task(coro=self.heartbeat(conn=conn))
+
+    async def resync(self, conn: WsConnection) -> None:
+        await conn.websocket.send(message=self._unsub_message)
+        await super().resync(conn=conn)
 
-    async def get_active_orders(self) -> None:
+    async def get_active_orders(self, symbol: str) -> None:
         res = await self.http_get(
-            uri=(self._BASE_API_ENDPOINT
-                 + self._api_auth.get_active_orders_auth(symbol='BTCUSD')))
-        self._feed.on_order_snapshot(data=res)
+            path=self._api_auth.get_active_orders_auth(symbol=symbol))
+        self.capture_snapshot(kind=capture.KIND_ORDER_SNAPSHOT, data=res)
+        self._feed.get_feed(symbol=symbol).on_order_snapshot(data=res)
 
-    async def get_positions(self) -> None:
+    async def get_positions(self, symbol: str) -> None:
         res = await self.http_get(
-            uri=(self._BASE_API_ENDPOINT
-                 + self._api_auth.get_position_list_auth(symbol='BTCUSD')))
-        self._feed.on_position_snapshot(data=res)
+            path=self._api_auth.get_position_list_auth(symbol=symbol))
+        self.capture_snapshot(kind=capture.KIND_POSITION_SNAPSHOT, data=res)
+        self._feed.get_feed(symbol=symbol).on_position_snapshot(data=res)
 
-    async def on_connect(self,
-                         websocket: websockets.WebSocketClientProtocol) -> Coroutine:
-        heartbeat_t = asyncio.create_task(
-            coro=self.heartbeat(websocket=websocket))
-        while True:
-            try:
-                res = json.loads(s=await websocket.recv())
-                if res.get('topic') is not None:
-                    self._feed.on_websocket(data=res)
-                elif (res.get('request').get('op') == 'subscribe'
-                      and res.get('success') is True):
-                    asyncio.create_task(coro=self.get_active_orders())
-                    asyncio.create_task(coro=self.get_positions())
-                elif res.get('ret_msg') == 'pong' and res.get('success'):
-                    self._pong_recv = True
-            except (websockets.ConnectionClosed, TimeoutError) as e:
-                print(e)
-                heartbeat_t.cancel()
-                return await self.start()
-
-    async def heartbeat(self,
-                        websocket: websockets.WebSocketClientProtocol
-                        ) -> Coroutine:
-        while True:
-            try:
+    def on_frame(self, conn: WsConnection, raw: str) -> None:
+        recv_ts = latency.clock()
+        recv_wall_ns = time.time_ns()
+        latency.RECORDER.tick_ts = recv_ts
+        self.capture_frame(kind=capture.KIND_WS_FRAME, payload=raw)
+        frame_type, res = self._decoder.decode(raw=raw)
+        latency.RECORDER.record(stage=latency.STAGE_DECODE,
+                                venue=self._LATENCY_VENUE, start_ns=recv_ts)
+        if frame_type == decoder.FRAME_BOOK_DELTA:
+            if res.timestamp_e6:
+                self._api_auth.clock.on_event_time(
+                    event_ns=res.timestamp_e6 * 1000, recv_ns=recv_wall_ns)
+            self._feed.on_book_delta(delta=res)
+        elif res.get('topic') is not None:
+            self._feed.on_websocket(data=res)
+        elif (res.get('request', {}).get('op') == 'subscribe'
+              and res.get('success') is True and self._private):
+            for config in self._symbol_configs:
+                asyncio.create_task(coro=self.get_active_orders(
+                    symbol=config.bybit_symbol))
+                asyncio.create_task(coro=self.get_positions(
+                    symbol=config.bybit_symbol))
+        elif res.get('ret_msg') == 'pong' and res.get('success'):
+            conn.pong_recv = True
+
+    def on_standby_frame(self, conn: WsConnection, raw: str) -> None:
+        if '"ret_msg":"pong"' in raw:
+            conn.pong_recv = True
+
+    async def heartbeat(self, conn: WsConnection) -> Coroutine:
+        websocket = conn.websocket
+        try:
+            while True:
+                conn.pong_recv = False
                 await websocket.send(message=self._ping_msg)
-                await asyncio.sleep(delay=30)
-                if not self._pong_recv:
-                    return await self.start()
-                else:
-                    self._pong_recv = False
-            except (websockets.ConnectionClosed, TimeoutError) as e:
-                print(e)
-                return await self.start()
\ No newline at end of file
+                await asyncio.sleep(delay=self._HEARTBEAT_INTERVAL)
+                if not conn.pong_recv:
+                    event_log.LOGGER.warning(
+                        event=event_log.EVENT_MESSAGE,
+                        text='Bybit pong missed, closing connection')
+                    await websocket.close()
+                    return
+        except (websockets.ConnectionClosed, OSError) as e:
+            event_log.LOGGER.error(event=event_log.EVENT_EXCEPTION, text=e)